@@ -1,29 +1,64 @@
 """Main script for RAG knowledge base preprocessing."""
 
+import asyncio
+import functools
 import os
 import sys
 import json
 import argparse
 import logging
-from typing import List, Iterator, Optional
+from contextlib import ExitStack
+from typing import Any, List, Iterator, Optional, Tuple
 from dotenv import load_dotenv
 from modules.loader import load_jsonl_data, load_json_data, load_data_generator
+from modules.async_embedder import AsyncEmbeddingEngine
 from modules.chunker import (
+    ChunkBatch,
     create_text_chunks,
     chunk_text_fixed_size,
     CHUNK_SIZE,
     CHUNK_OVERLAP,
-    chunk_text,
+    chunk_batch_fixed_size,
+    iter_chunks_fixed_size,
 )
 from modules.embedder import (
+    EMBEDDING_BACKEND_OPENAI,
+    EmbeddingBackend,
+    embedding_backend_name,
     generate_dummy_embeddings,
+    get_embedding_backend,
     load_openai_key,
     generate_embeddings,
 )
+from itertools import islice
 from pathlib import Path
-from .modules.extractor import iter_extracted_content
-from .modules.converter import add_plain_text_to_paper
-from .types import Paper
+from modules.extractor import iter_extracted_content, list_archives, ExtractionConfig
+from modules.checkpoint import (
+    IngestCheckpoint,
+    DEFAULT_COMMIT_EVERY,
+    read_last_record,
+)
+from modules.chunk_dedup import (
+    ChunkDeduplicator,
+    DEFAULT_SIMILARITY_THRESHOLD,
+    chunk_key,
+)
+from modules.conversion_cache import ConversionCache, DEFAULT_CACHE_MAX_BYTES
+from modules.embedding_cache import EmbeddingCache, DEFAULT_EMBEDDING_CACHE_MAX_BYTES
+from modules.converter import (
+    ConversionBudget,
+    ConversionRetryQueue,
+    ConversionWatchdog,
+    DEFAULT_CONVERTER_ENGINE,
+)
+from modules.deduplicator import (
+    PaperDeduplicator,
+    VERSION_POLICY_LATEST,
+    scan_latest_versions,
+)
+from modules.pdf_parser import PdfParsingConfig, iter_parsed_papers
+from modules.vector_store import ChunkMetadata, VectorStoreWriter
+from modules.types import Paper
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -44,6 +79,13 @@ FORCE_USE_SAMPLE_DATA = True
 SAMPLE_DATA_PATH = "./data/sample_arxiv_record.jsonl"
 
 OUTPUT_EMBEDDINGS_FILE = "processed_embeddings.jsonl"
+EMBEDDING_CACHE_FILE = os.getenv("EMBEDDING_CACHE_FILE", "embedding_cache.sqlite")
+
+OUTPUT_FORMAT_JSONL = "jsonl"
+OUTPUT_FORMAT_NPY = "npy"  # Binary vector shards, see VectorStoreWriter
+OUTPUT_FORMAT = os.getenv("OUTPUT_FORMAT", OUTPUT_FORMAT_JSONL)
+VECTOR_STORE_DIR = os.getenv("VECTOR_STORE_DIR", "processed_embeddings")
+VECTOR_DTYPE = os.getenv("VECTOR_DTYPE", "float32")
 
 EMBEDDING_BATCH_SIZE = 50
 
@@ -98,20 +140,293 @@ def save_batch_local(batch: List[dict], output_path: str):
         raise
 
 
-def process_papers(input_dir: Path, output_file: Path) -> None:
+def embed_paper_chunks(
+    paper: Paper,
+    chunk_deduplicator: ChunkDeduplicator,
+    embedding_cache: EmbeddingCache,
+    embedding_backend: EmbeddingBackend,
+) -> Optional[Tuple[List[Tuple[int, int]], List[int], List[Any], List[dict]]]:
+    """Chunks, deduplicates and embeds a paper's text one batch at a time.
+
+    Chunks are produced lazily and embedded in batches of
+    EMBEDDING_BATCH_SIZE, so at most one batch of chunk strings exists at a
+    time whatever the length of the paper. Only chunks missing from the
+    embedding cache are sent to the API.
+
+    Args:
+        paper: A paper with plain_text set.
+        chunk_deduplicator: Drops chunks that duplicate embedded ones.
+        embedding_cache: Embeddings of chunk texts from earlier runs.
+        embedding_backend: Embeds the chunks missing from the cache.
+
+    Returns:
+        The spans, chunk indices (positions among all of the paper's chunks)
+        and embeddings of the embedded chunks, and the aliases of the
+        duplicate ones; all lists are empty but the aliases if every chunk
+        is a duplicate. None if the paper has no chunks or embedding failed.
+    """
+    chunk_spans: List[Tuple[int, int]] = []
+    chunk_indices: List[int] = []
+    embeddings: List[Any] = []
+    chunk_aliases: List[dict] = []
+    chunk_count = 0
+
+    embed_fn = functools.partial(generate_embeddings, backend=embedding_backend)
+    chunks = iter_chunks_fixed_size(paper.plain_text, CHUNK_SIZE, CHUNK_OVERLAP)
+    # Chunks are indexed as they are checked; if the paper ends up without a
+    # record they are removed again, so that no later duplicate is aliased
+    # to a vector that was never stored.
+    checked_keys: List[str] = []
+    try:
+        while True:
+            batch = list(islice(chunks, EMBEDDING_BATCH_SIZE))
+            if not batch:
+                break
+
+            batch_spans: List[Tuple[int, int]] = []
+            batch_indices: List[int] = []
+            batch_texts: List[str] = []
+            for chunk_index, (start, end, chunk_text) in enumerate(batch, chunk_count):
+                key = chunk_key(paper.paper_id, start, end)
+                checked_keys.append(key)
+                alias = chunk_deduplicator.check(key, chunk_text)
+                if alias is not None:
+                    chunk_aliases.append(
+                        {
+                            "chunk_index": chunk_index,
+                            "span": (start, end),
+                            "canonical": alias.canonical_key,
+                            "similarity": alias.similarity,
+                        }
+                    )
+                    continue
+                batch_spans.append((start, end))
+                batch_indices.append(chunk_index)
+                batch_texts.append(chunk_text)
+            chunk_count += len(batch)
+            if not batch_texts:
+                continue
+
+            batch_embeddings = embedding_cache.embed(batch_texts, embed_fn)
+            if not batch_embeddings:
+                logging.warning(f"No embeddings generated for paper {paper.paper_id}")
+                chunk_deduplicator.discard(checked_keys)
+                return None
+            chunk_spans.extend(batch_spans)
+            chunk_indices.extend(batch_indices)
+            embeddings.extend(batch_embeddings)
+    except BaseException:
+        chunk_deduplicator.discard(checked_keys)
+        raise
+
+    if chunk_count == 0:
+        logging.warning(f"No chunks generated for paper {paper.paper_id}")
+        return None
+    if not chunk_spans:
+        logging.info(
+            f"All {chunk_count} chunks of paper {paper.paper_id} duplicate "
+            "already embedded chunks; recording their aliases only"
+        )
+    return chunk_spans, chunk_indices, embeddings, chunk_aliases
+
+
+def process_papers(
+    input_dir: Path,
+    output_file: Path,
+    dedup_state_file: Optional[Path] = None,
+    version_policy: str = VERSION_POLICY_LATEST,
+    resume: bool = False,
+    commit_every: int = DEFAULT_COMMIT_EVERY,
+    pdf_parsing_config: Optional[PdfParsingConfig] = None,
+    conversion_budget: Optional[ConversionBudget] = None,
+    conversion_retry_file: Optional[Path] = None,
+    converter_engine: str = DEFAULT_CONVERTER_ENGINE,
+    conversion_cache_dir: Optional[Path] = None,
+    conversion_cache_max_bytes: int = DEFAULT_CACHE_MAX_BYTES,
+    chunk_dedup_index: Optional[Path] = None,
+    chunk_dedup_threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+    embedding_cache_file: Optional[Path] = None,
+    embedding_cache_max_bytes: int = DEFAULT_EMBEDDING_CACHE_MAX_BYTES,
+    embedding_backend: Optional[str] = None,
+    embedding_dimensions: Optional[int] = None,
+    vector_store_dir: Optional[Path] = None,
+    vector_dtype: str = "float32",
+) -> None:
     """Process papers from input directory to output file.
 
+    Duplicate PDFs and superseded arXiv versions are dropped right after
+    extraction, before any parsing or embedding work is spent on them. The
+    remaining PDFs are parsed to prose in a pool of worker processes (see
+    `iter_parsed_papers`), and that text is what gets chunked and embedded.
+
+    Progress is checkpointed to a manifest next to the output file. With
+    `resume=True` archives and papers committed by a previous run are
+    skipped and the output is appended to, so a crash only costs the
+    papers handled since the last commit.
+
+    Papers that carry LaTeX source are converted from it instead. LaTeX
+    conversion runs in a separate process under a per-paper budget.
+    Papers that go over it are skipped with a conversion error and listed in
+    a retry file, so one pathological paper cannot stall the run. With a
+    conversion cache, a rerun only converts papers whose LaTeX or converter
+    settings changed.
+
+    Each output record holds the paper's text once, with every chunk given
+    as a [start, end) character span into it. Chunks that are near-duplicates
+    of chunks already embedded (in this run, or in earlier runs sharing the
+    chunk dedup index) are not embedded again; the record lists them under
+    "chunk_aliases" with their chunk index and the key of the chunk they
+    duplicate; a paper whose chunks are all duplicates still gets a record,
+    with no spans. With an embedding cache file, a rerun only embeds chunks
+    whose text changed.
+
+    With a vector store directory, embeddings go to its binary shards
+    instead of the JSON records, and each record lists the [start, end)
+    range of its rows under "vector_rows". The store is flushed before every
+    checkpoint commit and cut back to the last committed record on resume.
+
     Args:
         input_dir: Directory containing .tar files with papers.
         output_file: File to save processed papers with embeddings.
+        dedup_state_file: Optional JSONL file persisting the dedup seen-set
+            across runs.
+        version_policy: Which arXiv versions to keep ("all", "first" or "latest").
+        resume: Continue from the checkpoint of a previous run.
+        commit_every: Number of handled papers between checkpoint commits.
+        pdf_parsing_config: Worker count and limits of the PDF parsing stage.
+        conversion_budget: Per-paper conversion time and input-size limits.
+        conversion_retry_file: JSONL file listing papers that went over the
+            conversion budget (defaults to one next to the output file).
+        converter_engine: LaTeX conversion engine ("pylatexenc" or "fast").
+        conversion_cache_dir: Optional directory caching converted text
+            across runs.
+        conversion_cache_max_bytes: Size cap of the conversion cache.
+        chunk_dedup_index: Optional SQLite file persisting the near-duplicate
+            chunk index across runs.
+        chunk_dedup_threshold: Estimated similarity above which a chunk is
+            treated as a duplicate.
+        embedding_cache_file: Optional SQLite file caching chunk embeddings
+            across runs.
+        embedding_cache_max_bytes: Size cap of the embedding cache.
+        embedding_backend: "openai" or "local" (defaults to the
+            EMBEDDING_BACKEND environment variable, then "openai").
+        embedding_dimensions: Optional shortened embedding size (defaults to
+            the EMBEDDING_DIMENSIONS environment variable, then the model's).
+        vector_store_dir: Optional directory for binary embedding shards.
+        vector_dtype: Dtype of stored vectors ("float32", "float16", or
+            "int8" with a scale per vector).
     """
+    backend = get_embedding_backend(
+        embedding_backend, dimensions=embedding_dimensions
+    )
+    if backend is None:
+        logging.error("No embedding backend available. Exiting.")
+        return
+
     processed_count = 0
     error_count = 0
+    parsing_error_count = 0
     conversion_error_count = 0
     empty_conversion_count = 0
 
-    with open(output_file, "w", encoding="utf-8") as f_out:
-        for paper in iter_extracted_content(input_dir):
+    checkpoint = (
+        IngestCheckpoint.load(output_file) if resume else IngestCheckpoint(output_file)
+    )
+    # Versions in completed archives are already in the dedup state, so only
+    # the archives still to be read are scanned (once the first paper arrives).
+    completed_tars = set(checkpoint.skip_tar_filenames)
+
+    def scan_pending_archive_versions():
+        return scan_latest_versions(
+            [path for path in list_archives(input_dir) if path.name not in completed_tars],
+            cache_path=output_file.with_name(output_file.name + ".versions.json"),
+        )
+
+    deduplicator = PaperDeduplicator(
+        state_path=dedup_state_file,
+        version_policy=version_policy,
+        latest_versions=(
+            scan_pending_archive_versions
+            if version_policy == VERSION_POLICY_LATEST
+            else None
+        ),
+        is_committed=checkpoint.is_committed,
+    )
+    checkpoint.after_commit.append(deduplicator.flush_state)
+    extraction_config = ExtractionConfig(
+        skip_tar_filenames=checkpoint.skip_tar_filenames,
+        lazy_pdf_content=True,  # Parse workers read PDFs from the archives
+    )
+
+    if conversion_retry_file is None:
+        conversion_retry_file = output_file.with_name(
+            output_file.name + ".conversion_retry.jsonl"
+        )
+    if not resume and conversion_retry_file.exists():
+        conversion_retry_file.unlink()
+    retry_queue = ConversionRetryQueue(conversion_retry_file)
+    conversion_cache = (
+        ConversionCache(conversion_cache_dir, max_bytes=conversion_cache_max_bytes)
+        if conversion_cache_dir is not None
+        else None
+    )
+
+    chunk_deduplicator = ChunkDeduplicator(
+        chunk_dedup_index, threshold=chunk_dedup_threshold
+    )
+    embedding_cache = EmbeddingCache(
+        embedding_cache_file,
+        model=backend.model,
+        dimensions=backend.dimensions,
+        max_bytes=embedding_cache_max_bytes,
+    )
+
+    watchdog = ConversionWatchdog(
+        conversion_budget,
+        retry_queue,
+        engine=converter_engine,
+        cache=conversion_cache,
+    )
+
+    vector_store = None
+    if vector_store_dir is not None:
+        vector_store = VectorStoreWriter(
+            vector_store_dir,
+            backend.model,
+            backend.dimensions,
+            dtype=vector_dtype,
+            overwrite=not resume,
+        )
+        checkpoint.before_commit.append(vector_store.flush)
+
+    with ExitStack() as resources:
+        resources.callback(deduplicator.close)
+        f_out = resources.enter_context(checkpoint.open_output(resume))
+        for resource in (chunk_deduplicator, embedding_cache, watchdog, vector_store):
+            if resource is not None:
+                resources.enter_context(resource)
+        if vector_store is not None and resume:
+            last_record = read_last_record(output_file)
+            vector_store.truncate(
+                last_record["vector_rows"][1]
+                if last_record and "vector_rows" in last_record
+                else 0
+            )
+
+        papers = iter_extracted_content(
+            input_dir, extraction_config, on_archive_done=checkpoint.archive_extracted
+        )
+        papers = deduplicator.filter(checkpoint.skip_committed(papers))
+        papers = iter_parsed_papers(papers, pdf_parsing_config)
+        for paper in checkpoint.track(papers, f_out, commit_every=commit_every):
+
+            if paper.parsing_error:
+                parsing_error_count += 1
+                logging.warning(
+                    f"Skipping paper {paper.paper_id} due to parsing error: "
+                    f"{paper.parsing_error}"
+                )
+                continue
 
             if paper.has_errors():
                 error_count += 1
@@ -120,7 +435,10 @@ def process_papers(input_dir: Path, output_file: Path) -> None:
                 )
                 continue
 
-            add_plain_text_to_paper(paper)
+            if paper.raw_latex_text:
+                watchdog.convert(paper)
+            else:
+                paper.plain_text = paper.cleaned_prose_text
 
             if paper.has_conversion_error():
                 conversion_error_count += 1
@@ -136,53 +454,201 @@ def process_papers(input_dir: Path, output_file: Path) -> None:
                 )
                 continue
 
-            chunks = chunk_text(paper.plain_text)
-            if not chunks:
-                logging.warning(f"No chunks generated for paper {paper.paper_id}")
-                continue
-
-            embeddings = generate_embeddings(chunks)
-            if not embeddings:
-                logging.warning(f"No embeddings generated for paper {paper.paper_id}")
+            embedded = embed_paper_chunks(
+                paper, chunk_deduplicator, embedding_cache, backend
+            )
+            if embedded is None:
                 continue
+            chunk_spans, chunk_indices, embeddings, chunk_aliases = embedded
 
             processed_count += 1
             result = {
                 "paper_id": paper.paper_id,
                 "source": paper.source_gz_member_name,
-                "chunks": chunks,
-                "embeddings": embeddings,
+                "text": paper.plain_text,
+                "chunk_spans": chunk_spans,
             }
+            if vector_store is None:
+                result["embeddings"] = embeddings
+            else:
+                first_row = vector_store.append(
+                    embeddings,
+                    [
+                        ChunkMetadata(paper.paper_id, chunk_index, start, end)
+                        for chunk_index, (start, end) in zip(chunk_indices, chunk_spans)
+                    ],
+                )
+                result["vector_rows"] = [first_row, first_row + len(embeddings)]
+            result["chunk_aliases"] = chunk_aliases
             f_out.write(f"{json.dumps(result)}\n")
 
     logging.info(
         f"Processing complete. Processed {processed_count} papers successfully."
     )
     logging.info(f"Encountered {error_count} extraction errors.")
+    logging.info(f"Encountered {parsing_error_count} PDF parsing errors.")
     logging.info(f"Encountered {conversion_error_count} conversion errors.")
     logging.info(f"Encountered {empty_conversion_count} empty conversion results.")
+    if conversion_cache is not None:
+        logging.info(
+            f"Conversion cache: {conversion_cache.stats.hits} hits, "
+            f"{conversion_cache.stats.misses} misses, "
+            f"{conversion_cache.stats.evictions} evictions."
+        )
+    logging.info(
+        f"Embedding cache: {embedding_cache.stats.hits} hits, "
+        f"{embedding_cache.stats.misses} misses, "
+        f"{embedding_cache.stats.evictions} evictions."
+    )
+    if len(retry_queue):
+        logging.info(
+            f"Queued {len(retry_queue)} papers over the conversion budget for retry "
+            f"in {conversion_retry_file}."
+        )
+    logging.info(
+        f"Aliased {chunk_deduplicator.stats.aliased} of "
+        f"{chunk_deduplicator.stats.checked} chunks as near-duplicates."
+    )
+    logging.info(
+        f"Skipped {deduplicator.stats.skipped} duplicate papers "
+        f"({deduplicator.stats.duplicate_content} identical PDFs, "
+        f"{deduplicator.stats.superseded_version} superseded versions)."
+    )
+
+
+async def embed_and_save_chunk_batch(
+    chunk_batch: ChunkBatch,
+    paper_ids: List[str],
+    api_key: str,
+    embedding_cache: EmbeddingCache,
+    vector_store: Optional[VectorStoreWriter] = None,
+) -> None:
+    """Embeds chunk rows concurrently and saves each batch as it completes.
+
+    Batches of EMBEDDING_BATCH_SIZE rows are sent through an
+    AsyncEmbeddingEngine, which keeps several requests in flight under an
+    adaptive rate limit. Batches are keyed by their first row, so each one
+    is saved with its own chunks whichever request finishes first; the
+    output file is therefore in completion order, not row order.
+
+    Args:
+        chunk_batch: Chunk offsets of all documents.
+        paper_ids: Paper id of each document in chunk_batch.
+        api_key: OpenAI API key.
+        embedding_cache: Embeddings of chunk texts from earlier runs; only
+            chunks missing from it are sent to the API.
+        vector_store: Optional binary store to save to instead of the
+            JSON Lines output.
+    """
+    num_chunks = len(chunk_batch)
+    batches = (
+        (i, list(chunk_batch.iter_texts(i, i + EMBEDDING_BATCH_SIZE)))
+        for i in range(0, num_chunks, EMBEDDING_BATCH_SIZE)
+    )
+    async with AsyncEmbeddingEngine(
+        api_key, cache=embedding_cache, dimensions=embedding_cache.dimensions
+    ) as engine:
+        async for i, embeddings in engine.embed_batches(batches):
+            save_embedded_rows(chunk_batch, paper_ids, i, embeddings, vector_store)
+    logging.info(
+        f"Sent {engine.requests_sent} embedding requests ({engine.retries} retries)."
+    )
+
+
+def save_embedded_rows(
+    chunk_batch: ChunkBatch,
+    paper_ids: List[str],
+    start: int,
+    embeddings: Optional[List[Any]],
+    vector_store: Optional[VectorStoreWriter] = None,
+) -> None:
+    """Saves one embedded batch of chunk rows, starting at row `start`.
+
+    Rows go to the vector store when one is given (with their text in its
+    metadata), and to OUTPUT_EMBEDDINGS_FILE otherwise.
+    """
+    end = min(start + EMBEDDING_BATCH_SIZE, len(chunk_batch))
+    if embeddings is None or len(embeddings) != end - start:
+        logging.error(
+            f"Failed to generate embeddings for batch starting at index {start}. Skipping save for this batch."
+        )
+        return
+
+    if vector_store is not None:
+        vector_store.append(
+            embeddings,
+            [
+                ChunkMetadata(
+                    paper_ids[doc_index], chunk_index, chunk_start, chunk_end, text
+                )
+                for doc_index, chunk_index, chunk_start, chunk_end, text in zip(
+                    chunk_batch.doc_indices[start:end].tolist(),
+                    chunk_batch.chunk_ids[start:end].tolist(),
+                    chunk_batch.starts[start:end].tolist(),
+                    chunk_batch.ends[start:end].tolist(),
+                    chunk_batch.iter_texts(start, end),
+                )
+            ],
+        )
+        logging.info(
+            f"Embedded batch {start // EMBEDDING_BATCH_SIZE + 1} ({end - start} chunks)."
+        )
+        return
+
+    batch = [
+        {
+            "paper_id": paper_ids[doc_index],
+            "chunk_index": chunk_index,
+            "chunk_text": chunk_text,
+            "embedding": embedding,
+        }
+        for doc_index, chunk_index, chunk_text, embedding in zip(
+            chunk_batch.doc_indices[start:end].tolist(),
+            chunk_batch.chunk_ids[start:end].tolist(),
+            chunk_batch.iter_texts(start, end),
+            embeddings,
+        )
+    ]
+    logging.info(
+        f"Embedded batch {start // EMBEDDING_BATCH_SIZE + 1} ({len(batch)} chunks)."
+    )
+    try:
+        save_batch_local(batch, OUTPUT_EMBEDDINGS_FILE)
+    except Exception as e:
+        logging.error(
+            f"Failed to save batch starting at index {start} due to error: {e}. Continuing..."
+        )
 
 
 def main():
     """Main execution function for the preprocessing script.
 
     Orchestrates the entire workflow:
-    1. Loads configuration (API key, data paths).
+    1. Loads configuration (embedding backend, API key, data paths).
     2. Determines the data source to use.
     3. Clears any previous output file.
     4. Loads records from the source file using a generator.
-    5. Processes each record: combines text, chunks it, and structures chunk data.
-    6. Accumulates all structured chunks.
-    7. Generates embeddings for the chunks in batches using the OpenAI API.
-    8. Saves the batches (including embeddings) to a local JSON Lines file.
+    5. Processes each record: combines its title and abstract into one text.
+    6. Chunks all texts at once into columnar chunk offsets.
+    7. Generates embeddings for the chunks in concurrent batches using the
+       OpenAI API (or in batches on the CPU with EMBEDDING_BACKEND=local).
+    8. Saves the batches (including embeddings) to a local JSON Lines file
+       as they complete, or with OUTPUT_FORMAT=npy to binary vector shards
+       with a metadata table and manifest in VECTOR_STORE_DIR.
     """
     logging.info("Starting preprocessing script...")
 
-    api_key = load_openai_key()
-    if not api_key:
-        logging.error("Failed to load OpenAI API key. Exiting.")
-        return
-    logging.info("OpenAI API key loaded successfully.")
+    backend_name = embedding_backend_name()
+    api_key = None
+    if backend_name == EMBEDDING_BACKEND_OPENAI:
+        api_key = load_openai_key()
+        if not api_key:
+            logging.error("Failed to load OpenAI API key. Exiting.")
+            return
+        logging.info("OpenAI API key loaded successfully.")
+    else:
+        logging.info(f"Using the {backend_name} embedding backend; no API key needed.")
+    backend = get_embedding_backend(backend_name, api_key)
 
     data_path = SAMPLE_DATA_PATH if FORCE_USE_SAMPLE_DATA else DATA_SOURCE_PATH
     logging.info(f"Using data source: {data_path}")
@@ -197,7 +663,8 @@ def main():
 
     data_generator = load_data_generator(data_path)
 
-    all_processed_chunks = []
+    paper_ids: List[str] = []
+    documents: List[str] = []
     record_count = 0
 
     logging.info("Processing records...")
@@ -226,19 +693,8 @@ def main():
                 )
                 continue
 
-            text_chunks = chunk_text_fixed_size(
-                text_to_chunk, CHUNK_SIZE, CHUNK_OVERLAP
-            )
-            logging.debug(f"Record {paper_id}: Created {len(text_chunks)} chunks.")
-
-            for index, chunk_text in enumerate(text_chunks):
-                chunk_data = {
-                    "paper_id": paper_id,
-                    "chunk_index": index,
-                    "chunk_text": chunk_text,
-                    "embedding": None,
-                }
-                all_processed_chunks.append(chunk_data)
+            paper_ids.append(paper_id)
+            documents.append(text_to_chunk)
 
         except Exception as e:
             logging.error(
@@ -250,34 +706,43 @@ def main():
             logging.info(f"Processed {record_count} records...")
 
     logging.info(f"Finished reading records. Total records processed: {record_count}")
-    logging.info(f"Total chunks created: {len(all_processed_chunks)}")
+    chunk_batch = chunk_batch_fixed_size(documents, CHUNK_SIZE, CHUNK_OVERLAP)
+    logging.info(f"Total chunks created: {len(chunk_batch)}")
 
     logging.info("Starting embedding generation and saving...")
-    num_chunks = len(all_processed_chunks)
-    for i in range(0, num_chunks, EMBEDDING_BATCH_SIZE):
-        batch = all_processed_chunks[i : i + EMBEDDING_BATCH_SIZE]
-        batch_texts = [item["chunk_text"] for item in batch]
-
-        logging.info(
-            f"Generating embeddings for batch {i // EMBEDDING_BATCH_SIZE + 1} ({len(batch)} chunks)..."
+    vector_store = None
+    if OUTPUT_FORMAT == OUTPUT_FORMAT_NPY:
+        vector_store = VectorStoreWriter(
+            Path(VECTOR_STORE_DIR),
+            backend.model,
+            backend.dimensions,
+            dtype=VECTOR_DTYPE,
+            overwrite=True,
         )
-        embeddings = generate_embeddings(batch_texts, api_key)
-
-        if embeddings is not None and len(embeddings) == len(batch):
-            for j, embedding in enumerate(embeddings):
-                batch[j]["embedding"] = embedding
-
-            try:
-                save_batch_local(batch, OUTPUT_EMBEDDINGS_FILE)
-            except Exception as e:
-                logging.error(
-                    f"Failed to save batch starting at index {i} due to error: {e}. Continuing..."
+    with ExitStack() as resources:
+        embedding_cache = resources.enter_context(
+            EmbeddingCache(
+                Path(EMBEDDING_CACHE_FILE),
+                model=backend.model,
+                dimensions=backend.dimensions,
+            )
+        )
+        if vector_store is not None:
+            resources.enter_context(vector_store)
+        if backend_name == EMBEDDING_BACKEND_OPENAI:
+            asyncio.run(
+                embed_and_save_chunk_batch(
+                    chunk_batch, paper_ids, api_key, embedding_cache, vector_store
                 )
-                continue
-        else:
-            logging.error(
-                f"Failed to generate embeddings for batch starting at index {i}. Skipping save for this batch."
             )
+        else:
+            embed_fn = functools.partial(generate_embeddings, backend=backend)
+            for i in range(0, len(chunk_batch), EMBEDDING_BATCH_SIZE):
+                batch_texts = list(chunk_batch.iter_texts(i, i + EMBEDDING_BATCH_SIZE))
+                embeddings = embedding_cache.embed(batch_texts, embed_fn)
+                save_embedded_rows(
+                    chunk_batch, paper_ids, i, embeddings, vector_store
+                )
 
     logging.info("Preprocessing script finished.")
 
@@ -0,0 +1,375 @@
+import asyncio
+import logging
+import random
+import re
+import time
+from typing import (
+    AsyncIterator,
+    Hashable,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+from openai import APIConnectionError, APIError, APIStatusError, AsyncOpenAI
+
+from .embedder import (
+    DEFAULT_EMBEDDING_DIMENSION,
+    DEFAULT_REQUEST_TIMEOUT_SECONDS,
+    DEFAULT_REQUEST_TOKEN_BUDGET,
+    EMBEDDING_MODEL,
+    MAX_INPUTS_PER_REQUEST,
+    EmbeddingRequestTooLargeError,
+    _is_too_large,
+    pack_requests,
+)
+from .embedding_cache import EmbeddingCache
+from .tokenizer import Tokenizer, get_tokenizer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_IN_FLIGHT = 8
+DEFAULT_TOKENS_PER_MINUTE = 1_000_000
+DEFAULT_MIN_TOKENS_PER_MINUTE = 10_000
+DEFAULT_MAX_RETRIES = 6
+DEFAULT_RETRY_BASE_DELAY_SECONDS = 0.5
+DEFAULT_RETRY_MAX_DELAY_SECONDS = 60.0
+
+_RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+K = TypeVar("K", bound=Hashable)
+
+
+def parse_reset_duration(value: Optional[str]) -> Optional[float]:
+    """Parses a rate-limit reset header such as '1m30s', '250ms' or '2'."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+
+
+def _header_float(headers: Mapping[str, str], name: str) -> Optional[float]:
+    try:
+        return float(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class AdaptiveTokenBucket:
+    """Token-bucket limiter for embedding tokens that adapts to the provider.
+
+    The bucket refills at `rate` tokens per second up to a ten-second burst.
+    A 429 halves the rate (down to a floor) and blocks all requests until
+    the provider's retry delay has passed; every success raises it again by
+    a hundredth of the maximum. Rate-limit response headers keep the
+    estimate honest: `x-ratelimit-limit-tokens` sets the maximum rate, and
+    `x-ratelimit-remaining-tokens` / `x-ratelimit-reset-tokens` drain the
+    bucket to what the provider says is left.
+    """
+
+    def __init__(
+        self,
+        tokens_per_minute: float = DEFAULT_TOKENS_PER_MINUTE,
+        min_tokens_per_minute: float = DEFAULT_MIN_TOKENS_PER_MINUTE,
+        decrease_factor: float = 0.5,
+        increase_fraction: float = 0.01,
+    ):
+        assert 0 < decrease_factor < 1, "decrease_factor must be in (0, 1)"
+        self.max_rate = tokens_per_minute / 60.0
+        self.min_rate = min(min_tokens_per_minute / 60.0, self.max_rate)
+        self.rate = self.max_rate
+        self.decrease_factor = decrease_factor
+        self.increase_fraction = increase_fraction
+        self.level = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    @property
+    def capacity(self) -> float:
+        return self.max_rate * 10.0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: int) -> None:
+        """Waits until `tokens` can be spent (capped at the bucket capacity)."""
+        tokens = min(tokens, self.capacity)
+        async with self._lock:  # First come, first served
+            while True:
+                self._refill()
+                wait = self._blocked_until - time.monotonic()
+                if wait <= 0:
+                    if self.level >= tokens:
+                        self.level -= tokens
+                        return
+                    wait = (tokens - self.level) / self.rate
+                await asyncio.sleep(wait)
+
+    def on_success(self, headers: Mapping[str, str]) -> None:
+        self.rate = min(self.max_rate, self.rate + self.max_rate * self.increase_fraction)
+        self._apply_headers(headers)
+
+    def on_rate_limited(self, retry_after: float, headers: Mapping[str, str]) -> None:
+        # Requests in flight together are all rejected by the same limit, so
+        # only the first 429 of a pause lowers the rate.
+        if time.monotonic() >= self._blocked_until:
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+        self._refill()
+        self.level = 0.0
+        self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+        self._apply_headers(headers)
+        logger.warning(
+            f"[EMBED_LIMITER] Rate limited; pausing {retry_after:.2f}s, "
+            f"rate now {self.rate * 60:.0f} tokens/min."
+        )
+
+    def _apply_headers(self, headers: Mapping[str, str]) -> None:
+        limit = _header_float(headers, "x-ratelimit-limit-tokens")
+        if limit:
+            self.max_rate = limit / 60.0
+            self.min_rate = min(self.min_rate, self.max_rate)
+            self.rate = min(self.rate, self.max_rate)
+        remaining = _header_float(headers, "x-ratelimit-remaining-tokens")
+        if remaining is not None:
+            self._refill()
+            self.level = min(self.level, remaining)
+            if remaining <= 0:
+                reset = parse_reset_duration(headers.get("x-ratelimit-reset-tokens"))
+                if reset:
+                    self._blocked_until = max(self._blocked_until, time.monotonic() + reset)
+
+
+def _retry_after_seconds(error: APIStatusError) -> Optional[float]:
+    headers = error.response.headers
+    retry_after_ms = _header_float(headers, "retry-after-ms")
+    if retry_after_ms is not None:
+        return retry_after_ms / 1000.0
+    return parse_reset_duration(headers.get("retry-after")) or parse_reset_duration(
+        headers.get("x-ratelimit-reset-tokens")
+    )
+
+
+class AsyncEmbeddingEngine:
+    """Embeds with many concurrent requests under an adaptive rate limit.
+
+    Inputs are packed into requests as by EmbeddingService, and at most
+    `max_in_flight` requests are outstanding at once. Each request first
+    takes its estimated tokens from the AdaptiveTokenBucket. Failed
+    requests are retried with full-jitter exponential backoff (or after the
+    provider's Retry-After), rate limits feed back into the bucket, and
+    requests rejected as too large are split. Every result is written to
+    the slot of the input it belongs to, so completion order never matters.
+    An optional EmbeddingCache is consulted before any request is sent.
+    `dimensions` requests shortened embeddings, as for EmbeddingService.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str = EMBEDDING_MODEL,
+        base_url: Optional[str] = None,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        limiter: Optional[AdaptiveTokenBucket] = None,
+        request_token_budget: int = DEFAULT_REQUEST_TOKEN_BUDGET,
+        max_inputs_per_request: int = MAX_INPUTS_PER_REQUEST,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        retry_base_delay: float = DEFAULT_RETRY_BASE_DELAY_SECONDS,
+        retry_max_delay: float = DEFAULT_RETRY_MAX_DELAY_SECONDS,
+        timeout_seconds: float = DEFAULT_REQUEST_TIMEOUT_SECONDS,
+        tokenizer: Optional[Tokenizer] = None,
+        cache: Optional[EmbeddingCache] = None,
+        dimensions: Optional[int] = None,
+    ):
+        assert max_in_flight > 0, "max_in_flight must be positive"
+        self.model = model
+        self.dimensions = dimensions or DEFAULT_EMBEDDING_DIMENSION
+        self._request_options = {"dimensions": dimensions} if dimensions else {}
+        self.max_in_flight = max_in_flight
+        self.limiter = limiter if limiter is not None else AdaptiveTokenBucket()
+        self.request_token_budget = request_token_budget
+        self.max_inputs_per_request = max_inputs_per_request
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.tokenizer = tokenizer if tokenizer is not None else get_tokenizer()
+        self.cache = cache
+        # Retries are handled here so that they go through the limiter.
+        self._client = AsyncOpenAI(
+            api_key=api_key, base_url=base_url, timeout=timeout_seconds, max_retries=0
+        )
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self.requests_sent = 0
+        self.retries = 0
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(
+            0, min(self.retry_max_delay, self.retry_base_delay * 2**attempt)
+        )
+
+    async def _request(self, texts: Sequence[str], tokens: int) -> List[List[float]]:
+        """Sends one request, retrying transient failures."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self._slots:
+                    # Tokens are taken only once a slot is free, so requests
+                    # queued for a slot cannot burst out after a pause.
+                    await self.limiter.acquire(tokens)
+                    self.requests_sent += 1
+                    raw = await self._client.embeddings.with_raw_response.create(
+                        input=list(texts), model=self.model, **self._request_options
+                    )
+                response = raw.parse()
+                self.limiter.on_success(raw.headers)
+                vectors: List[Optional[List[float]]] = [None] * len(texts)
+                for item in response.data:
+                    vectors[item.index] = item.embedding
+                if any(vector is None for vector in vectors):
+                    raise APIError("Embedding response is missing inputs", None, body=None)
+                return vectors
+            except APIStatusError as e:
+                if _is_too_large(e) or e.status_code not in _RETRYABLE_STATUS_CODES:
+                    raise
+                if attempt == self.max_retries:
+                    raise
+                retry_after = _retry_after_seconds(e)
+                delay = retry_after if retry_after is not None else self._backoff(attempt)
+                if e.status_code == 429:
+                    self.limiter.on_rate_limited(delay, e.response.headers)
+            except APIConnectionError:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+            self.retries += 1
+            await asyncio.sleep(delay)
+        raise AssertionError("unreachable")
+
+    async def _embed_range(
+        self, texts: Sequence[str], token_counts: Sequence[int]
+    ) -> List[List[float]]:
+        try:
+            return await self._request(texts, sum(token_counts))
+        except APIStatusError as e:
+            if not _is_too_large(e):
+                raise
+            if len(texts) == 1:
+                raise EmbeddingRequestTooLargeError(
+                    f"Input of {len(texts[0])} characters rejected as too large: {e}"
+                ) from e
+            middle = len(texts) // 2
+            halves = await asyncio.gather(
+                self._embed_range(texts[:middle], token_counts[:middle]),
+                self._embed_range(texts[middle:], token_counts[middle:]),
+            )
+            return halves[0] + halves[1]
+
+    async def embed(
+        self, texts: Sequence[str], token_counts: Optional[Sequence[int]] = None
+    ) -> List[List[float]]:
+        """Embeds texts with concurrent requests.
+
+        With a cache, only texts missing from it are sent, and each
+        request's results are stored as soon as it completes.
+
+        Returns:
+            One embedding per text, in input order.
+
+        Raises:
+            APIError: On a request that still fails after retries.
+            EmbeddingRequestTooLargeError: If a single input is too large.
+        """
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        if self.cache is not None:
+            for position, vector in enumerate(self.cache.get_many(texts)):
+                if vector is not None:
+                    results[position] = vector.tolist()
+        todo = [position for position, vector in enumerate(results) if vector is None]
+        todo_texts = [texts[position] for position in todo]
+        if token_counts is None:
+            todo_counts = [self.tokenizer.count(text) for text in todo_texts]
+        else:
+            todo_counts = [token_counts[position] for position in todo]
+
+        async def run(start: int, end: int) -> None:
+            vectors = await self._embed_range(
+                todo_texts[start:end], todo_counts[start:end]
+            )
+            for position, vector in zip(todo[start:end], vectors):
+                results[position] = vector
+            if self.cache is not None:
+                self.cache.put_many(todo_texts[start:end], vectors)
+
+        await asyncio.gather(
+            *(
+                run(start, end)
+                for start, end in pack_requests(
+                    todo_counts, self.request_token_budget, self.max_inputs_per_request
+                )
+            )
+        )
+        return results
+
+    async def embed_batches(
+        self, batches: Iterable[Tuple[K, Sequence[str]]]
+    ) -> AsyncIterator[Tuple[K, Optional[List[List[float]]]]]:
+        """Embeds a stream of keyed batches, yielding each one as it completes.
+
+        At most `max_in_flight` batches are started ahead of the consumer, so
+        the batches iterable can be lazy. A batch that fails after retries
+        is logged and yielded with None instead of embeddings.
+
+        Yields:
+            (key, embeddings) in completion order.
+        """
+        batch_iter = iter(batches)
+        pending = set()
+
+        async def run(key: K, texts: Sequence[str]):
+            try:
+                return key, await self.embed(texts)
+            except Exception as e:
+                logger.error(f"[ASYNC_EMBEDDER] Batch {key!r} failed: {type(e).__name__}: {e}")
+                return key, None
+
+        def launch() -> bool:
+            for key, texts in batch_iter:
+                pending.add(asyncio.ensure_future(run(key, texts)))
+                return True
+            return False
+
+        while len(pending) < self.max_in_flight and launch():
+            pass
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    pending.discard(task)
+                    launch()
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def close(self) -> None:
+        await self._client.close()
+
+    async def __aenter__(self) -> "AsyncEmbeddingEngine":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
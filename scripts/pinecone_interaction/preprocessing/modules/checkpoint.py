@@ -0,0 +1,249 @@
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, IO, Iterable, Iterator, List, Optional, Set
+
+from .types import Paper
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_FORMAT_VERSION = 1
+CHECKPOINT_SUFFIX = ".checkpoint.json"
+DEFAULT_COMMIT_EVERY = 10
+
+
+def checkpoint_path_for(output_file: Path) -> Path:
+    """Returns the manifest path kept next to an output file."""
+    return output_file.with_name(output_file.name + CHECKPOINT_SUFFIX)
+
+
+def read_last_record(output_file: Path, block_size: int = 1 << 16) -> Optional[Any]:
+    """Returns the last JSON line of an output file, reading it from the end."""
+    with open(output_file, "rb") as f:
+        position = f.seek(0, os.SEEK_END)
+        tail = b""
+        while position > 0:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            tail = f.read(step) + tail
+            lines = tail.rstrip(b"\n").rsplit(b"\n", 1)
+            if len(lines) == 2 or position == 0:
+                last = lines[-1].strip()
+                return json.loads(last) if last else None
+    return None
+
+
+class IngestCheckpoint:
+    """Manifest of the work that is fully committed to an ingest output file.
+
+    The manifest records the archives that have been processed completely,
+    the paper IDs already handled in archives that are still in progress, and
+    the size of the output file at the last commit. `commit()` fsyncs the
+    output before atomically replacing the manifest, so the manifest never
+    refers to data that is not on disk. On resume, anything written to the
+    output after the last commit (the in-flight batch) is truncated away.
+    Callables in `before_commit` run at the start of every commit, so side
+    outputs (such as a vector store) are durable before the manifest refers
+    to records that point into them. Callables in `after_commit` run once the
+    manifest is replaced, when `is_committed` reflects what is on disk, so
+    state that must only describe committed papers (such as the dedup
+    seen-set) can be persisted then.
+    """
+
+    def __init__(self, output_file: Path):
+        self.output_file = output_file
+        self.path = checkpoint_path_for(output_file)
+        self.completed_tars: Set[str] = set()
+        self.committed_papers: Dict[str, Set[str]] = {}
+        self.output_size = 0
+        self.before_commit: List[Callable[[], None]] = []
+        self.after_commit: List[Callable[[], None]] = []
+        self._extracted_tars: Set[str] = set()  # Read cleanly, maybe still in flight
+
+    @classmethod
+    def load(cls, output_file: Path) -> "IngestCheckpoint":
+        """Loads the manifest for an output file, or returns an empty one.
+
+        Raises:
+            ValueError: If the manifest was written by another format version.
+        """
+        checkpoint = cls(output_file)
+        if not checkpoint.path.is_file():
+            return checkpoint
+
+        with open(checkpoint.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != CHECKPOINT_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported checkpoint version {data.get('version')} in {checkpoint.path}"
+            )
+        checkpoint.completed_tars = set(data["completed_tars"])
+        checkpoint.committed_papers = {
+            tar_name: set(paper_ids)
+            for tar_name, paper_ids in data["committed_papers"].items()
+        }
+        checkpoint.output_size = data["output_size"]
+        logger.info(
+            f"[CHECKPOINT] Loaded {checkpoint.path.name}: {len(checkpoint.completed_tars)} "
+            f"completed archives, {checkpoint.output_size} committed output bytes."
+        )
+        return checkpoint
+
+    def is_committed(self, tar_name: str, paper_id: str) -> bool:
+        """Checks whether a paper's outcome is already part of the output."""
+        if tar_name in self.completed_tars:
+            return True
+        return paper_id in self.committed_papers.get(tar_name, ())
+
+    def mark_paper(self, tar_name: str, paper_id: str) -> None:
+        """Records a handled paper; it becomes durable on the next `commit()`."""
+        self.committed_papers.setdefault(tar_name, set()).add(paper_id)
+
+    def mark_tar_complete(self, tar_name: str) -> None:
+        """Records that every paper of an archive has been handled."""
+        self.completed_tars.add(tar_name)
+        self.committed_papers.pop(tar_name, None)
+
+    def archive_extracted(self, tar_name: str, clean: bool) -> None:
+        """Extractor hook (`on_archive_done`): an archive has been read to its end.
+
+        Only an archive read without errors can later be marked complete; one
+        abandoned on a read error keeps its per-paper entries, so a resumed
+        run opens it again and retries the papers it did not get to.
+        """
+        if clean:
+            self._extracted_tars.add(tar_name)
+        else:
+            logger.warning(
+                f"[CHECKPOINT] {tar_name} was not read to the end; it stays "
+                "incomplete and is retried on resume."
+            )
+
+    def _complete_extracted_tars(self, before: Optional[str] = None) -> None:
+        for tar_name in sorted(self._extracted_tars):
+            if before is not None and tar_name >= before:
+                break
+            self.mark_tar_complete(tar_name)
+            self._extracted_tars.discard(tar_name)
+
+    def open_output(self, resume: bool) -> IO[str]:
+        """Opens the output file for writing.
+
+        When resuming, the output is truncated to the last committed size and
+        opened for appending; otherwise it is recreated and the manifest reset.
+        """
+        if not resume or not self.output_file.exists():
+            self.completed_tars.clear()
+            self.committed_papers.clear()
+            self.output_size = 0
+            return open(self.output_file, "w", encoding="utf-8")
+
+        actual_size = self.output_file.stat().st_size
+        if actual_size > self.output_size:
+            logger.info(
+                f"[CHECKPOINT] Discarding {actual_size - self.output_size} uncommitted "
+                f"bytes from {self.output_file.name}."
+            )
+            with open(self.output_file, "r+b") as f:
+                f.truncate(self.output_size)
+        elif actual_size < self.output_size:
+            raise ValueError(
+                f"{self.output_file} is shorter than its checkpoint "
+                f"({actual_size} < {self.output_size} bytes); cannot resume."
+            )
+        return open(self.output_file, "a", encoding="utf-8")
+
+    def commit(self, f_out: IO[str]) -> None:
+        """Makes the output durable and atomically rewrites the manifest."""
+        for hook in self.before_commit:
+            hook()
+        f_out.flush()
+        os.fsync(f_out.fileno())
+        self.output_size = os.fstat(f_out.fileno()).st_size
+
+        data = {
+            "version": CHECKPOINT_FORMAT_VERSION,
+            "output_file": self.output_file.name,
+            "output_size": self.output_size,
+            "completed_tars": sorted(self.completed_tars),
+            "committed_papers": {
+                tar_name: sorted(paper_ids)
+                for tar_name, paper_ids in self.committed_papers.items()
+            },
+        }
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        logger.debug(f"[CHECKPOINT] Committed {self.output_size} output bytes.")
+        for hook in self.after_commit:
+            hook()
+
+    @property
+    def skip_tar_filenames(self) -> List[str]:
+        """Archives the extractor does not need to open again."""
+        return sorted(self.completed_tars)
+
+    def skip_committed(self, papers: Iterable[Paper]) -> Iterator[Paper]:
+        """Drops the papers whose outcome is already part of the output."""
+        for paper in papers:
+            if not self.is_committed(paper.source_tar_filename or "", paper.paper_id):
+                yield paper
+
+    def track(
+        self,
+        papers: Iterable[Paper],
+        f_out: IO[str],
+        commit_every: int = DEFAULT_COMMIT_EVERY,
+    ) -> Iterator[Paper]:
+        """Checkpoints papers as they are consumed.
+
+        A paper counts as handled once the consumer asks for the next one, so
+        every outcome of the consuming loop (written or skipped) is recorded
+        without changes to the loop body, while a paper whose processing
+        raised is not. Apply it after any stage that reads ahead (such as the
+        parallel PDF parser), so papers still in flight there are not counted
+        as handled; filter committed papers out earlier, with
+        `skip_committed`.
+
+        An archive is marked complete once the extractor has read it cleanly
+        (see `archive_extracted`) and a paper of a later archive, or the end
+        of the stream, has arrived here. This relies on archives being
+        extracted one after another in sorted name order (serial or ordered
+        mode). Papers dropped upstream (e.g. as duplicates) are never tracked
+        one by one; they are covered when their archive completes.
+
+        Args:
+            papers: Papers that are not yet committed.
+            f_out: The output file returned by `open_output`.
+            commit_every: Number of handled papers between commits.
+
+        Yields:
+            The input papers.
+        """
+        assert commit_every > 0, "commit_every must be positive"
+        pending: Optional[Paper] = None
+        handled_since_commit = 0
+
+        for paper in papers:
+            if pending is not None:
+                self.mark_paper(pending.source_tar_filename or "", pending.paper_id)
+                handled_since_commit += 1
+                pending = None
+
+            self._complete_extracted_tars(before=paper.source_tar_filename or "")
+            if handled_since_commit >= commit_every:
+                self.commit(f_out)
+                handled_since_commit = 0
+
+            pending = paper
+            yield paper
+
+        if pending is not None:
+            self.mark_paper(pending.source_tar_filename or "", pending.paper_id)
+        self._complete_extracted_tars()
+        self.commit(f_out)
@@ -0,0 +1,266 @@
+import hashlib
+import logging
+import re
+import sqlite3
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIMILARITY_THRESHOLD = 0.9  # Estimated Jaccard similarity of shingles
+DEFAULT_NUM_PERMUTATIONS = 128
+DEFAULT_NUM_BANDS = 32  # 4 rows per band: ~0.99 recall at 0.9 similarity
+DEFAULT_SHINGLE_WORDS = 3
+DEFAULT_COMMIT_EVERY = 1000  # Index inserts between SQLite commits
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_PERMUTATION_SEED = 1  # Fixed so signatures stay comparable across runs
+_WORD = re.compile(r"\w+")
+
+
+def chunk_key(paper_id: str, start: int, end: int) -> str:
+    """Returns the key of a chunk: its paper and character span."""
+    return f"{paper_id}:{start}-{end}"
+
+
+def _bucket_id(band_bytes: bytes) -> int:
+    digest = hashlib.blake2b(band_bytes, digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)  # Fits an SQLite INTEGER
+
+
+class ChunkAlias(NamedTuple):
+    """A chunk dropped as a near-duplicate of an already indexed one."""
+
+    key: str
+    canonical_key: str
+    similarity: float
+
+
+@dataclass
+class ChunkDedupStats:
+    """Counters reported by the chunk deduplication stage."""
+
+    checked: int = 0
+    unique: int = 0
+    aliased: int = 0
+    discarded: int = 0  # Checked, then removed by `discard`
+
+
+class ChunkDeduplicator:
+    """Drops chunks that are near-duplicates of chunks already embedded.
+
+    Each chunk gets a MinHash signature over its lower-cased word shingles.
+    The signature is split into bands that are stored as buckets in a
+    SQLite index, so candidates are found by a few indexed lookups
+    (locality-sensitive hashing) rather than by comparing against every
+    stored chunk. A candidate whose signature agrees in at least
+    `threshold` of its positions is treated as the same text: the new chunk
+    is not indexed, and an alias to the canonical chunk is recorded in the
+    index for provenance. With a path the index persists across runs;
+    without one it lives in memory for the current run.
+    """
+
+    def __init__(
+        self,
+        index_path: Optional[Path] = None,
+        threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+        num_permutations: int = DEFAULT_NUM_PERMUTATIONS,
+        num_bands: int = DEFAULT_NUM_BANDS,
+        shingle_words: int = DEFAULT_SHINGLE_WORDS,
+        commit_every: int = DEFAULT_COMMIT_EVERY,
+    ):
+        assert 0.0 < threshold <= 1.0, "threshold must be in (0, 1]"
+        assert num_permutations % num_bands == 0, "num_bands must divide num_permutations"
+        self.threshold = threshold
+        self.num_bands = num_bands
+        self.rows_per_band = num_permutations // num_bands
+        self.shingle_words = shingle_words
+        self.commit_every = commit_every
+        self.stats = ChunkDedupStats()
+
+        rng = np.random.RandomState(_PERMUTATION_SEED)
+        self._perm_a = rng.randint(1, _MERSENNE_PRIME, num_permutations).astype(np.uint64)
+        self._perm_b = rng.randint(0, _MERSENNE_PRIME, num_permutations).astype(np.uint64)
+
+        self._db = sqlite3.connect(str(index_path) if index_path is not None else ":memory:")
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS chunks (key TEXT PRIMARY KEY, signature BLOB);
+            CREATE TABLE IF NOT EXISTS buckets (band INTEGER, bucket INTEGER, key TEXT);
+            CREATE INDEX IF NOT EXISTS buckets_lookup ON buckets (band, bucket);
+            CREATE INDEX IF NOT EXISTS buckets_key ON buckets (key);
+            CREATE TABLE IF NOT EXISTS aliases (
+                key TEXT PRIMARY KEY, canonical_key TEXT, similarity REAL
+            );
+            """
+        )
+        self._check_settings(num_permutations)
+        self._pending_writes = 0
+
+    def _check_settings(self, num_permutations: int) -> None:
+        """Refuses an existing index built with incompatible signatures."""
+        settings = (
+            f"perm={num_permutations},bands={self.num_bands},"
+            f"shingle={self.shingle_words},seed={_PERMUTATION_SEED}"
+        )
+        row = self._db.execute("SELECT value FROM meta WHERE name = 'settings'").fetchone()
+        if row is None:
+            self._db.execute("INSERT INTO meta VALUES ('settings', ?)", (settings,))
+            self._db.commit()
+        elif row[0] != settings:
+            raise ValueError(
+                f"Chunk dedup index was built with {row[0]}, not {settings}"
+            )
+
+    def signature(self, text: str) -> np.ndarray:
+        """Computes the MinHash signature of a text's word shingles."""
+        words = _WORD.findall(text.lower())
+        n = self.shingle_words
+        if len(words) > n:
+            shingles = {" ".join(words[i : i + n]) for i in range(len(words) - n + 1)}
+        else:
+            shingles = {" ".join(words)}
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in shingles),
+            dtype=np.uint64,
+            count=len(shingles),
+        ) % np.uint64(_MERSENNE_PRIME)
+        permuted = (
+            self._perm_a[:, None] * hashes[None, :] + self._perm_b[:, None]
+        ) % np.uint64(_MERSENNE_PRIME)
+        return permuted.min(axis=1).astype(np.uint32)
+
+    def _band_buckets(self, signature: np.ndarray) -> List[Tuple[int, int]]:
+        bands = signature.reshape(self.num_bands, self.rows_per_band)
+        return [
+            (band, _bucket_id(rows.tobytes())) for band, rows in enumerate(bands)
+        ]
+
+    def _best_match(
+        self, key: str, signature: np.ndarray, buckets: List[Tuple[int, int]]
+    ) -> Optional[Tuple[str, float]]:
+        candidates = set()
+        for band, bucket in buckets:
+            candidates.update(
+                row[0]
+                for row in self._db.execute(
+                    "SELECT key FROM buckets WHERE band = ? AND bucket = ?", (band, bucket)
+                )
+            )
+        candidates.discard(key)
+
+        best: Optional[Tuple[str, float]] = None
+        for candidate in candidates:
+            row = self._db.execute(
+                "SELECT signature FROM chunks WHERE key = ?", (candidate,)
+            ).fetchone()
+            other = np.frombuffer(row[0], dtype=np.uint32)
+            similarity = float(np.mean(other == signature))
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (candidate, similarity)
+        return best
+
+    def check(self, key: str, text: str) -> Optional[ChunkAlias]:
+        """Indexes a chunk unless it is a near-duplicate of an indexed one.
+
+        Checking a key that is already indexed (e.g. a paper re-processed on
+        resume) never matches the chunk against itself.
+
+        Args:
+            key: Unique key of the chunk, see `chunk_key`.
+            text: The chunk's text.
+
+        Returns:
+            None if the chunk is new (it is now indexed), otherwise the
+            alias to the chunk it duplicates (now recorded).
+        """
+        self.stats.checked += 1
+        signature = self.signature(text)
+        buckets = self._band_buckets(signature)
+        match = self._best_match(key, signature, buckets)
+
+        if match is not None:
+            alias = ChunkAlias(key, match[0], match[1])
+            self._db.execute(
+                "INSERT OR REPLACE INTO aliases VALUES (?, ?, ?)", alias
+            )
+            self.stats.aliased += 1
+        else:
+            alias = None
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO chunks VALUES (?, ?)", (key, signature.tobytes())
+            )
+            if cursor.rowcount:
+                self._db.executemany(
+                    "INSERT INTO buckets VALUES (?, ?, ?)",
+                    [(band, bucket, key) for band, bucket in buckets],
+                )
+            self.stats.unique += 1
+
+        self._pending_writes += 1
+        if self._pending_writes >= self.commit_every:
+            self._db.commit()
+            self._pending_writes = 0
+        return alias
+
+    def filter(
+        self, keys: Sequence[str], texts: Sequence[str]
+    ) -> Tuple[List[int], List[Tuple[int, ChunkAlias]]]:
+        """Checks the chunks of one document in order.
+
+        Returns:
+            The positions of the chunks to embed, and (position, alias)
+            pairs for the rest.
+        """
+        kept: List[int] = []
+        aliased: List[Tuple[int, ChunkAlias]] = []
+        for position, (key, text) in enumerate(zip(keys, texts)):
+            alias = self.check(key, text)
+            if alias is None:
+                kept.append(position)
+            else:
+                aliased.append((position, alias))
+        return kept, aliased
+
+    def discard(self, keys: Sequence[str]) -> None:
+        """Removes checked chunks from the index, e.g. when embedding them failed.
+
+        A chunk that stayed indexed without an embedding would make every
+        later duplicate of it an alias of a vector that was never stored.
+        """
+        rows = [(key,) for key in keys]
+        self._db.executemany("DELETE FROM chunks WHERE key = ?", rows)
+        self._db.executemany("DELETE FROM buckets WHERE key = ?", rows)
+        self._db.executemany("DELETE FROM aliases WHERE key = ?", rows)
+        self._db.commit()
+        self._pending_writes = 0
+        self.stats.discarded += len(rows)
+
+    def aliases_of(self, canonical_key: str) -> List[ChunkAlias]:
+        """Returns the chunks recorded as duplicates of a canonical chunk."""
+        return [
+            ChunkAlias(*row)
+            for row in self._db.execute(
+                "SELECT key, canonical_key, similarity FROM aliases WHERE canonical_key = ?",
+                (canonical_key,),
+            )
+        ]
+
+    def close(self) -> None:
+        self._db.commit()
+        self._db.close()
+        logger.info(
+            f"[CHUNK_DEDUP] Checked {self.stats.checked} chunks: {self.stats.unique} unique, "
+            f"{self.stats.aliased} aliased."
+        )
+
+    def __enter__(self) -> "ChunkDeduplicator":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -1,5 +1,22 @@
 import logging
-from typing import List
+import re
+from array import array
+
+import numpy as np
+from typing import (
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    TextIO,
+    Tuple,
+    Union,
+    overload,
+)
+
+from .tokenizer import Tokenizer, get_tokenizer
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -9,9 +26,74 @@ logging.basicConfig(
 CHUNK_SIZE = 512
 CHUNK_OVERLAP = 50
 
+CHUNK_MAX_TOKENS = 256  # Token budget of a sentence-aware chunk
+CHUNK_OVERLAP_SENTENCES = 1  # Sentences repeated at the start of the next chunk
 
-def chunk_text_fixed_size(text: str, chunk_size: int, chunk_overlap: int) -> List[str]:
-    """Chunks the text into fixed-size overlapping segments.
+DEFAULT_STREAM_BLOCK_SIZE = 64 * 1024  # Characters read at a time from a text stream
+
+
+class TextChunks(Sequence[str]):
+    """Chunks of a text held as (start, end) character offsets into it.
+
+    Only two arrays of integers are stored per document; a chunk's text is
+    sliced from the parent text when it is indexed or iterated, so it exists
+    only while the embedder or writer is using it. The offsets are the
+    character positions that `LlmMatch.startIndex/endIndex` refer to.
+    """
+
+    __slots__ = ("text", "starts", "ends", "token_counts")
+
+    def __init__(
+        self,
+        text: str,
+        starts: array,
+        ends: array,
+        token_counts: Optional[array] = None,
+    ):
+        assert len(starts) == len(ends), "starts and ends must have equal length"
+        self.text = text
+        self.starts = starts
+        self.ends = ends
+        self.token_counts = token_counts  # Set by token-budgeted chunkers
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    @overload
+    def __getitem__(self, index: int) -> str: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[str]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[str, List[str]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return self.text[self.starts[index] : self.ends[index]]
+
+    def __iter__(self) -> Iterator[str]:
+        text = self.text
+        for start, end in zip(self.starts, self.ends):
+            yield text[start:end]
+
+    def span(self, index: int) -> Tuple[int, int]:
+        """Returns the (start, end) offsets of a chunk, end exclusive."""
+        return self.starts[index], self.ends[index]
+
+    def spans(self) -> List[Tuple[int, int]]:
+        """Returns the offsets of all chunks, e.g. for serialisation."""
+        return list(zip(self.starts, self.ends))
+
+    def __repr__(self) -> str:
+        return f"<TextChunks count={len(self)} text_length={len(self.text)}>"
+
+
+def chunk_spans_fixed_size(
+    text: str, chunk_size: int, chunk_overlap: int
+) -> TextChunks:
+    """Computes fixed-size overlapping chunks as offsets into the text.
+
+    Produces the same chunks as `chunk_text_fixed_size` without copying
+    any text.
 
     Args:
         text (str): The input text to be chunked.
@@ -19,39 +101,424 @@ def chunk_text_fixed_size(text: str, chunk_size: int, chunk_overlap: int) -> Lis
         chunk_overlap (int): The number of overlapping characters between consecutive chunks.
 
     Returns:
-        List[str]: A list of text chunks.
+        TextChunks: The chunks of the text.
 
     Raises:
         AssertionError: If chunk_size is not positive, or if overlap is negative
                         or greater than or equal to chunk_size.
     """
     if not text:
-        return []
+        return TextChunks(text, array("q"), array("q"))
 
     assert chunk_size > 0, "Chunk size must be positive."
     assert chunk_overlap >= 0, "Overlap cannot be negative."
     assert chunk_overlap < chunk_size, "Overlap must be less than chunk size."
 
-    chunks = []
-    start_index = 0
     text_len = len(text)
     step = chunk_size - chunk_overlap
+    starts = array("q", range(0, text_len, step))
+    ends = array("q", (min(start + chunk_size, text_len) for start in starts))
+    return TextChunks(text, starts, ends)
+
+
+def chunk_text_fixed_size(text: str, chunk_size: int, chunk_overlap: int) -> List[str]:
+    """Chunks the text into fixed-size overlapping segments.
+
+    Args:
+        text (str): The input text to be chunked.
+        chunk_size (int): The desired size of each chunk in characters.
+        chunk_overlap (int): The number of overlapping characters between consecutive chunks.
+
+    Returns:
+        List[str]: A list of text chunks.
+
+    Raises:
+        AssertionError: If chunk_size is not positive, or if overlap is negative
+                        or greater than or equal to chunk_size.
+    """
+    return list(chunk_spans_fixed_size(text, chunk_size, chunk_overlap))
+
+
+def _iter_text_blocks(
+    source: Union[str, TextIO, Iterable[str]], block_size: int
+) -> Iterator[str]:
+    if isinstance(source, str):
+        yield source
+    elif hasattr(source, "read"):
+        while True:
+            block = source.read(block_size)
+            if not block:
+                return
+            yield block
+    else:
+        yield from source
+
+
+def iter_chunks_fixed_size(
+    source: Union[str, TextIO, Iterable[str]],
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP,
+    block_size: int = DEFAULT_STREAM_BLOCK_SIZE,
+) -> Iterator[Tuple[int, int, str]]:
+    """Lazily yields fixed-size overlapping chunks of a text or text stream.
+
+    The source can be a string, a file-like object opened in text mode, or
+    any iterable of string pieces (e.g. a generator of converted pages). Only
+    the characters of the chunk being assembled and of the block being read
+    are held, so memory does not grow with the length of the document. The
+    chunks are the same as those of `chunk_text_fixed_size` on the whole text.
+
+    Args:
+        source: The text, or a stream of it.
+        chunk_size (int): The desired size of each chunk in characters.
+        chunk_overlap (int): The number of overlapping characters between consecutive chunks.
+        block_size (int): Characters read per call from a file-like source.
+
+    Yields:
+        (start, end, chunk_text) tuples, with offsets into the whole text.
+
+    Raises:
+        AssertionError: If chunk_size is not positive, or if overlap is negative
+                        or greater than or equal to chunk_size.
+    """
+    assert chunk_size > 0, "Chunk size must be positive."
+    assert chunk_overlap >= 0, "Overlap cannot be negative."
+    assert chunk_overlap < chunk_size, "Overlap must be less than chunk size."
+    step = chunk_size - chunk_overlap
+
+    buffer = ""
+    buffer_start = 0  # Offset of buffer[0] in the whole text
+    next_start = 0
+    for block in _iter_text_blocks(source, block_size):
+        buffer += block
+        while next_start + chunk_size <= buffer_start + len(buffer):
+            offset = next_start - buffer_start
+            yield next_start, next_start + chunk_size, buffer[offset : offset + chunk_size]
+            next_start += step
+        if next_start > buffer_start:
+            buffer = buffer[next_start - buffer_start :]
+            buffer_start = next_start
 
-    while start_index < text_len:
-        end_index = start_index + chunk_size
+    text_length = buffer_start + len(buffer)
+    while next_start < text_length:
+        offset = next_start - buffer_start
+        yield next_start, text_length, buffer[offset:]
+        next_start += step
+
+
+class ChunkBatch:
+    """Chunks of many documents as columnar arrays.
+
+    Row `i` is chunk `chunk_ids[i]` (its position within its document) of
+    document `doc_indices[i]`, spanning `texts[doc][starts[i]:ends[i]]`.
+    Rows are grouped by document in input order, so the row number doubles
+    as a global chunk ID. There is no Python object per chunk; text is
+    sliced only when asked for.
+    """
 
-        chunk = text[start_index:end_index]
-        chunks.append(chunk)
+    __slots__ = ("texts", "doc_indices", "starts", "ends", "chunk_ids")
 
-        start_index += step
+    def __init__(
+        self,
+        texts: Sequence[str],
+        doc_indices: np.ndarray,
+        starts: np.ndarray,
+        ends: np.ndarray,
+        chunk_ids: np.ndarray,
+    ):
+        self.texts = texts
+        self.doc_indices = doc_indices
+        self.starts = starts
+        self.ends = ends
+        self.chunk_ids = chunk_ids
 
-        if start_index >= text_len and len(chunks[-1]) < chunk_overlap:
+    def __len__(self) -> int:
+        return len(self.starts)
 
-            pass
+    def text(self, row: int) -> str:
+        """Materialises the text of one chunk."""
+        return self.texts[self.doc_indices[row]][self.starts[row] : self.ends[row]]
 
-    return chunks
+    def iter_texts(self, start_row: int = 0, end_row: Optional[int] = None) -> Iterator[str]:
+        """Yields the texts of a range of rows, e.g. one embedding batch."""
+        end_row = len(self) if end_row is None else min(end_row, len(self))
+        texts = self.texts
+        for doc, start, end in zip(
+            self.doc_indices[start_row:end_row].tolist(),
+            self.starts[start_row:end_row].tolist(),
+            self.ends[start_row:end_row].tolist(),
+        ):
+            yield texts[doc][start:end]
+
+    def document_rows(self, doc_index: int) -> slice:
+        """Returns the rows holding the chunks of one document."""
+        first = int(np.searchsorted(self.doc_indices, doc_index, side="left"))
+        last = int(np.searchsorted(self.doc_indices, doc_index, side="right"))
+        return slice(first, last)
+
+    def __repr__(self) -> str:
+        return f"<ChunkBatch documents={len(self.texts)} chunks={len(self)}>"
+
+
+def chunk_batch_fixed_size(
+    texts: Sequence[str],
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP,
+) -> ChunkBatch:
+    """Computes fixed-size overlapping chunks of many documents at once.
+
+    The windows of all documents are derived from their lengths with a few
+    vectorised NumPy operations; each document gets the same chunks as
+    `chunk_spans_fixed_size` would give it. Empty documents get none.
+
+    Args:
+        texts: The documents to be chunked.
+        chunk_size (int): The desired size of each chunk in characters.
+        chunk_overlap (int): The number of overlapping characters between consecutive chunks.
+
+    Returns:
+        ChunkBatch: Columnar chunk offsets for all documents.
+
+    Raises:
+        AssertionError: If chunk_size is not positive, or if overlap is negative
+                        or greater than or equal to chunk_size.
+    """
+    assert chunk_size > 0, "Chunk size must be positive."
+    assert chunk_overlap >= 0, "Overlap cannot be negative."
+    assert chunk_overlap < chunk_size, "Overlap must be less than chunk size."
+    step = chunk_size - chunk_overlap
+
+    lengths = np.fromiter((len(text) for text in texts), dtype=np.int64, count=len(texts))
+    chunk_counts = -(-lengths // step)  # ceil(length / step); 0 for empty texts
+    total = int(chunk_counts.sum())
+
+    doc_indices = np.repeat(np.arange(len(texts), dtype=np.int32), chunk_counts)
+    first_rows = np.cumsum(chunk_counts) - chunk_counts
+    chunk_ids = np.arange(total, dtype=np.int64) - np.repeat(first_rows, chunk_counts)
+    starts = chunk_ids * step
+    ends = np.minimum(starts + chunk_size, np.repeat(lengths, chunk_counts))
+    return ChunkBatch(texts, doc_indices, starts, ends, chunk_ids.astype(np.int32))
 
 
 def create_text_chunks(text: str) -> List[str]:
     """Creates text chunks using the default fixed-size strategy."""
     return chunk_text_fixed_size(text, CHUNK_SIZE, CHUNK_OVERLAP)
+
+
+def create_chunk_spans(text: str) -> TextChunks:
+    """Creates offset-based text chunks using the default fixed-size strategy."""
+    return chunk_spans_fixed_size(text, CHUNK_SIZE, CHUNK_OVERLAP)
+
+
+class _Unit(NamedTuple):
+    start: int
+    end: int
+    tokens: int
+    is_heading: bool
+
+
+_PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n\s*")
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])[\"')\]]*\s+(?=[\"'(\[]?[A-Z0-9§])")
+_WORD = re.compile(r"\S+")
+_MAX_HEADING_CHARS = 100
+_MAX_HEADING_WORDS = 12
+_SECTION_NUMBER = re.compile(r"(?:\d{1,2}(?:\.\d{1,2})*\.?|(?P<roman>[IVX]{1,4})\.)\s+")
+_SECTION_NAMES = frozenset(
+    {
+        "abstract", "introduction", "background", "related work", "preliminaries",
+        "method", "methods", "methodology", "approach", "experiments",
+        "experimental setup", "evaluation", "results", "discussion",
+        "limitations", "future work", "conclusion", "conclusions", "summary",
+        "acknowledgments", "acknowledgements", "references", "bibliography",
+        "appendix",
+    }
+)
+
+
+def _is_heading(line: str) -> bool:
+    """Recognises section headings as converted by pylatexenc, the stripper or pypdf.
+
+    Lines starting with pylatexenc's "§" marker are headings. Other lines
+    must be short and unpunctuated, and also either a common section name
+    ("Related Work"), several words in capitals ("RELATED WORK"), or
+    numbered ("3.1 Training"). Short lines that are only capitalised, such as author names,
+    figure labels or table cells, are not headings.
+    """
+    if line.startswith("§"):
+        return True
+    if len(line) > _MAX_HEADING_CHARS or "\n" in line or line[-1] in ".!?:;,":
+        return False
+
+    number = _SECTION_NUMBER.match(line)
+    title = line[number.end() :] if number else line
+    words = title.split()
+    if not words or len(words) > _MAX_HEADING_WORDS or not title[0].isalpha():
+        return False
+    if title.lower() in _SECTION_NAMES:
+        return True
+    if title.isupper() and len(words) > 1:  # Not a lone acronym
+        return True
+    # Roman numerals look like initials ("I. Newton"), so they need the above.
+    return number is not None and number.group("roman") is None and title[0].isupper()
+
+
+def _iter_spans(text: str, separator: "re.Pattern", start: int, end: int):
+    """Yields the whitespace-trimmed spans of text[start:end] between separators."""
+    pos = start
+    for match in separator.finditer(text, start, end):
+        yield pos, match.start()
+        pos = match.end()
+    yield pos, end
+
+
+def _trimmed(text: str, start: int, end: int) -> Optional[Tuple[int, int]]:
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return (start, end) if start < end else None
+
+
+def _sentence_units(
+    text: str, max_tokens: int, tokenizer: Tokenizer
+) -> Iterator[_Unit]:
+    """Splits text into headings and sentences, each within the token budget.
+
+    Sentences over the budget are split further on word boundaries, and
+    words over it by length.
+    """
+    for para_start, para_end in _iter_spans(text, _PARAGRAPH_BREAK, 0, len(text)):
+        span = _trimmed(text, para_start, para_end)
+        if span is None:
+            continue
+        # pylatexenc puts a heading and its section's first line in one paragraph.
+        line_end = span[1]
+        if text.startswith("§", span[0]):
+            newline = text.find("\n", *span)
+            line_end = newline if newline != -1 else line_end
+        heading = _trimmed(text, span[0], line_end)
+        if _is_heading(text[heading[0] : heading[1]]):
+            yield _Unit(*heading, tokenizer.count(text[heading[0] : heading[1]]), True)
+            span = _trimmed(text, line_end, span[1])
+            if span is None:
+                continue
+
+        for sent_start, sent_end in _iter_spans(text, _SENTENCE_BREAK, *span):
+            sentence = _trimmed(text, sent_start, sent_end)
+            if sentence is None:
+                continue
+            tokens = tokenizer.count(text[sentence[0] : sentence[1]])
+            if tokens <= max_tokens:
+                yield _Unit(sentence[0], sentence[1], tokens, False)
+                continue
+
+            piece_start, piece_end, piece_tokens = None, None, 0
+            for word in _WORD.finditer(text, *sentence):
+                word_tokens = tokenizer.count(word.group())
+                if piece_start is not None and piece_tokens + word_tokens > max_tokens:
+                    yield _Unit(piece_start, piece_end, piece_tokens, False)
+                    piece_start, piece_tokens = None, 0
+                if word_tokens > max_tokens:
+                    # A "word" such as a long URL or base64 blob: cut by length.
+                    step = max(1, len(word.group()) * max_tokens // word_tokens)
+                    for start in range(word.start(), word.end(), step):
+                        end = min(start + step, word.end())
+                        yield _Unit(start, end, tokenizer.count(text[start:end]), False)
+                    continue
+                if piece_start is None:
+                    piece_start = word.start()
+                piece_end = word.end()
+                piece_tokens += word_tokens
+            if piece_start is not None:
+                yield _Unit(piece_start, piece_end, piece_tokens, False)
+
+
+def iter_chunk_spans_by_sentence(
+    text: str,
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap_sentences: int = CHUNK_OVERLAP_SENTENCES,
+    tokenizer: Optional[Tokenizer] = None,
+) -> Iterator[Tuple[int, int, int]]:
+    """Lazily packs whole sentences into chunks of up to `max_tokens` tokens.
+
+    Paragraphs are split into sentences, which are added to the current
+    chunk until the next one would exceed the budget. A section heading
+    always starts a new chunk, so no chunk spans two sections. The last
+    `overlap_sentences` sentences of a chunk are repeated at the start of
+    the next one in the same section, as long as they leave room for new
+    text. Only sentences longer than the whole budget are cut, at word
+    boundaries where possible.
+
+    Token counts are the sum of the counts of the chunk's sentences, which
+    can differ from a count of the joined text by a token or so per sentence.
+
+    Args:
+        text: The input text to be chunked.
+        max_tokens: Token budget per chunk.
+        overlap_sentences: Sentences shared between consecutive chunks.
+        tokenizer: Token counter (defaults to `get_tokenizer()`).
+
+    Yields:
+        (start, end, token_count) for each chunk, as soon as it is complete.
+    """
+    assert max_tokens > 0, "max_tokens must be positive."
+    assert overlap_sentences >= 0, "overlap_sentences cannot be negative."
+    effective_tokenizer = tokenizer if tokenizer is not None else get_tokenizer()
+
+    current: List[_Unit] = []
+    current_tokens = 0
+    has_new_text = False  # Whether the chunk holds more than carried overlap
+
+    for unit in _sentence_units(text, max_tokens, effective_tokenizer):
+        if unit.is_heading or current_tokens + unit.tokens > max_tokens:
+            if has_new_text:
+                yield current[0].start, current[-1].end, current_tokens
+            carried: List[_Unit] = []
+            if not unit.is_heading and overlap_sentences:
+                carried = [u for u in current[-overlap_sentences:] if not u.is_heading]
+                while carried and sum(u.tokens for u in carried) + unit.tokens > max_tokens:
+                    carried.pop(0)
+            current = carried
+            current_tokens = sum(u.tokens for u in carried)
+            has_new_text = False
+        current.append(unit)
+        current_tokens += unit.tokens
+        has_new_text = True
+    if has_new_text:
+        yield current[0].start, current[-1].end, current_tokens
+
+
+def chunk_spans_by_sentence(
+    text: str,
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap_sentences: int = CHUNK_OVERLAP_SENTENCES,
+    tokenizer: Optional[Tokenizer] = None,
+) -> TextChunks:
+    """Collects `iter_chunk_spans_by_sentence` into TextChunks.
+
+    Returns:
+        TextChunks with `token_counts` set.
+    """
+    starts, ends, token_counts = array("q"), array("q"), array("q")
+    for start, end, tokens in iter_chunk_spans_by_sentence(
+        text, max_tokens, overlap_sentences, tokenizer
+    ):
+        starts.append(start)
+        ends.append(end)
+        token_counts.append(tokens)
+    return TextChunks(text, starts, ends, token_counts)
+
+
+def chunk_text_by_sentence(
+    text: str,
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap_sentences: int = CHUNK_OVERLAP_SENTENCES,
+    tokenizer: Optional[Tokenizer] = None,
+) -> List[str]:
+    """Sentence- and section-aware counterpart of `chunk_text_fixed_size`."""
+    return list(chunk_spans_by_sentence(text, max_tokens, overlap_sentences, tokenizer))
+
+
+def create_sentence_chunks(text: str) -> TextChunks:
+    """Creates token-budgeted chunks on sentence and section boundaries."""
+    return chunk_spans_by_sentence(text, CHUNK_MAX_TOKENS, CHUNK_OVERLAP_SENTENCES)
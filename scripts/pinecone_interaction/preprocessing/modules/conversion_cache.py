@@ -0,0 +1,140 @@
+import hashlib
+import logging
+import os
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_MAX_BYTES = 2 * 1024**3  # 2 GiB of compressed text
+DEFAULT_COMPRESSION_LEVEL = 6
+CACHE_ENTRY_SUFFIX = ".txt.z"
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+
+class ConversionCache:
+    """Content-addressed on-disk cache of LaTeX-to-text conversion results.
+
+    An entry is keyed by the SHA-256 of the converter configuration and the
+    raw LaTeX, so it is reused whenever the same source is converted with the
+    same settings, whatever else about the run changed, and never reused when
+    either changes. Entries are zlib-compressed files under two levels of
+    hex-named subdirectories. The total compressed size is capped at
+    `max_bytes`: the least recently used entries (by file mtime, which is
+    touched on every hit) are evicted first. Writes are atomic, so
+    concurrent readers never see a partial entry.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        max_bytes: int = DEFAULT_CACHE_MAX_BYTES,
+        compression_level: int = DEFAULT_COMPRESSION_LEVEL,
+    ):
+        assert max_bytes > 0, "max_bytes must be positive"
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.compression_level = compression_level
+        self.stats = CacheStats()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        # Entry path -> compressed size, least recently used first.
+        self._entries: "OrderedDict[Path, int]" = OrderedDict()
+        self._total_bytes = 0
+        self._load_entries()
+        self._evict()
+
+    def _load_entries(self) -> None:
+        found = []
+        for path in self.cache_dir.glob(f"*/*/*{CACHE_ENTRY_SUFFIX}"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            found.append((stat.st_mtime_ns, path, stat.st_size))
+        for _, path, size in sorted(found):
+            self._entries[path] = size
+            self._total_bytes += size
+        logger.info(
+            f"[CONVERSION_CACHE] Opened {self.cache_dir}: {len(self._entries)} entries, "
+            f"{self._total_bytes} bytes."
+        )
+
+    @staticmethod
+    def key_for(raw_text: str, converter_config: str) -> str:
+        """Returns the cache key of a conversion input under a converter config."""
+        digest = hashlib.sha256()
+        digest.update(converter_config.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(raw_text.encode("utf-8", errors="surrogatepass"))
+        return digest.hexdigest()
+
+    def _path_for(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / key[2:4] / f"{key}{CACHE_ENTRY_SUFFIX}"
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached text for a key, or None on a miss."""
+        path = self._path_for(key)
+        if path not in self._entries:
+            self.stats.misses += 1
+            return None
+        try:
+            with open(path, "rb") as f:
+                text = zlib.decompress(f.read()).decode("utf-8")
+            os.utime(path, None)
+        except (OSError, zlib.error, UnicodeDecodeError) as e:
+            logger.warning(f"[CONVERSION_CACHE] Dropping unreadable entry {path.name}: {e}")
+            self._remove(path)
+            self.stats.misses += 1
+            return None
+        self._entries.move_to_end(path)
+        self.stats.hits += 1
+        return text
+
+    def put(self, key: str, text: str) -> None:
+        """Stores the text for a key, evicting old entries to stay under the cap."""
+        path = self._path_for(key)
+        data = zlib.compress(text.encode("utf-8"), self.compression_level)
+        if len(data) > self.max_bytes:
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{time.monotonic_ns()}.tmp")
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"[CONVERSION_CACHE] Could not write entry {path.name}: {e}")
+            tmp_path.unlink(missing_ok=True)
+            return
+
+        self._total_bytes += len(data) - self._entries.pop(path, 0)
+        self._entries[path] = len(data)
+        self._evict()
+
+    def _remove(self, path: Path) -> None:
+        self._total_bytes -= self._entries.pop(path, 0)
+        path.unlink(missing_ok=True)
+
+    def _evict(self) -> None:
+        while self._total_bytes > self.max_bytes and self._entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.stats.evictions += 1
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -1,8 +1,19 @@
+import json
 import logging
-from typing import Optional
+import multiprocessing
+import multiprocessing.connection
+import signal
+import time
+from collections import deque
+from dataclasses import dataclass
+from multiprocessing.connection import Connection
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 from pathlib import Path
 from pylatexenc.latex2text import LatexNodes2Text
+from pylatexenc.version import version_str as PYLATEXENC_VERSION
 from dotenv import load_dotenv
+from .conversion_cache import ConversionCache
+from .latex_stripper import STRIPPER_VERSION, passes_quality_check, strip_latex
 from .types import Paper
 
 
@@ -11,94 +22,526 @@ import os
 logger = logging.getLogger(__name__)
 load_dotenv()
 
+DEFAULT_CONVERSION_TIMEOUT_SECONDS = 60.0
+DEFAULT_MAX_LATEX_CHARS = 5_000_000  # Roughly 5 MB of LaTeX source
 
-def add_plain_text_to_paper(paper: Paper) -> None:
-    """Converts raw LaTeX text in a Paper object to plain text.
+CONVERTER_ENGINE_PYLATEXENC = "pylatexenc"  # Full LatexNodes2Text node tree
+CONVERTER_ENGINE_FAST = "fast"  # Regex stripper, pylatexenc when it looks wrong
+CONVERTER_ENGINES = (CONVERTER_ENGINE_PYLATEXENC, CONVERTER_ENGINE_FAST)
+DEFAULT_CONVERTER_ENGINE = CONVERTER_ENGINE_PYLATEXENC
 
-    Modifies the Paper object in-place by setting either:
-    - plain_text (successful conversion)
-    - conversion_error (failed conversion)
+_PYLATEXENC_OPTIONS = dict(
+    keep_comments=False,
+    keep_braced_groups=False,
+    strict_latex_spaces=False,
+    math_mode="verbatim",
+)
+
+_converter: Optional[LatexNodes2Text] = None
+
+
+def _get_converter() -> LatexNodes2Text:
+    """Returns this process's LatexNodes2Text instance, building it on first use.
+
+    Building the converter sets up pylatexenc's macro and environment
+    specifications, so it is done once per process rather than per paper.
+    """
+    global _converter
+    if _converter is None:
+        _converter = LatexNodes2Text(**_PYLATEXENC_OPTIONS)
+    return _converter
+
+
+def converter_config(engine: str = DEFAULT_CONVERTER_ENGINE) -> str:
+    """Describes everything that determines an engine's output, for cache keys."""
+    options = ",".join(f"{k}={v}" for k, v in sorted(_PYLATEXENC_OPTIONS.items()))
+    config = f"pylatexenc={PYLATEXENC_VERSION}({options})"
+    if engine == CONVERTER_ENGINE_FAST:
+        config = f"stripper={STRIPPER_VERSION};fallback={config}"
+    return f"engine={engine};{config}"
+
+
+def convert_latex_text(
+    raw_latex_text: str, engine: str = DEFAULT_CONVERTER_ENGINE
+) -> str:
+    """Converts LaTeX to text with the given engine.
+
+    The fast engine's output is checked with `passes_quality_check`, and the
+    pylatexenc engine is used instead when the check fails.
+
+    Raises:
+        ValueError: If the engine is unknown.
+    """
+    if engine == CONVERTER_ENGINE_FAST:
+        text = strip_latex(raw_latex_text)
+        if passes_quality_check(raw_latex_text, text):
+            return text
+        logger.debug("[CONVERTER] Fast engine output failed quality check; using pylatexenc.")
+    elif engine != CONVERTER_ENGINE_PYLATEXENC:
+        raise ValueError(f"Unknown converter engine: {engine}")
+    return _get_converter().latex_to_text(raw_latex_text)
+
+
+def _convert_latex(
+    paper_id: str, raw_latex_text: str, engine: str = DEFAULT_CONVERTER_ENGINE
+) -> Tuple[Optional[str], Optional[str]]:
+    """Converts LaTeX to stripped plain text with the process's converter.
 
     Args:
-        paper: The Paper object containing raw LaTeX text to convert.
+        paper_id: The paper's ID, used for logging.
+        raw_latex_text: The LaTeX source.
+        engine: One of CONVERTER_ENGINES.
 
     Returns:
-        None: Modifies the Paper object in-place.
+        A (plain_text, conversion_error) tuple; exactly one of them is set.
     """
-    assert isinstance(paper, Paper), "Input must be a Paper object"
+    try:
+        raw_converted_text = convert_latex_text(raw_latex_text, engine)
+        assert isinstance(
+            raw_converted_text, str
+        ), f"pylatexenc should return str, got {type(raw_converted_text)}"
 
+        if logger.isEnabledFor(logging.DEBUG):
+            raw_converted_head = raw_converted_text[:300].replace("\\n", "\\\\n")
+            raw_converted_tail = raw_converted_text[-300:].replace("\\n", "\\\\n")
+            logger.debug(
+                f"[CONVERTER][{paper_id}] Raw Conversion Output Length: {len(raw_converted_text)}"
+            )
+            logger.debug(
+                f"[CONVERTER][{paper_id}] Raw Conversion Output Head: '{raw_converted_head}...'"
+            )
+            logger.debug(
+                f"[CONVERTER][{paper_id}] Raw Conversion Output Tail: '...{raw_converted_tail}'"
+            )
+
+        final_plain_text = raw_converted_text.strip()
+        if not final_plain_text:
+            return None, "Conversion resulted in empty text"
+        return final_plain_text, None
+
+    except Exception as e:
+        error_msg = f"Conversion failed: {type(e).__name__}: {str(e)}"
+        logger.error(f"[CONVERTER][{paper_id}] {error_msg}", exc_info=True)
+        return None, error_msg
+
+
+def _needs_conversion(paper: Paper) -> bool:
+    """Checks preconditions, setting conversion_error if there is no input."""
     if paper.has_errors():
         logger.debug(
             f"[CONVERTER][{paper.paper_id}] Skipping conversion: Pre-existing errors found."
         )
-        return
+        return False
 
     if not paper.raw_latex_text or not paper.raw_latex_text.strip():
         paper.conversion_error = "No raw LaTeX text available for conversion"
         logger.warning(
             f"[CONVERTER][{paper.paper_id}] Skipping conversion: No raw LaTeX text available."
         )
-        return
+        return False
+    return True
+
+
+def _load_cached(paper: Paper, cache: Optional[ConversionCache], engine: str) -> bool:
+    """Sets plain_text from the cache; returns whether it was a hit."""
+    if cache is None:
+        return False
+    text = cache.get(ConversionCache.key_for(paper.raw_latex_text, converter_config(engine)))
+    if text is None:
+        return False
+    paper.plain_text = text
+    paper.conversion_error = None
+    logger.debug(f"[CONVERTER][{paper.paper_id}] Loaded plain text from cache.")
+    return True
+
+
+def _store_cached(paper: Paper, cache: Optional[ConversionCache], engine: str) -> None:
+    if cache is not None and paper.plain_text is not None:
+        cache.put(
+            ConversionCache.key_for(paper.raw_latex_text, converter_config(engine)),
+            paper.plain_text,
+        )
 
-    logger.info(f"[CONVERTER][{paper.paper_id}] Attempting LaTeX conversion.")
-    raw_text_len = len(paper.raw_latex_text)
 
-    raw_head = paper.raw_latex_text[:200].replace("\\n", "\\\\n")
-    raw_tail = paper.raw_latex_text[-200:].replace("\\n", "\\\\n")
-    logger.debug(f"[CONVERTER][{paper.paper_id}] Input Length: {raw_text_len}")
-    logger.debug(f"[CONVERTER][{paper.paper_id}] Input Head: '{raw_head}...'")
-    logger.debug(f"[CONVERTER][{paper.paper_id}] Input Tail: '...{raw_tail}'")
+def _apply_conversion_result(
+    paper: Paper, plain_text: Optional[str], conversion_error: Optional[str]
+) -> None:
+    paper.plain_text = plain_text
+    paper.conversion_error = conversion_error
+    if conversion_error == "Conversion resulted in empty text":
+        logger.warning(
+            f"[CONVERTER][{paper.paper_id}] Conversion resulted in empty text after stripping."
+        )
+    elif plain_text is not None:
+        logger.info(
+            f"[CONVERTER][{paper.paper_id}] Successfully converted. Final plain text length: {len(plain_text)}"
+        )
 
-    try:
 
-        converter = LatexNodes2Text(
-            keep_comments=False,
-            keep_braced_groups=False,
-            strict_latex_spaces=False,
-            math_mode="verbatim",
-        )
+def add_plain_text_to_paper(
+    paper: Paper, engine: str = DEFAULT_CONVERTER_ENGINE
+) -> None:
+    """Converts raw LaTeX text in a Paper object to plain text.
 
-        raw_converted_text = converter.latex_to_text(paper.raw_latex_text)
-        assert isinstance(
-            raw_converted_text, str
-        ), f"pylatexenc should return str, got {type(raw_converted_text)}"
+    Modifies the Paper object in-place by setting either:
+    - plain_text (successful conversion)
+    - conversion_error (failed conversion)
 
-        raw_converted_len = len(raw_converted_text)
-        raw_converted_head = raw_converted_text[:300].replace("\\n", "\\\\n")
-        raw_converted_tail = raw_converted_text[-300:].replace("\\n", "\\\\n")
-        logger.debug(
-            f"[CONVERTER][{paper.paper_id}] Raw Conversion Output Length: {raw_converted_len}"
-        )
+    Args:
+        paper: The Paper object containing raw LaTeX text to convert.
+        engine: One of CONVERTER_ENGINES.
+
+    Returns:
+        None: Modifies the Paper object in-place.
+    """
+    assert isinstance(paper, Paper), "Input must be a Paper object"
+
+    if not _needs_conversion(paper):
+        return
+
+    logger.info(f"[CONVERTER][{paper.paper_id}] Attempting LaTeX conversion.")
+    if logger.isEnabledFor(logging.DEBUG):
+        raw_head = paper.raw_latex_text[:200].replace("\\n", "\\\\n")
+        raw_tail = paper.raw_latex_text[-200:].replace("\\n", "\\\\n")
         logger.debug(
-            f"[CONVERTER][{paper.paper_id}] Raw Conversion Output Head: '{raw_converted_head}...'"
+            f"[CONVERTER][{paper.paper_id}] Input Length: {len(paper.raw_latex_text)}"
         )
-        logger.debug(
-            f"[CONVERTER][{paper.paper_id}] Raw Conversion Output Tail: '...{raw_converted_tail}'"
+        logger.debug(f"[CONVERTER][{paper.paper_id}] Input Head: '{raw_head}...'")
+        logger.debug(f"[CONVERTER][{paper.paper_id}] Input Tail: '...{raw_tail}'")
+
+    plain_text, conversion_error = _convert_latex(
+        paper.paper_id, paper.raw_latex_text, engine
+    )
+    _apply_conversion_result(paper, plain_text, conversion_error)
+
+
+@dataclass
+class ConversionBudget:
+    """Per-paper limits for LaTeX conversion."""
+
+    timeout_seconds: float = DEFAULT_CONVERSION_TIMEOUT_SECONDS  # 0 disables
+    max_input_chars: int = DEFAULT_MAX_LATEX_CHARS  # Not attempted above; 0 disables
+
+
+class ConversionRetryQueue:
+    """Papers whose conversion was cut off by the budget, kept for a later retry.
+
+    Entries record where the paper came from rather than its LaTeX, so the
+    queue stays small; with a path they are also appended to a JSON Lines
+    file as they arrive, so a later run (with a larger budget) can pick them
+    up.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path
+        self.entries: List[Dict[str, Any]] = []
+
+    def add(self, paper: Paper, reason: str) -> None:
+        entry = {
+            "paper_id": paper.paper_id,
+            "source_tar_filename": paper.source_tar_filename,
+            "source_gz_member_name": paper.source_gz_member_name,
+            "input_chars": len(paper.raw_latex_text or ""),
+            "reason": reason,
+        }
+        self.entries.append(entry)
+        if self.path is not None:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    @staticmethod
+    def load(path: Path) -> List[Dict[str, Any]]:
+        """Reads the entries of a retry queue file (empty if it does not exist)."""
+        if not path.is_file():
+            return []
+        with open(path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+def _conversion_worker_main(conn: Connection) -> None:
+    """Worker process loop: converts (paper_id, latex, engine) tasks until told to stop."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # The parent handles Ctrl+C
+    _get_converter()
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        conn.send(_convert_latex(*task))
+
+
+class _ConversionWorker:
+    """A converter process that can be killed and replaced mid-task."""
+
+    def __init__(self):
+        self.paper: Optional[Paper] = None  # Paper being converted, if any
+        self.deadline: Optional[float] = None
+        self._start()
+
+    def _start(self) -> None:
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=_conversion_worker_main,
+            args=(child_conn,),
+            name="latex-converter",
+            daemon=True,
         )
+        self.process.start()
+        child_conn.close()
 
-        final_plain_text = raw_converted_text.strip()
+    def submit(self, paper: Paper, timeout_seconds: float, engine: str) -> None:
+        self.paper = paper
+        self.deadline = time.monotonic() + timeout_seconds if timeout_seconds else None
+        self.conn.send((paper.paper_id, paper.raw_latex_text, engine))
 
-        if not final_plain_text:
-            paper.conversion_error = "Conversion resulted in empty text"
-            paper.plain_text = None
-            logger.warning(
-                f"[CONVERTER][{paper.paper_id}] Conversion resulted in empty text after stripping."
-            )
-        else:
-            paper.plain_text = final_plain_text
-            paper.conversion_error = None
-            final_len = len(paper.plain_text)
-            logger.info(
-                f"[CONVERTER][{paper.paper_id}] Successfully converted. Final plain text length: {final_len}"
+    def receive(self) -> Optional[Tuple[Optional[str], Optional[str]]]:
+        """Returns the worker's result, or None if it died (it is then replaced)."""
+        try:
+            return self.conn.recv()
+        except (EOFError, OSError):
+            logger.error(
+                f"[CONVERTER][{self.paper.paper_id}] Converter process exited unexpectedly."
             )
+            self.restart()
+            return None
+
+    def restart(self) -> None:
+        """Kills the worker, abandoning its task, and starts a fresh one."""
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+        self._start()
+
+    def close(self) -> None:
+        if self.paper is None:
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+            self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+def _check_input_size(paper: Paper, budget: ConversionBudget) -> Optional[str]:
+    size = len(paper.raw_latex_text)
+    if budget.max_input_chars and size > budget.max_input_chars:
+        return f"Input too large for conversion: {size} > {budget.max_input_chars} chars"
+    return None
+
+
+def _reject_over_budget(
+    paper: Paper, reason: str, retry_queue: Optional[ConversionRetryQueue]
+) -> None:
+    paper.conversion_error = reason
+    logger.warning(f"[CONVERTER][{paper.paper_id}] {reason}; queued for retry.")
+    if retry_queue is not None:
+        retry_queue.add(paper, reason)
+
+
+def _collect_results(
+    workers: List[_ConversionWorker],
+    timeout: Optional[float],
+    budget: ConversionBudget,
+    retry_queue: Optional[ConversionRetryQueue],
+) -> List[Paper]:
+    """Waits for busy workers and settles the papers that finished or timed out.
 
-    except Exception as e:
+    Returns:
+        The papers whose conversion is now settled.
+    """
+    busy = [worker for worker in workers if worker.paper is not None]
+    deadlines = [worker.deadline for worker in busy if worker.deadline is not None]
+    if deadlines:
+        until_deadline = max(0.0, min(deadlines) - time.monotonic())
+        timeout = until_deadline if timeout is None else min(timeout, until_deadline)
+    ready = multiprocessing.connection.wait([worker.conn for worker in busy], timeout)
+
+    settled: List[Paper] = []
+    now = time.monotonic()
+    for worker in busy:
+        paper = worker.paper
+        if worker.conn in ready:
+            result = worker.receive()
+            if result is None:
+                _reject_over_budget(
+                    paper, "Converter process exited unexpectedly", retry_queue
+                )
+            else:
+                _apply_conversion_result(paper, *result)
+        elif worker.deadline is not None and now >= worker.deadline:
+            worker.restart()
+            _reject_over_budget(
+                paper,
+                f"Conversion timed out after {budget.timeout_seconds}s",
+                retry_queue,
+            )
+        else:
+            continue
+        worker.paper = None
+        settled.append(paper)
+    return settled
+
+
+class ConversionWatchdog:
+    """Converts papers one at a time in a worker that is killed when over budget.
+
+    This is the budgeted counterpart of `add_plain_text_to_paper`: a paper
+    whose LaTeX is larger than `max_input_chars` is not attempted, and one
+    that takes longer than `timeout_seconds` has its worker killed and
+    replaced. Either way the paper gets a `conversion_error` and is added to
+    the retry queue, so a single pathological paper costs at most the
+    budget. A paper whose worker dies (e.g. killed for running out of
+    memory) is handled the same way. With a cache, papers converted by an
+    earlier run with the same engine settings are not converted again. Use
+    it as a context manager so the worker is shut down.
+    """
 
-        error_msg = f"Conversion failed: {type(e).__name__}: {str(e)}"
-        paper.conversion_error = error_msg
-        paper.plain_text = None
+    def __init__(
+        self,
+        budget: Optional[ConversionBudget] = None,
+        retry_queue: Optional[ConversionRetryQueue] = None,
+        engine: str = DEFAULT_CONVERTER_ENGINE,
+        cache: Optional[ConversionCache] = None,
+    ):
+        assert engine in CONVERTER_ENGINES, f"Unknown converter engine: {engine}"
+        self.budget = budget if budget is not None else ConversionBudget()
+        self.retry_queue = retry_queue
+        self.engine = engine
+        self.cache = cache
+        self._worker: Optional[_ConversionWorker] = None
+
+    def convert(self, paper: Paper) -> None:
+        """Sets plain_text or conversion_error on a paper, in-place."""
+        assert isinstance(paper, Paper), "Input must be a Paper object"
+        if not _needs_conversion(paper) or _load_cached(paper, self.cache, self.engine):
+            return
+        size_error = _check_input_size(paper, self.budget)
+        if size_error:
+            _reject_over_budget(paper, size_error, self.retry_queue)
+            return
+
+        if self._worker is None:
+            self._worker = _ConversionWorker()
+        logger.info(f"[CONVERTER][{paper.paper_id}] Attempting LaTeX conversion.")
+        self._worker.submit(paper, self.budget.timeout_seconds, self.engine)
+        while not _collect_results([self._worker], None, self.budget, self.retry_queue):
+            pass
+        _store_cached(paper, self.cache, self.engine)
+
+    def close(self) -> None:
+        if self._worker is not None:
+            self._worker.close()
+            self._worker = None
+
+    def __enter__(self) -> "ConversionWatchdog":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def iter_converted_papers(
+    papers: Iterable[Paper],
+    num_workers: Optional[int] = None,
+    ordered: bool = True,
+    max_pending: int = 0,
+    budget: Optional[ConversionBudget] = None,
+    retry_queue: Optional[ConversionRetryQueue] = None,
+    engine: str = DEFAULT_CONVERTER_ENGINE,
+    cache: Optional[ConversionCache] = None,
+) -> Iterator[Paper]:
+    """Converts many papers in parallel, one reusable converter per worker.
+
+    Only the paper ID and LaTeX source are sent to the worker processes, and
+    only the converted text comes back; the Paper objects stay in this
+    process. Papers that cannot be converted (pre-existing errors, no LaTeX)
+    are handled here exactly as by `add_plain_text_to_paper`. The budget is
+    enforced as in `ConversionWatchdog`: a worker running over it is killed
+    and replaced, so the slowest paper delays the stream by at most
+    `timeout_seconds`.
 
-        logger.error(f"[CONVERTER][{paper.paper_id}] {error_msg}", exc_info=True)
+    Args:
+        papers: The papers to convert.
+        num_workers: Worker processes (defaults to os.cpu_count()).
+        ordered: Yield papers in input order; otherwise as they complete.
+        max_pending: Papers in flight at once (defaults to 4 * num_workers).
+        budget: Optional ConversionBudget.
+        retry_queue: Receives the papers that went over the budget.
+        engine: One of CONVERTER_ENGINES.
+        cache: Optional ConversionCache consulted before converting a paper.
+
+    Yields:
+        The input papers with plain_text or conversion_error set.
+    """
+    assert engine in CONVERTER_ENGINES, f"Unknown converter engine: {engine}"
+    effective_budget = budget if budget is not None else ConversionBudget()
+    effective_workers = num_workers or os.cpu_count() or 1
+    max_in_flight = max_pending or 4 * effective_workers
+
+    paper_iter = iter(papers)
+    exhausted = False
+    pending: Deque[Paper] = deque()  # Every paper not yet yielded, in input order
+    waiting: Deque[Paper] = deque()  # Papers waiting for a free worker
+    settled: Set[int] = set()  # id() of pending papers with a final result
+
+    workers = [_ConversionWorker() for _ in range(effective_workers)]
+    try:
+        while True:
+            while not exhausted and len(pending) < max_in_flight:
+                paper = next(paper_iter, None)
+                if paper is None:
+                    exhausted = True
+                    break
+                assert isinstance(paper, Paper), "Input must be a Paper object"
+                pending.append(paper)
+                if not _needs_conversion(paper) or _load_cached(paper, cache, engine):
+                    settled.add(id(paper))
+                    continue
+                size_error = _check_input_size(paper, effective_budget)
+                if size_error:
+                    _reject_over_budget(paper, size_error, retry_queue)
+                    settled.add(id(paper))
+                    continue
+                waiting.append(paper)
+
+            if not pending:
+                break
+
+            for worker in workers:
+                if worker.paper is None and waiting:
+                    worker.submit(
+                        waiting.popleft(), effective_budget.timeout_seconds, engine
+                    )
+
+            if ordered:
+                ready = []
+                while pending and id(pending[0]) in settled:
+                    ready.append(pending.popleft())
+            else:
+                ready = [paper for paper in pending if id(paper) in settled]
+                pending = deque(paper for paper in pending if id(paper) not in settled)
+            for paper in ready:
+                settled.discard(id(paper))
+                yield paper
+            if ready:
+                continue
+
+            for paper in _collect_results(
+                workers, None, effective_budget, retry_queue
+            ):
+                _store_cached(paper, cache, engine)
+                settled.add(id(paper))
+    finally:
+        for worker in workers:
+            worker.close()
 
 
 if __name__ == "__main__":
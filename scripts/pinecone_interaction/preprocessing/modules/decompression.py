@@ -0,0 +1,154 @@
+import gzip
+import io
+import logging
+import queue
+import threading
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+try:
+    import zstandard
+except ImportError:  # Only needed for .tar.zst archives
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+CODEC_GZIP = "gz"
+CODEC_ZSTD = "zst"
+
+# Archive filename suffixes recognised by the extractor, mapped to their codec.
+ARCHIVE_SUFFIXES = {
+    ".tar": None,
+    ".tar.gz": CODEC_GZIP,
+    ".tgz": CODEC_GZIP,
+    ".tar.zst": CODEC_ZSTD,
+    ".tar.zstd": CODEC_ZSTD,
+}
+
+DEFAULT_DECOMPRESS_BLOCK_SIZE = 1 << 20  # 1 MiB of decompressed data per block
+DEFAULT_DECOMPRESS_MAX_BLOCKS = 16  # Blocks buffered ahead of the reader
+
+
+def archive_codec(path: Path) -> Optional[str]:
+    """Returns the compression codec of an archive from its filename.
+
+    Args:
+        path: Path to an archive.
+
+    Returns:
+        CODEC_GZIP, CODEC_ZSTD, or None for an uncompressed .tar.
+
+    Raises:
+        ValueError: If the filename has no recognised archive suffix.
+    """
+    name = path.name.lower()
+    for suffix, codec in ARCHIVE_SUFFIXES.items():
+        if name.endswith(suffix):
+            return codec
+    raise ValueError(f"Not a recognised archive: {path.name}")
+
+
+def is_archive(path: Path) -> bool:
+    """Checks whether a path has one of the recognised archive suffixes."""
+    name = path.name.lower()
+    return any(name.endswith(suffix) for suffix in ARCHIVE_SUFFIXES)
+
+
+def open_decompressed(path: Path, codec: str) -> BinaryIO:
+    """Opens a compressed file as a sequential stream of decompressed bytes.
+
+    Raises:
+        ImportError: If the codec is zstd and `zstandard` is not installed.
+        ValueError: If the codec is unknown.
+    """
+    if codec == CODEC_GZIP:
+        return gzip.open(path, "rb")
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ImportError(
+                f"The 'zstandard' package is required to read {path.name}"
+            )
+        return zstandard.ZstdDecompressor().stream_reader(
+            open(path, "rb"), closefd=True
+        )
+    raise ValueError(f"Unknown compression codec: {codec}")
+
+
+class ThreadedDecompressedStream(io.RawIOBase):
+    """Read-only stream whose data is decompressed on a background thread.
+
+    The thread reads ahead into a bounded queue of blocks, so decompression
+    (which releases the GIL in zlib and zstd) overlaps with whatever the
+    consumer does with the data. Nothing is written to disk. Errors raised
+    by the decompressor are re-raised from `read()` once the blocks before
+    them have been consumed.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        codec: str,
+        block_size: int = DEFAULT_DECOMPRESS_BLOCK_SIZE,
+        max_blocks: int = DEFAULT_DECOMPRESS_MAX_BLOCKS,
+    ):
+        super().__init__()
+        self._blocks: "queue.Queue[Optional[bytes]]" = queue.Queue(maxsize=max_blocks)
+        self._current = memoryview(b"")
+        self._eof = False
+        self._error: Optional[BaseException] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(path, codec, block_size),
+            name=f"decompress-{path.name}",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def _run(self, path: Path, codec: str, block_size: int) -> None:
+        try:
+            with open_decompressed(path, codec) as source:
+                while not self._stop.is_set():
+                    block = source.read(block_size)
+                    if not block:
+                        break
+                    self._put(block)
+        except BaseException as e:
+            self._error = e
+        finally:
+            self._put(None)
+
+    def _put(self, item: Optional[bytes]) -> None:
+        while not self._stop.is_set():
+            try:
+                self._blocks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._current:
+            if self._eof:
+                return 0
+            block = self._blocks.get()
+            if block is None:
+                self._eof = True
+                if self._error is not None:
+                    raise self._error
+                return 0
+            self._current = memoryview(block)
+
+        size = min(len(buffer), len(self._current))
+        buffer[:size] = self._current[:size]
+        self._current = self._current[size:]
+        return size
+
+    def close(self) -> None:
+        if not self.closed:
+            self._stop.set()
+            self._thread.join()
+            self._current = memoryview(b"")
+        super().close()
@@ -0,0 +1,351 @@
+import hashlib
+import json
+import logging
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from .extractor import (
+    ExtractionConfig,
+    extract_paper_id_from_filename,
+    iter_archive_members,
+    open_archive,
+)
+from .types import Paper
+
+logger = logging.getLogger(__name__)
+
+VERSION_POLICY_ALL = "all"  # Keep every version, only drop identical content
+VERSION_POLICY_FIRST = "first"  # Keep the first version seen of each paper
+VERSION_POLICY_LATEST = "latest"  # Keep only the newest version of each paper
+VERSION_POLICIES = (VERSION_POLICY_ALL, VERSION_POLICY_FIRST, VERSION_POLICY_LATEST)
+
+VERSION_SCAN_FORMAT_VERSION = 1
+
+_VERSIONED_ID_PATTERN = re.compile(r"^(.*?)(?:v(\d+))?$", re.IGNORECASE)
+
+
+def split_paper_version(paper_id: str) -> Tuple[str, int]:
+    """Splits an arXiv ID into its base ID and version number.
+
+    Unversioned IDs are treated as version 0.
+
+    Args:
+        paper_id: An ID such as '2301.00001v2' or '2301.00001'.
+
+    Returns:
+        A (base_id, version) tuple, e.g. ('2301.00001', 2).
+    """
+    match = _VERSIONED_ID_PATTERN.match(paper_id)
+    base_id, version = match.group(1), match.group(2)
+    return base_id, int(version) if version else 0
+
+
+def latest_versions_from_ids(paper_ids: Iterable[str]) -> Dict[str, int]:
+    """Returns the highest version found for each base ID."""
+    latest: Dict[str, int] = {}
+    for paper_id in paper_ids:
+        base_id, version = split_paper_version(paper_id)
+        if version > latest.get(base_id, -1):
+            latest[base_id] = version
+    return latest
+
+
+def _scan_paper_ids(tar_path: Path, config: ExtractionConfig) -> List[str]:
+    """Lists the paper IDs of an archive's PDF members, reading only tar headers."""
+    extensions = tuple(config.supported_extensions)
+    paper_ids = []
+    with open_archive(tar_path, config) as archive:
+        for member in iter_archive_members(archive, stream_members=True):
+            if member.isfile() and member.name.lower().endswith(extensions):
+                paper_id = extract_paper_id_from_filename(Path(member.name).name)
+                if paper_id:
+                    paper_ids.append(paper_id)
+    return paper_ids
+
+
+def scan_latest_versions(
+    tar_files: Iterable[Path],
+    cache_path: Optional[Path] = None,
+    config: Optional[ExtractionConfig] = None,
+) -> Dict[str, int]:
+    """Returns the highest version of each paper found in a set of archives.
+
+    Only tar headers are read, but a compressed archive has no index of its
+    members, so scanning it means decompressing all of it: for .tar.gz and
+    .tar.zst input this is a full extra decompression pass, paid before the
+    first paper is deduplicated. The paper IDs of each archive are cached in
+    `cache_path`, keyed by archive name, size and mtime, so later runs only
+    scan archives that are new or changed. Archives that cannot be read are
+    logged and left out.
+
+    Args:
+        tar_files: Archives to scan.
+        cache_path: Optional JSON file caching the scan across runs.
+        config: Optional ExtractionConfig selecting the PDF members.
+
+    Returns:
+        A dictionary mapping base paper IDs to their highest version.
+    """
+    effective_config = config if config is not None else ExtractionConfig()
+    cached: Dict[str, Dict] = {}
+    if cache_path is not None and cache_path.is_file():
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == VERSION_SCAN_FORMAT_VERSION:
+                cached = data["archives"]
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(
+                f"[DEDUP] Ignoring unreadable version scan cache {cache_path}: {e}"
+            )
+
+    archives: Dict[str, Dict] = {}
+    scanned = 0
+    for tar_path in tar_files:
+        try:
+            stat = tar_path.stat()
+            entry = cached.get(tar_path.name)
+            if (
+                entry is None
+                or entry["size"] != stat.st_size
+                or entry["mtime_ns"] != stat.st_mtime_ns
+            ):
+                entry = {
+                    "size": stat.st_size,
+                    "mtime_ns": stat.st_mtime_ns,
+                    "paper_ids": _scan_paper_ids(tar_path, effective_config),
+                }
+                scanned += 1
+        except Exception as e:
+            logger.error(
+                f"[DEDUP] Could not scan {tar_path.name} for paper versions: {e} "
+                "(Newer versions in it may not supersede older ones)"
+            )
+            continue
+        archives[tar_path.name] = entry
+
+    if cache_path is not None and scanned:
+        tmp_path = cache_path.with_name(cache_path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": VERSION_SCAN_FORMAT_VERSION, "archives": archives}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, cache_path)
+    logger.info(
+        f"[DEDUP] Version scan covers {len(archives)} archives ({scanned} scanned, "
+        f"{len(archives) - scanned} from cache)."
+    )
+    return latest_versions_from_ids(
+        paper_id for entry in archives.values() for paper_id in entry["paper_ids"]
+    )
+
+
+def _content_digest(paper: Paper) -> Optional[str]:
+    """Hashes a paper's PDF without copying lazily referenced bytes."""
+    if paper.pdf_content is not None:
+        return hashlib.sha256(paper.pdf_content).hexdigest()
+    if paper.pdf_source is not None:
+        view = paper.pdf_source.view()
+        try:
+            return hashlib.sha256(view).hexdigest()
+        finally:
+            view.release()
+    return None
+
+
+@dataclass
+class DedupStats:
+    """Counters reported by the deduplication stage."""
+
+    seen: int = 0
+    kept: int = 0
+    duplicate_content: int = 0  # Byte-identical to an already kept PDF
+    superseded_version: int = 0  # Dropped by the version policy
+
+    @property
+    def skipped(self) -> int:
+        return self.duplicate_content + self.superseded_version
+
+
+class PaperDeduplicator:
+    """Drops duplicate papers right after extraction.
+
+    A paper is dropped if its PDF is byte-identical to one already kept, or if
+    the version policy rejects it. The state (content hashes and the version
+    kept for each base ID) is appended to a JSON Lines file as papers are
+    kept, so it persists across runs.
+
+    When ingest is checkpointed, pass the checkpoint's `is_committed` and
+    call `flush_state()` after every commit: kept papers are then written to
+    the state file only once their outcome is committed, so a resumed run
+    does not drop papers that were kept but never written as duplicates of
+    themselves.
+
+    With VERSION_POLICY_LATEST a paper is kept only if no newer version of it
+    is known. Passing `latest_versions` (e.g. from `scan_latest_versions` over
+    the archives still to be read) makes this exact; without it, a newer
+    version that arrives after an older one has been kept is kept as well.
+    It may also be a callable, which is only called when the first paper is
+    checked, so no scan happens if there is nothing left to deduplicate.
+    Note that the scan has to see every pending archive before any paper can
+    be kept, since a newer version may sit in the last one: with
+    `scan_latest_versions` the first paper waits for a header pass over all
+    of them (a full decompression of each uncached compressed archive). Use
+    VERSION_POLICY_ALL or VERSION_POLICY_FIRST to start streaming at once.
+
+    Papers with pre-existing errors are passed through untouched.
+    """
+
+    def __init__(
+        self,
+        state_path: Optional[Path] = None,
+        version_policy: str = VERSION_POLICY_LATEST,
+        latest_versions: Optional[
+            Union[Dict[str, int], Callable[[], Dict[str, int]]]
+        ] = None,
+        is_committed: Optional[Callable[[str, str], bool]] = None,
+    ):
+        assert (
+            version_policy in VERSION_POLICIES
+        ), f"version_policy must be one of {VERSION_POLICIES}"
+        self.state_path = state_path
+        self.version_policy = version_policy
+        self._latest_versions = latest_versions
+        self.stats = DedupStats()
+        self._seen_digests: Set[str] = set()
+        self._kept_versions: Dict[str, int] = {}
+        self._state_file = None
+        self._is_committed = is_committed
+        self._unflushed: List[Tuple[str, str, Optional[str]]] = []
+
+        if state_path is not None and state_path.is_file():
+            self._load_state(state_path)
+
+    def _load_state(self, state_path: Path) -> None:
+        with open(state_path, "r", encoding="utf-8") as f:
+            for line_num, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(
+                        f"[DEDUP] Skipping invalid state line {line_num} in {state_path}"
+                    )
+                    continue
+                self._remember(entry["paper_id"], entry.get("sha256"))
+        logger.info(
+            f"[DEDUP] Loaded {len(self._seen_digests)} content hashes and "
+            f"{len(self._kept_versions)} paper IDs from {state_path}"
+        )
+
+    @property
+    def latest_versions(self) -> Dict[str, int]:
+        """The known newest version of each base ID (resolved on first use)."""
+        if callable(self._latest_versions):
+            self._latest_versions = self._latest_versions()
+        if self._latest_versions is None:
+            self._latest_versions = {}
+        return self._latest_versions
+
+    def _remember(self, paper_id: str, digest: Optional[str]) -> None:
+        if digest:
+            self._seen_digests.add(digest)
+        base_id, version = split_paper_version(paper_id)
+        if version > self._kept_versions.get(base_id, -1):
+            self._kept_versions[base_id] = version
+
+    def _persist(self, paper_id: str, digest: Optional[str]) -> None:
+        if self.state_path is None:
+            return
+        if self._state_file is None:
+            self._state_file = open(self.state_path, "a", encoding="utf-8")
+        self._state_file.write(json.dumps({"paper_id": paper_id, "sha256": digest}))
+        self._state_file.write("\n")
+
+    def flush_state(self) -> None:
+        """Writes the kept papers whose outcome is committed to the state file."""
+        if self._is_committed is None or not self._unflushed:
+            return
+        waiting = []
+        for tar_name, paper_id, digest in self._unflushed:
+            if self._is_committed(tar_name, paper_id):
+                self._persist(paper_id, digest)
+            else:
+                waiting.append((tar_name, paper_id, digest))
+        self._unflushed = waiting
+        if self._state_file is not None:
+            self._state_file.flush()
+
+    def check(self, paper: Paper) -> Optional[str]:
+        """Decides whether a paper should be kept, recording it if so.
+
+        Args:
+            paper: The extracted Paper.
+
+        Returns:
+            None if the paper is kept, otherwise the reason it was dropped
+            ("duplicate_content" or "superseded_version").
+        """
+        self.stats.seen += 1
+        if paper.has_errors():
+            self.stats.kept += 1
+            return None
+
+        base_id, version = split_paper_version(paper.paper_id)
+        kept_version = self._kept_versions.get(base_id)
+        superseded = False
+        if self.version_policy == VERSION_POLICY_FIRST:
+            superseded = kept_version is not None
+        elif self.version_policy == VERSION_POLICY_LATEST:
+            superseded = version < self.latest_versions.get(base_id, -1) or (
+                kept_version is not None and version <= kept_version
+            )
+        if superseded:
+            self.stats.superseded_version += 1
+            return "superseded_version"
+
+        digest = _content_digest(paper)
+        if digest is not None and digest in self._seen_digests:
+            self.stats.duplicate_content += 1
+            return "duplicate_content"
+
+        self._remember(paper.paper_id, digest)
+        if self._is_committed is None:
+            self._persist(paper.paper_id, digest)
+        else:
+            self._unflushed.append(
+                (paper.source_tar_filename or "", paper.paper_id, digest)
+            )
+        self.stats.kept += 1
+        return None
+
+    def filter(self, papers: Iterable[Paper]) -> Iterator[Paper]:
+        """Yields only the papers that pass `check`, then logs a summary."""
+        try:
+            for paper in papers:
+                reason = self.check(paper)
+                if reason is None:
+                    yield paper
+                else:
+                    logger.debug(f"[DEDUP][{paper.paper_id}] Dropped: {reason}")
+        finally:
+            self.close()
+            logger.info(
+                f"[DEDUP] Seen {self.stats.seen}, kept {self.stats.kept}, skipped "
+                f"{self.stats.skipped} ({self.stats.duplicate_content} duplicate content, "
+                f"{self.stats.superseded_version} superseded versions)."
+            )
+
+    def close(self) -> None:
+        """Flushes and closes the persistent state file.
+
+        Kept papers that are not committed yet are not written; `flush_state`
+        reopens the file if they are committed later.
+        """
+        if self._state_file is not None:
+            self._state_file.close()
+            self._state_file = None
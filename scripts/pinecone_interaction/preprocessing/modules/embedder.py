@@ -1,9 +1,14 @@
+import functools
 import os
 import logging
-from typing import List, Dict, Any, Optional
+import threading
+from typing import List, Dict, Any, Optional, Protocol, Sequence, Tuple
 
 from dotenv import load_dotenv
-from openai import OpenAI, APIError
+from openai import OpenAI, APIError, APIStatusError
+
+from .local_embedder import HashedNgramEmbedder
+from .tokenizer import Tokenizer, get_tokenizer
 
 
 logging.basicConfig(
@@ -13,6 +18,36 @@ logging.basicConfig(
 DEFAULT_EMBEDDING_DIMENSION = 1536
 EMBEDDING_MODEL = "text-embedding-3-small"
 
+# Provider limits for /v1/embeddings requests.
+MAX_INPUTS_PER_REQUEST = 2048
+MAX_TOKENS_PER_REQUEST = 300_000
+MAX_TOKENS_PER_INPUT = 8191
+DEFAULT_REQUEST_TOKEN_BUDGET = 100_000  # Margin under the limit for estimate error
+DEFAULT_REQUEST_TIMEOUT_SECONDS = 60.0
+
+EMBEDDING_BACKEND_OPENAI = "openai"
+EMBEDDING_BACKEND_LOCAL = "local"  # HashedNgramEmbedder, no network access
+EMBEDDING_BACKENDS = (EMBEDDING_BACKEND_OPENAI, EMBEDDING_BACKEND_LOCAL)
+
+
+class EmbeddingRequestTooLargeError(ValueError):
+    """Raised when a single input is rejected as too large to embed."""
+
+
+class EmbeddingBackend(Protocol):
+    """Turns texts into fixed-size vectors.
+
+    `model` identifies the vectors' space (it is part of embedding cache
+    keys), so two backends with the same model must give the same vectors.
+    """
+
+    model: str
+    dimensions: int
+
+    def embed(
+        self, texts: Sequence[str], token_counts: Optional[Sequence[int]] = None
+    ) -> List[List[float]]: ...
+
 
 def load_openai_key() -> Optional[str]:
     """Loads the OpenAI API key from .env file."""
@@ -24,18 +59,246 @@ def load_openai_key() -> Optional[str]:
     return api_key
 
 
-def generate_embeddings(texts: List[str], api_key: str) -> Optional[List[List[float]]]:
-    """Generates embeddings for a list of texts using the OpenAI API."""
+def pack_requests(
+    token_counts: Sequence[int],
+    max_tokens: int = DEFAULT_REQUEST_TOKEN_BUDGET,
+    max_inputs: int = MAX_INPUTS_PER_REQUEST,
+) -> List[Tuple[int, int]]:
+    """Groups consecutive inputs into requests within token and input limits.
+
+    An input whose estimate alone exceeds `max_tokens` gets a request of its
+    own.
+
+    Args:
+        token_counts: Estimated token count of each input.
+        max_tokens: Token budget per request.
+        max_inputs: Maximum number of inputs per request.
+
+    Returns:
+        (start, end) index ranges, end exclusive, covering every input in order.
+    """
+    requests: List[Tuple[int, int]] = []
+    start, tokens = 0, 0
+    for i, count in enumerate(token_counts):
+        if i > start and (tokens + count > max_tokens or i - start >= max_inputs):
+            requests.append((start, i))
+            start, tokens = i, 0
+        tokens += count
+    if start < len(token_counts):
+        requests.append((start, len(token_counts)))
+    return requests
+
+
+def _is_too_large(error: APIStatusError) -> bool:
+    """Recognises the provider rejecting a request for its size."""
+    if error.status_code == 413:
+        return True
+    message = str(error).lower()
+    return error.status_code == 400 and (
+        "token" in message or "too large" in message or "too many" in message
+    )
+
+
+class EmbeddingService:
+    """Long-lived embedding client that packs inputs into requests by tokens.
+
+    One OpenAI client, and with it one pool of keep-alive HTTP connections,
+    is used for the lifetime of the service, so only the first request pays
+    for connection setup and the TLS handshake. Inputs are grouped into
+    requests by estimated token count (see `pack_requests`), results are
+    returned in input order regardless of the order in the response, and a
+    request the provider rejects as too large is split in half and retried.
+    `base_url` points the service at any OpenAI-compatible endpoint, such as
+    a local stand-in server in tests. With `dimensions` the provider returns
+    shortened embeddings (text-embedding-3-* models only).
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str = EMBEDDING_MODEL,
+        base_url: Optional[str] = None,
+        request_token_budget: int = DEFAULT_REQUEST_TOKEN_BUDGET,
+        max_inputs_per_request: int = MAX_INPUTS_PER_REQUEST,
+        timeout_seconds: float = DEFAULT_REQUEST_TIMEOUT_SECONDS,
+        tokenizer: Optional[Tokenizer] = None,
+        dimensions: Optional[int] = None,
+    ):
+        assert request_token_budget > 0, "request_token_budget must be positive"
+        self.model = model
+        self.dimensions = dimensions or DEFAULT_EMBEDDING_DIMENSION
+        self._request_options = {"dimensions": dimensions} if dimensions else {}
+        self.request_token_budget = request_token_budget
+        self.max_inputs_per_request = max_inputs_per_request
+        self.tokenizer = tokenizer if tokenizer is not None else get_tokenizer()
+        self._client = OpenAI(
+            api_key=api_key, base_url=base_url, timeout=timeout_seconds
+        )
+        self.requests_sent = 0
+
+    def _request(self, texts: Sequence[str]) -> List[List[float]]:
+        self.requests_sent += 1
+        response = self._client.embeddings.create(
+            input=list(texts), model=self.model, **self._request_options
+        )
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        for item in response.data:
+            vectors[item.index] = item.embedding
+        if any(vector is None for vector in vectors):
+            raise APIError("Embedding response is missing inputs", None, body=None)
+        return vectors
+
+    def _embed_range(self, texts: Sequence[str]) -> List[List[float]]:
+        try:
+            return self._request(texts)
+        except APIStatusError as e:
+            if not _is_too_large(e):
+                raise
+            if len(texts) == 1:
+                raise EmbeddingRequestTooLargeError(
+                    f"Input of {len(texts[0])} characters rejected as too large: {e}"
+                ) from e
+            middle = len(texts) // 2
+            logging.warning(
+                f"Embedding request of {len(texts)} inputs rejected as too large; splitting."
+            )
+            return self._embed_range(texts[:middle]) + self._embed_range(texts[middle:])
+
+    def embed(
+        self, texts: Sequence[str], token_counts: Optional[Sequence[int]] = None
+    ) -> List[List[float]]:
+        """Embeds texts, in as few requests as the limits allow.
+
+        Args:
+            texts: The texts to embed.
+            token_counts: Optional precomputed token counts (e.g. from a
+                token-budgeted chunker); estimated with the tokenizer if omitted.
+
+        Returns:
+            One embedding per text, in input order.
+
+        Raises:
+            APIError: On a failed request that splitting does not fix.
+            EmbeddingRequestTooLargeError: If a single input is too large.
+        """
+        if token_counts is None:
+            token_counts = [self.tokenizer.count(text) for text in texts]
+        embeddings: List[List[float]] = []
+        for start, end in pack_requests(
+            token_counts, self.request_token_budget, self.max_inputs_per_request
+        ):
+            embeddings.extend(self._embed_range(texts[start:end]))
+        return embeddings
+
+    def close(self) -> None:
+        self._client.close()
+
+    def __enter__(self) -> "EmbeddingService":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+_services: Dict[Tuple[str, Optional[int]], EmbeddingService] = {}
+_services_lock = threading.Lock()
+
+
+def get_embedding_service(
+    api_key: str, dimensions: Optional[int] = None
+) -> EmbeddingService:
+    """Returns the shared EmbeddingService for an API key and dimensions."""
+    with _services_lock:
+        if (api_key, dimensions) not in _services:
+            _services[api_key, dimensions] = EmbeddingService(
+                api_key, dimensions=dimensions
+            )
+        return _services[api_key, dimensions]
+
+
+@functools.lru_cache(maxsize=None)
+def get_local_embedder(dimensions: Optional[int] = None) -> HashedNgramEmbedder:
+    """Returns the shared local embedder for some dimensions."""
+    if dimensions is None:
+        return HashedNgramEmbedder()
+    return HashedNgramEmbedder(dimensions)
+
+
+def embedding_backend_name() -> str:
+    """Returns the backend selected by EMBEDDING_BACKEND (default "openai")."""
+    return os.getenv("EMBEDDING_BACKEND", EMBEDDING_BACKEND_OPENAI)
+
+
+def embedding_dimensions() -> Optional[int]:
+    """Returns the dimensions requested by EMBEDDING_DIMENSIONS, if set."""
+    value = os.getenv("EMBEDDING_DIMENSIONS")
+    return int(value) if value else None
+
+
+def get_embedding_backend(
+    name: Optional[str] = None,
+    api_key: Optional[str] = None,
+    dimensions: Optional[int] = None,
+) -> Optional[EmbeddingBackend]:
+    """Returns a shared embedding backend.
+
+    Args:
+        name: EMBEDDING_BACKEND_OPENAI or EMBEDDING_BACKEND_LOCAL; defaults
+            to `embedding_backend_name()`.
+        api_key: OpenAI API key; loaded from the environment if omitted.
+        dimensions: Output dimensions, defaulting to `embedding_dimensions()`
+            and then to the backend's own. Fewer dimensions request
+            shortened embeddings from OpenAI.
+
+    Returns:
+        The backend, or None if the OpenAI backend has no API key.
+
+    Raises:
+        ValueError: For an unknown backend name.
+    """
+    name = name or embedding_backend_name()
+    dimensions = dimensions or embedding_dimensions()
+    if name == EMBEDDING_BACKEND_LOCAL:
+        return get_local_embedder(dimensions)
+    if name != EMBEDDING_BACKEND_OPENAI:
+        raise ValueError(
+            f"Unknown embedding backend {name!r}; expected one of {EMBEDDING_BACKENDS}"
+        )
+    if api_key is None:
+        api_key = load_openai_key()
+        if not api_key:
+            return None
+    return get_embedding_service(api_key, dimensions)
+
+
+def generate_embeddings(
+    texts: List[str],
+    api_key: Optional[str] = None,
+    backend: Optional[EmbeddingBackend] = None,
+) -> Optional[List[List[float]]]:
+    """Generates embeddings for a list of texts.
+
+    By default requests go to the OpenAI API through a shared
+    EmbeddingService, so the HTTP connection is reused across calls, with
+    the API key from the environment unless one is given. Setting
+    EMBEDDING_BACKEND=local, or passing a backend, embeds without it.
+    """
     if not texts:
         logging.warning("generate_embeddings called with an empty list of texts.")
         return []
 
+    if backend is None:
+        backend = get_embedding_backend(api_key=api_key)
+        if backend is None:
+            return None
+
     try:
-        client = OpenAI(api_key=api_key)
-        response = client.embeddings.create(input=texts, model=EMBEDDING_MODEL)
-        embeddings = [item.embedding for item in response.data]
+        embeddings = backend.embed(texts)
         logging.info(f"Successfully generated embeddings for {len(texts)} texts.")
         return embeddings
+    except EmbeddingRequestTooLargeError as e:
+        logging.error(f"Embedding input too large: {e}")
+        return None
     except APIError as e:
         logging.error(f"OpenAI API error during embedding generation: {e}")
         return None
@@ -0,0 +1,217 @@
+import hashlib
+import logging
+import sqlite3
+import unicodedata
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .conversion_cache import CacheStats
+from .embedder import DEFAULT_EMBEDDING_DIMENSION, EMBEDDING_MODEL
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EMBEDDING_CACHE_MAX_BYTES = 4 * 1024**3  # ~700k 1536-dim vectors
+_SQLITE_MAX_PARAMS = 500  # Keys per IN (...) lookup
+
+
+def normalize_text(text: str) -> str:
+    """Normalises chunk text for cache keys: NFC, single spaces, no edges."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class EmbeddingCache:
+    """Persistent cache of embedding vectors in a SQLite file.
+
+    An entry is keyed by the SHA-256 of the model, the dimensions and the
+    normalised chunk text, so a rerun only pays for chunks whose text (or
+    the model) changed, whatever happened to their position or paper. The
+    value is the raw float32 vector. The total size of stored vectors is
+    capped at `max_bytes`: the least recently used entries are evicted
+    first, tracked by a use counter that is bumped on every hit. Without a
+    path the cache lives in memory for the current run.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        model: str = EMBEDDING_MODEL,
+        dimensions: int = DEFAULT_EMBEDDING_DIMENSION,
+        max_bytes: int = DEFAULT_EMBEDDING_CACHE_MAX_BYTES,
+    ):
+        assert max_bytes > 0, "max_bytes must be positive"
+        self.model = model
+        self.dimensions = dimensions
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+
+        self._db = sqlite3.connect(str(path) if path is not None else ":memory:")
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key BLOB PRIMARY KEY, vector BLOB, last_used INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS embeddings_lru ON embeddings (last_used);
+            """
+        )
+        self._clock, self._total_bytes = self._db.execute(
+            "SELECT COALESCE(MAX(last_used), 0), COALESCE(SUM(LENGTH(vector)), 0) "
+            "FROM embeddings"
+        ).fetchone()
+        self._evict()
+        logger.info(
+            f"[EMBEDDING_CACHE] Opened {path or ':memory:'}: {len(self)} entries, "
+            f"{self._total_bytes} bytes."
+        )
+
+    def key_for(self, text: str) -> bytes:
+        """Returns the cache key of a text under this cache's model and dimensions."""
+        digest = hashlib.sha256()
+        digest.update(f"{self.model}\0{self.dimensions}\0".encode("utf-8"))
+        digest.update(normalize_text(text).encode("utf-8", errors="surrogatepass"))
+        return digest.digest()
+
+    def _tick(self) -> int:
+        self._clock += 1
+        return self._clock
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Looks up texts, returning a float32 vector or None for each."""
+        return self._get([self.key_for(text) for text in texts])
+
+    def _get(self, keys: List[bytes]) -> List[Optional[np.ndarray]]:
+        found: Dict[bytes, np.ndarray] = {}
+        unique_keys = list(set(keys))
+        for i in range(0, len(unique_keys), _SQLITE_MAX_PARAMS):
+            part = unique_keys[i : i + _SQLITE_MAX_PARAMS]
+            rows = self._db.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(part))})",
+                part,
+            )
+            for key, blob in rows:
+                if len(blob) == 4 * self.dimensions:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+        if found:
+            self._db.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                [(self._tick(), key) for key in found],
+            )
+
+        results = [found.get(key) for key in keys]
+        hits = sum(1 for vector in results if vector is not None)
+        self.stats.hits += hits
+        self.stats.misses += len(results) - hits
+        return results
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        """Stores vectors for texts, evicting old entries to stay under the cap."""
+        self._put([self.key_for(text) for text in texts], vectors)
+
+    def _put(self, keys: List[bytes], vectors: Sequence[Sequence[float]]) -> None:
+        rows = []
+        for key, vector in zip(keys, vectors):
+            blob = np.asarray(vector, dtype=np.float32).tobytes()
+            if len(blob) != 4 * self.dimensions:
+                logger.warning(
+                    f"[EMBEDDING_CACHE] Not caching a vector of {len(blob) // 4} "
+                    f"dimensions (expected {self.dimensions})."
+                )
+                continue
+            rows.append((key, blob, self._tick()))
+        if not rows:
+            return
+        self._total_bytes -= self._stored_bytes([key for key, _, _ in rows])
+        self._db.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)", rows)
+        self._total_bytes += sum(len(blob) for _, blob, _ in rows)
+        self._evict()
+        self._db.commit()
+
+    def _stored_bytes(self, keys: List[bytes]) -> int:
+        total = 0
+        unique_keys = list(set(keys))
+        for i in range(0, len(unique_keys), _SQLITE_MAX_PARAMS):
+            part = unique_keys[i : i + _SQLITE_MAX_PARAMS]
+            total += self._db.execute(
+                f"SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings "
+                f"WHERE key IN ({','.join('?' * len(part))})",
+                part,
+            ).fetchone()[0]
+        return total
+
+    def _evict(self) -> None:
+        excess = self._total_bytes - self.max_bytes
+        if excess <= 0:
+            return
+        victims = []
+        for key, size in self._db.execute(
+            "SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_used"
+        ):
+            victims.append((key,))
+            excess -= size
+            self._total_bytes -= size
+            if excess <= 0:
+                break
+        self._db.executemany("DELETE FROM embeddings WHERE key = ?", victims)
+        self.stats.evictions += len(victims)
+
+    def embed(
+        self,
+        texts: Sequence[str],
+        embed_fn: Callable[[List[str]], Optional[List[List[float]]]],
+    ) -> Optional[List[List[float]]]:
+        """Embeds texts, calling `embed_fn` only for those not in the cache.
+
+        Texts that normalise to the same key are embedded once.
+
+        Args:
+            texts: The texts to embed.
+            embed_fn: Embeds a list of texts, returning None on failure
+                (e.g. `generate_embeddings`).
+
+        Returns:
+            One embedding per text, in input order, or None if `embed_fn`
+            failed.
+        """
+        keys = [self.key_for(text) for text in texts]
+        vectors: List = self._get(keys)
+        missing: Dict[bytes, str] = {}
+        for key, text, vector in zip(keys, texts, vectors):
+            if vector is None:
+                missing.setdefault(key, text)
+        if missing:
+            miss_texts = list(missing.values())
+            embedded = embed_fn(miss_texts)
+            if not embedded or len(embedded) != len(miss_texts):
+                return None
+            self._put(list(missing), embedded)
+            by_key = dict(zip(missing, embedded))
+            vectors = [
+                vector if vector is not None else by_key[key]
+                for key, vector in zip(keys, vectors)
+            ]
+        return [
+            vector.tolist() if isinstance(vector, np.ndarray) else list(vector)
+            for vector in vectors
+        ]
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self) -> None:
+        self._db.commit()
+        self._db.close()
+        logger.info(
+            f"[EMBEDDING_CACHE] {self.stats.hits} hits, {self.stats.misses} misses, "
+            f"{self.stats.evictions} evictions."
+        )
+
+    def __enter__(self) -> "EmbeddingCache":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
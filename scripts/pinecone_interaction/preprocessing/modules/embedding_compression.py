@@ -0,0 +1,343 @@
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_NONE = "none"
+COMPRESSION_TRUNCATE = "truncate"  # Keep the leading dimensions (text-embedding-3-*)
+COMPRESSION_PCA = "pca"
+COMPRESSION_METHODS = (COMPRESSION_NONE, COMPRESSION_TRUNCATE, COMPRESSION_PCA)
+
+DEFAULT_RECALL_KS = (1, 10, 100)
+DEFAULT_PCA_SAMPLE_ROWS = 50_000
+DEFAULT_SEARCH_BLOCK_ROWS = 65_536
+PROJECTION_FILENAME = "projection.npz"
+
+_INT8_MAX = 127
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Returns float32 copies of the rows scaled to unit length (zeros stay zero)."""
+    vectors = np.array(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
+
+class QuantizedVectors(NamedTuple):
+    """int8 codes with one float32 scale per vector: vector ~= codes * scale."""
+
+    codes: np.ndarray  # (n, dimensions) int8
+    scales: np.ndarray  # (n,) float32
+
+
+def quantize_int8(vectors: np.ndarray) -> QuantizedVectors:
+    """Scalar-quantizes each vector to int8 against its own largest component."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / _INT8_MAX
+    safe_scales = np.where(scales > 0, scales, 1.0)
+    codes = np.rint(vectors / safe_scales[:, None]).astype(np.int8)
+    return QuantizedVectors(codes, scales.astype(np.float32))
+
+
+def dequantize_int8(quantized: QuantizedVectors) -> np.ndarray:
+    return quantized.codes.astype(np.float32) * quantized.scales[:, None]
+
+
+class PCAProjection:
+    """Linear projection onto the top principal components of a sample."""
+
+    def __init__(self, mean: np.ndarray, components: np.ndarray, explained_variance: float):
+        self.mean = mean.astype(np.float32)
+        self.components = components.astype(np.float32)  # (dimensions, input dimensions)
+        self.explained_variance = explained_variance
+
+    @property
+    def dimensions(self) -> int:
+        return self.components.shape[0]
+
+    @classmethod
+    def fit(cls, sample: np.ndarray, dimensions: int) -> "PCAProjection":
+        """Fits the projection from the covariance of a sample of vectors."""
+        sample = np.asarray(sample, dtype=np.float64)
+        assert dimensions <= sample.shape[1], "cannot project to more dimensions"
+        mean = sample.mean(axis=0)
+        centered = sample - mean
+        covariance = centered.T @ centered / max(len(sample) - 1, 1)
+        eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+        order = np.argsort(eigenvalues)[::-1][:dimensions]
+        explained = float(eigenvalues[order].sum() / max(eigenvalues.sum(), 1e-12))
+        return cls(mean, eigenvectors[:, order].T, explained)
+
+    def transform(self, vectors: np.ndarray) -> np.ndarray:
+        """Projects vectors and renormalises them for cosine similarity.
+
+        The mean is only used to find the components: subtracting it before
+        projecting would change the angles between vectors, and with them
+        the ranking the projection is meant to preserve.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return normalize_rows(vectors @ self.components.T)
+
+    def save(self, path: Path) -> None:
+        np.savez(
+            path,
+            mean=self.mean,
+            components=self.components,
+            explained_variance=self.explained_variance,
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> "PCAProjection":
+        with np.load(path) as data:
+            return cls(
+                data["mean"], data["components"], float(data["explained_variance"])
+            )
+
+
+@dataclass
+class CompressionConfig:
+    """How embeddings are shrunk before they are stored."""
+
+    method: str = COMPRESSION_NONE  # One of COMPRESSION_METHODS
+    dimensions: Optional[int] = None  # Target size for truncate / pca
+    quantize: bool = False  # int8 codes with a float32 scale per vector
+
+    def __post_init__(self):
+        if self.method not in COMPRESSION_METHODS:
+            raise ValueError(
+                f"Unknown compression method {self.method!r}; expected one of {COMPRESSION_METHODS}"
+            )
+        if self.method != COMPRESSION_NONE and not self.dimensions:
+            raise ValueError(f"Compression method {self.method!r} needs dimensions")
+
+    @property
+    def name(self) -> str:
+        base = "float32" if self.method == COMPRESSION_NONE else f"{self.method}{self.dimensions}"
+        return f"{base}+int8" if self.quantize else base
+
+    def bytes_per_vector(self, input_dimensions: int) -> int:
+        dimensions = self.dimensions or input_dimensions
+        return dimensions + 4 if self.quantize else 4 * dimensions
+
+
+class EmbeddingCompressor:
+    """Applies a CompressionConfig: reduce dimensions, then optionally quantize.
+
+    Stored vectors and queries must go through the same `reduce`, so the
+    fitted PCA projection has to be kept with the compressed vectors (see
+    PROJECTION_FILENAME). Truncation keeps the leading dimensions and
+    renormalises, which is what the API returns for shortened
+    text-embedding-3 embeddings; it is meaningless for other models.
+    """
+
+    def __init__(
+        self, config: CompressionConfig, projection: Optional[PCAProjection] = None
+    ):
+        self.config = config
+        self.projection = projection
+
+    def fit(self, sample: np.ndarray) -> "EmbeddingCompressor":
+        """Fits the PCA projection (a no-op for other methods)."""
+        if self.config.method == COMPRESSION_PCA:
+            self.projection = PCAProjection.fit(sample, self.config.dimensions)
+            logger.info(
+                f"[COMPRESSION] PCA to {self.config.dimensions} dimensions keeps "
+                f"{self.projection.explained_variance:.1%} of the variance."
+            )
+        return self
+
+    def reduce(self, vectors: np.ndarray) -> np.ndarray:
+        """Reduces dimensions, returning unit-length float32 vectors."""
+        if self.config.method == COMPRESSION_TRUNCATE:
+            return normalize_rows(np.asarray(vectors)[:, : self.config.dimensions])
+        if self.config.method == COMPRESSION_PCA:
+            assert self.projection is not None, "fit() the compressor first"
+            return self.projection.transform(vectors)
+        return normalize_rows(vectors)
+
+    def compress(self, vectors: np.ndarray) -> Union[np.ndarray, QuantizedVectors]:
+        reduced = self.reduce(vectors)
+        return quantize_int8(reduced) if self.config.quantize else reduced
+
+
+def top_k(
+    database: Union[np.ndarray, QuantizedVectors],
+    queries: np.ndarray,
+    k: int,
+    block_rows: int = DEFAULT_SEARCH_BLOCK_ROWS,
+) -> np.ndarray:
+    """Exact inner-product search, returning the (n_queries, k) best rows.
+
+    int8 databases are scored as (codes @ query) * scale, one block of rows
+    at a time, so a full float copy of the database is never made.
+    """
+    queries = np.asarray(queries, dtype=np.float32)
+    rows = len(database.codes) if isinstance(database, QuantizedVectors) else len(database)
+    k = min(k, rows)
+    best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+    best_rows = np.empty((len(queries), 0), dtype=np.int64)
+    for start in range(0, rows, block_rows):
+        end = min(start + block_rows, rows)
+        if isinstance(database, QuantizedVectors):
+            block = database.codes[start:end].astype(np.float32)
+            scores = (queries @ block.T) * database.scales[start:end]
+        else:
+            scores = queries @ np.asarray(database[start:end], dtype=np.float32).T
+        scores = np.concatenate([best_scores, scores], axis=1)
+        candidates = np.concatenate(
+            [best_rows, np.broadcast_to(np.arange(start, end), (len(queries), end - start))],
+            axis=1,
+        )
+        keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(scores, keep, axis=1)
+        best_rows = np.take_along_axis(candidates, keep, axis=1)
+    order = np.argsort(-best_scores, axis=1)
+    return np.take_along_axis(best_rows, order, axis=1)
+
+
+def recall_at_k(truth: np.ndarray, found: np.ndarray, k: int) -> float:
+    """Mean fraction of each query's true top k that is in its found top k."""
+    hits = [
+        len(np.intersect1d(true_rows[:k], found_rows[:k], assume_unique=True))
+        for true_rows, found_rows in zip(truth, found)
+    ]
+    return float(np.mean(hits)) / k
+
+
+def compression_report(
+    database: np.ndarray,
+    queries: np.ndarray,
+    configs: Sequence[CompressionConfig],
+    ks: Sequence[int] = DEFAULT_RECALL_KS,
+    pca_sample_rows: int = DEFAULT_PCA_SAMPLE_ROWS,
+    seed: int = 0,
+) -> List[Dict[str, float]]:
+    """Measures the size and recall@k of compression settings.
+
+    The reference is exact cosine search with the uncompressed vectors.
+    Queries should be held out from `database` (and so from PCA fitting).
+
+    Returns:
+        Per config: its name, bytes per vector, compression ratio against
+        float32, and recall@k for every k.
+    """
+    input_dimensions = database.shape[1]
+    max_k = max(ks)
+    truth = top_k(normalize_rows(database), normalize_rows(queries), max_k)
+    rng = np.random.default_rng(seed)
+    sample = database[
+        np.sort(rng.choice(len(database), min(pca_sample_rows, len(database)), replace=False))
+    ]
+
+    report = []
+    for config in configs:
+        compressor = EmbeddingCompressor(config).fit(sample)
+        found = top_k(compressor.compress(database), compressor.reduce(queries), max_k)
+        size = config.bytes_per_vector(input_dimensions)
+        row: Dict[str, float] = {
+            "config": config.name,
+            "bytes_per_vector": size,
+            "ratio": 4 * input_dimensions / size,
+        }
+        for k in ks:
+            row[f"recall@{k}"] = recall_at_k(truth, found, k)
+        report.append(row)
+    return report
+
+
+def compress_store(
+    source_dir: Path,
+    target_dir: Path,
+    config: CompressionConfig,
+    pca_sample_rows: int = DEFAULT_PCA_SAMPLE_ROWS,
+    seed: int = 0,
+) -> None:
+    """Writes a compressed copy of a vector store, shard by shard.
+
+    The PCA projection, if any, is fitted on a sample of the source and
+    saved in the target as PROJECTION_FILENAME (recorded in its manifest) so
+    that queries can be projected the same way.
+    """
+    from .vector_store import VectorStore, VectorStoreWriter
+
+    with VectorStore(source_dir) as source:
+        compressor = EmbeddingCompressor(config)
+        if config.method == COMPRESSION_PCA:
+            rng = np.random.default_rng(seed)
+            rows = np.sort(
+                rng.choice(len(source), min(pca_sample_rows, len(source)), replace=False)
+            )
+            compressor.fit(source.vectors(rows.tolist()))
+
+        target_dir.mkdir(parents=True, exist_ok=True)
+        projection = None
+        if compressor.projection is not None:
+            compressor.projection.save(target_dir / PROJECTION_FILENAME)
+            projection = PROJECTION_FILENAME
+        with VectorStoreWriter(
+            target_dir,
+            f"{source.model}+{config.name}",
+            config.dimensions or source.dimensions,
+            dtype="int8" if config.quantize else "float32",
+            overwrite=True,
+            projection=projection,
+        ) as target:
+            for first_row, shard in source.iter_shards(dequantize=True):
+                target.append(
+                    compressor.reduce(shard),
+                    source.metadata(range(first_row, first_row + len(shard))),
+                )
+    logger.info(f"[COMPRESSION] Wrote {config.name} copy of {source_dir} to {target_dir}.")
+
+
+if __name__ == "__main__":
+    """Reports recall@k of compression settings on a vector store, or compresses it."""
+    import argparse
+
+    from .vector_store import VectorStore
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("store_dir", type=Path, help="Vector store to evaluate")
+    parser.add_argument("--queries", type=int, default=500, help="Held-out query rows")
+    parser.add_argument("--dimensions", type=int, nargs="+", default=[256, 512])
+    parser.add_argument("--k", type=int, nargs="+", default=list(DEFAULT_RECALL_KS))
+    parser.add_argument(
+        "--compress-to", type=Path, help="Also write a compressed copy here"
+    )
+    parser.add_argument("--method", choices=COMPRESSION_METHODS, default=COMPRESSION_PCA)
+    parser.add_argument("--int8", action="store_true", help="Quantize the copy")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    with VectorStore(args.store_dir) as store:
+        vectors = np.concatenate([shard for _, shard in store.iter_shards(dequantize=True)])
+    rng = np.random.default_rng(0)
+    held_out = np.zeros(len(vectors), dtype=bool)
+    held_out[rng.choice(len(vectors), min(args.queries, len(vectors) // 10), replace=False)] = True
+    configs = [CompressionConfig(quantize=True)]
+    for dimensions in args.dimensions:
+        for method in (COMPRESSION_TRUNCATE, COMPRESSION_PCA):
+            configs += [
+                CompressionConfig(method, dimensions),
+                CompressionConfig(method, dimensions, quantize=True),
+            ]
+    report = compression_report(vectors[~held_out], vectors[held_out], configs, args.k)
+    print(f"{int(held_out.sum())} held-out queries against {int((~held_out).sum())} vectors")
+    for row in report:
+        recalls = "  ".join(f"recall@{k} {row[f'recall@{k}']:.3f}" for k in args.k)
+        print(
+            f"{row['config']:>16}: {row['bytes_per_vector']:6d} B/vector "
+            f"({row['ratio']:5.1f}x)  {recalls}"
+        )
+
+    if args.compress_to is not None:
+        compress_store(
+            args.store_dir,
+            args.compress_to,
+            CompressionConfig(args.method, args.dimensions[0], quantize=args.int8),
+        )
@@ -1,34 +1,86 @@
 import tarfile
 import os
 import logging
+import multiprocessing
+import queue as queue_module
 import re
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Iterator, Dict, Optional, List, Tuple
-from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Generator, Iterator, Dict, Optional, List, Tuple
+from dataclasses import dataclass, field, replace
 from dotenv import load_dotenv
-import json
 
-from .types import Paper
-
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(module)s - %(funcName)s - %(message)s",
-    filename="pdf_extractor_direct.log",
-    filemode="w",
+from .decompression import (
+    ThreadedDecompressedStream,
+    archive_codec,
+    is_archive,
+    open_decompressed,
 )
-
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)
-console_formatter = logging.Formatter("%(levelname)s - %(message)s")
-console_handler.setFormatter(console_formatter)
-logging.getLogger().addHandler(console_handler)
+from .output_writer import (
+    DEFAULT_METADATA_BATCH_SIZE,
+    DEFAULT_SHARD_DEPTH,
+    BatchedJsonlWriter,
+    ShardedPdfWriter,
+)
+from .metrics import (
+    DEFAULT_DURATION_BUCKETS,
+    DEFAULT_SIZE_BUCKETS,
+    MetricsRegistry,
+    PeriodicMetricsExporter,
+)
+from .types import Paper, PdfPayloadRef
 
 load_dotenv()
 
 DEFAULT_SUPPORTED_EXTENSIONS = [".pdf"]
+DEFAULT_WORKER_QUEUE_SIZE = 16
+_WORKER_POLL_SECONDS = 0.2  # How often parallel workers and their consumer check on each other
+_WORKER_BATCH_BYTES = 8 * 1024 * 1024  # PDF bytes per worker queue message, at most
+
+# Called with (archive name, read cleanly) after the last Paper of an archive.
+ArchiveDoneHook = Callable[[str, bool], None]
 ARXIV_DATA_PATH = os.getenv("ARXIV_DATA_PATH")
 
+_PAPER_ID_PATTERN = re.compile(r"(\d{4}\.\d{5,}(?:v\d+)?)(?=\.pdf$)", re.IGNORECASE)
+
+# Extraction metrics are off by default; enable with
+# `EXTRACTION_METRICS.enabled = True` (or EXTRACTOR_METRICS_FILE when run directly).
+EXTRACTION_METRICS = MetricsRegistry(enabled=False)
+_MEMBERS_SCANNED = EXTRACTION_METRICS.counter(
+    "extractor_members_scanned_total", "Tar members inspected."
+)
+_PDFS_FOUND = EXTRACTION_METRICS.counter(
+    "extractor_pdfs_found_total", "PDF members with a parsable paper ID."
+)
+_BYTES_READ = EXTRACTION_METRICS.counter(
+    "extractor_pdf_bytes_read_total", "PDF bytes read from archives."
+)
+_ID_PARSE_FAILURES = EXTRACTION_METRICS.counter(
+    "extractor_id_parse_failures_total", "PDF members whose paper ID could not be parsed."
+)
+_MEMBER_READ_ERRORS = EXTRACTION_METRICS.counter(
+    "extractor_member_read_errors_total", "PDF members that could not be read."
+)
+_ARCHIVES_PROCESSED = EXTRACTION_METRICS.counter(
+    "extractor_archives_processed_total", "Archives fully walked."
+)
+_ARCHIVE_ERRORS = EXTRACTION_METRICS.counter(
+    "extractor_archive_errors_total", "Archives abandoned because of a read error."
+)
+_ARCHIVE_DURATION = EXTRACTION_METRICS.histogram(
+    "extractor_archive_duration_seconds",
+    "Wall time spent walking one archive.",
+    DEFAULT_DURATION_BUCKETS,
+)
+_PDF_SIZE = EXTRACTION_METRICS.histogram(
+    "extractor_pdf_size_bytes", "Size of extracted PDF members.", DEFAULT_SIZE_BUCKETS
+)
+
 
 @dataclass
 class ExtractionConfig:
@@ -37,9 +89,18 @@ class ExtractionConfig:
     supported_extensions: List[str] = field(
         default_factory=lambda: DEFAULT_SUPPORTED_EXTENSIONS
     )
-
-
-def _extract_paper_id_from_filename(pdf_filename: str) -> Optional[str]:
+    stream_members: bool = True  # Walk tar headers lazily instead of getmembers()
+    num_workers: int = 1  # >1 extracts archives concurrently in a process pool
+    preserve_order: bool = True  # Yield in serial order when num_workers > 1
+    queue_size: int = DEFAULT_WORKER_QUEUE_SIZE  # Papers per batch sent by a worker
+    lazy_pdf_content: bool = False  # Set Paper.pdf_source instead of reading bytes
+    skip_tar_filenames: List[str] = field(
+        default_factory=list
+    )  # Archive names to leave out (e.g. already ingested)
+    threaded_decompression: bool = True  # Decompress .tar.gz/.tar.zst on a helper thread
+
+
+def extract_paper_id_from_filename(pdf_filename: str) -> Optional[str]:
     """Extracts paper ID from the PDF filename.
 
     Assumes a format like 'YYYY.NNNNN.pdf' or 'YYYY.NNNNNvV.pdf'.
@@ -53,37 +114,485 @@ def _extract_paper_id_from_filename(pdf_filename: str) -> Optional[str]:
     Returns:
         The extracted paper_id string or None if the format doesn't match.
     """
-    logging.debug(
-        f"Attempting to extract paper ID from filename: '{pdf_filename}' (Length: {len(pdf_filename)})"
+    match = _PAPER_ID_PATTERN.search(pdf_filename)
+    return match.group(1) if match else None
+
+
+def iter_archive_members(
+    archive: tarfile.TarFile, stream_members: bool
+) -> Iterator[tarfile.TarInfo]:
+    """Yields the members of an open tar archive in on-disk order.
+
+    In streaming mode the tar header chain is walked one member at a time and
+    each TarInfo is released after it has been handled, so the first member is
+    available immediately and memory does not grow with the archive size.
+    Otherwise all headers are read up front via `getmembers()`.
+
+    Args:
+        archive: An open `tarfile.TarFile`.
+        stream_members: Whether to walk the archive lazily.
+
+    Yields:
+        `tarfile.TarInfo` objects for each member of the archive.
+    """
+    if not stream_members:
+        members = archive.getmembers()
+        logging.debug(f"Found {len(members)} members in {archive.name}")
+        yield from members
+        return
+
+    while True:
+        member = archive.next()
+        if member is None:
+            break
+        yield member
+        # TarFile.next() appends every header it reads to archive.members;
+        # dropping them keeps resident memory flat across large archives.
+        archive.members = []
+
+
+@contextmanager
+def open_archive(tar_path: Path, config: ExtractionConfig) -> Iterator[tarfile.TarFile]:
+    """Opens an uncompressed or compressed tar archive for reading.
+
+    Compressed archives (.tar.gz, .tgz, .tar.zst) are read in tarfile's
+    sequential stream mode straight from the decompressor, without writing
+    an uncompressed copy. With `config.threaded_decompression` the
+    decompression runs on a background thread.
+
+    Args:
+        tar_path: Path to the archive.
+        config: The effective ExtractionConfig.
+
+    Yields:
+        An open `tarfile.TarFile`.
+    """
+    codec = archive_codec(tar_path)
+    if codec is None:
+        with tarfile.open(tar_path, "r:") as archive:
+            yield archive
+        return
+
+    if config.threaded_decompression:
+        stream = ThreadedDecompressedStream(tar_path, codec)
+    else:
+        stream = open_decompressed(tar_path, codec)
+    try:
+        with tarfile.open(fileobj=stream, mode="r|") as archive:
+            yield archive
+    finally:
+        stream.close()
+
+
+def list_archives(input_dir: Path) -> List[Path]:
+    """Returns the .tar, .tar.gz, .tgz and .tar.zst files of a directory, sorted by name."""
+    return sorted(
+        path for path in input_dir.iterdir() if path.is_file() and is_archive(path)
     )
-    regex_pattern = r"(\d{4}\.\d{5,}(?:v\d+)?)(?=\.pdf$)"
-    logging.debug(f"Using regex pattern: {regex_pattern}")
-    match = re.search(regex_pattern, pdf_filename, re.IGNORECASE)
-    logging.debug(f"Regex match object for '{pdf_filename}': {match}")
-
-    if match:
-        paper_id = match.group(1)
-        logging.debug(
-            f"  Successfully extracted ID: {paper_id} from PDF filename: '{pdf_filename}'"
+
+
+def _iter_papers_from_tar(
+    tar_path: Path, config: ExtractionConfig
+) -> Generator[Paper, None, bool]:
+    """Extracts every supported PDF member of a single .tar archive.
+
+    Compressed archives are always walked in streaming mode, and PDF bytes
+    are read eagerly from them since a lazy reference needs a byte offset
+    into an uncompressed file.
+
+    Read errors on the archive itself are logged and end the iteration for
+    that archive; errors on individual members are recorded on the yielded
+    `Paper` via `extraction_error`.
+
+    Args:
+        tar_path: Path to a PDF .tar archive.
+        config: The effective ExtractionConfig.
+
+    Yields:
+        A `Paper` object for each PDF member with a recognisable paper ID.
+
+    Returns:
+        Whether the archive was read to its end without an archive error.
+    """
+    assert tar_path.is_file(), f"Archive path {tar_path} should be a file"
+    logging.info(f"Processing PDF tarball: {tar_path.name}")
+
+    is_compressed = archive_codec(tar_path) is not None
+    stream_members = config.stream_members or is_compressed
+    lazy_pdf_content = config.lazy_pdf_content and not is_compressed
+    extensions = tuple(config.supported_extensions)
+    # Checked once per archive so the per-member loop pays nothing for
+    # debug logging or metrics when they are disabled.
+    debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+    metrics = EXTRACTION_METRICS.enabled
+    started = time.perf_counter()
+
+    try:
+        with open_archive(tar_path, config) as archive:
+            for member in iter_archive_members(archive, stream_members):
+                if metrics:
+                    _MEMBERS_SCANNED.inc()
+                if not member.isfile() or not member.name.lower().endswith(extensions):
+                    if debug:
+                        logging.debug(
+                            "  Skipping member '%s' (IsFile: %s, IsDir: %s)",
+                            member.name,
+                            member.isfile(),
+                            member.isdir(),
+                        )
+                    continue
+
+                paper_id = extract_paper_id_from_filename(Path(member.name).name)
+
+                if not paper_id:
+                    if metrics:
+                        _ID_PARSE_FAILURES.inc()
+                    logging.warning(
+                        "  Could not derive paper ID for PDF member: %s in %s. Skipping.",
+                        member.name,
+                        tar_path.name,
+                    )
+                    continue
+
+                if debug:
+                    logging.debug(
+                        "  Found PDF: '%s' (Paper ID: %s, Size: %d bytes)",
+                        member.name,
+                        paper_id,
+                        member.size,
+                    )
+                if metrics:
+                    _PDFS_FOUND.inc()
+                    _PDF_SIZE.observe(member.size)
+                paper = Paper(paper_id=paper_id, source_gz_member_name=member.name)
+
+                # Set the source tar filename for the V2 metadata schema
+                paper.source_tar_filename = tar_path.name
+
+                if lazy_pdf_content:
+                    paper.pdf_source = PdfPayloadRef(
+                        tar_path=tar_path.resolve(),
+                        offset=member.offset_data,
+                        size=member.size,
+                    )
+                    yield paper
+                    continue
+
+                try:
+                    pdf_file_obj = archive.extractfile(member)
+                    if not pdf_file_obj:
+                        logging.warning(
+                            "    Could not extract PDF member stream: %s", member.name
+                        )
+                        paper.extraction_error = "Could not extract PDF member stream"
+                    else:
+                        paper.pdf_content = pdf_file_obj.read()
+                        pdf_file_obj.close()
+                        assert isinstance(
+                            paper.pdf_content, bytes
+                        ), "PDF content should be bytes"
+                        if metrics:
+                            _BYTES_READ.inc(len(paper.pdf_content))
+                except Exception as e:
+                    if metrics:
+                        _MEMBER_READ_ERRORS.inc()
+                    logging.error(
+                        f"    Error reading content of PDF member {member.name}: {e}",
+                        exc_info=True,
+                    )
+                    paper.extraction_error = f"Error reading PDF content: {e}"
+
+                yield paper
+
+        if metrics:
+            _ARCHIVES_PROCESSED.inc()
+        return True
+    except tarfile.ReadError as e:
+        if metrics:
+            _ARCHIVE_ERRORS.inc()
+        logging.error(
+            f"Could not read PDF tarball {tar_path.name}: {e} (Skipping this tar)"
         )
-        return paper_id
-    else:
-        logging.warning(
-            f"  Could not extract paper ID from PDF filename format: '{pdf_filename}' using regex."
+    except Exception as e:
+        if metrics:
+            _ARCHIVE_ERRORS.inc()
+        logging.error(
+            f"An unexpected error occurred processing PDF tarball {tar_path.name}: {e} (Skipping this tar)",
+            exc_info=True,
         )
-        return None
+    finally:
+        if metrics:
+            _ARCHIVE_DURATION.observe(time.perf_counter() - started)
+    return False
+
+
+@dataclass(frozen=True)
+class _ArchiveResult:
+    """Sent by a worker after the last Paper of an archive."""
+
+    clean: bool  # Read to its end without an archive error
+    metrics: Optional[Dict[str, Any]] = None  # Extraction metrics snapshot, if enabled
+
+
+# Set in each worker process by `_init_extraction_worker`.
+_worker_queue: Any = None
+_worker_stop: Any = None
+
+
+def _init_extraction_worker(queue: Any, stop: Any) -> None:
+    """Process pool initializer: hands the shared queue and stop event to a worker.
+
+    A plain `multiprocessing.Queue` can only be passed to a process when it
+    starts, not with each task. Workers only exit once the consumer has
+    received everything it wants, so they do not wait to flush the queue.
+    """
+    global _worker_queue, _worker_stop
+    _worker_queue, _worker_stop = queue, stop
+    queue.cancel_join_thread()
+
+
+def _put_until_stopped(item: Any) -> bool:
+    """Puts a message on the worker queue; returns False if the consumer stopped."""
+    while not _worker_stop.is_set():
+        try:
+            _worker_queue.put(item, timeout=_WORKER_POLL_SECONDS)
+            return True
+        except queue_module.Full:
+            continue
+    return False
+
+
+def _extract_tar_to_queue(
+    index: int, tar_path: Path, config: ExtractionConfig, collect_metrics: bool
+) -> None:
+    """Worker entry point: streams the Papers of one archive into the shared queue.
+
+    Messages are `(index, items)` pairs, where `items` is a batch of up to
+    `config.queue_size` Papers (or `_WORKER_BATCH_BYTES` of PDF content) and
+    the last batch ends with an `_ArchiveResult`; batching keeps the
+    per-message locking and pickling cost off the consumer. Members of
+    uncompressed archives are sent as lazy `PdfPayloadRef`s, so only a few
+    dozen bytes per paper cross the process boundary; the consumer reads the
+    bytes itself if the config asks for eager content.
+
+    Args:
+        index: Position of the archive in the consumer's list.
+        tar_path: Path to a PDF .tar archive.
+        config: The effective ExtractionConfig.
+        collect_metrics: Whether to record extraction metrics for this archive.
+    """
+    EXTRACTION_METRICS.enabled = collect_metrics
+    EXTRACTION_METRICS.reset()
+    papers = _iter_papers_from_tar(tar_path, replace(config, lazy_pdf_content=True))
+    batch: List[Any] = []
+    batch_bytes = 0
+    while True:
+        try:
+            paper = next(papers)
+        except StopIteration as done:
+            clean = done.value
+            break
+        batch.append(paper)
+        batch_bytes += len(paper.pdf_content or b"")
+        if len(batch) >= config.queue_size or batch_bytes >= _WORKER_BATCH_BYTES:
+            if not _put_until_stopped((index, batch)):
+                papers.close()
+                return
+            batch, batch_bytes = [], 0
+    snapshot = EXTRACTION_METRICS.snapshot() if collect_metrics else None
+    batch.append(_ArchiveResult(clean, snapshot))
+    _put_until_stopped((index, batch))
+
+
+def _load_pdf_content(paper: Paper) -> None:
+    """Replaces a Paper's lazy PDF reference by the bytes it points to."""
+    try:
+        paper.pdf_content = paper.pdf_source.read()
+        paper.pdf_source = None
+        if EXTRACTION_METRICS.enabled:
+            _BYTES_READ.inc(len(paper.pdf_content))
+    except OSError as e:
+        if EXTRACTION_METRICS.enabled:
+            _MEMBER_READ_ERRORS.inc()
+        logging.error(
+            f"    Error reading content of PDF member {paper.source_gz_member_name}: {e}"
+        )
+        paper.extraction_error = f"Error reading PDF content: {e}"
+
+
+def _iter_worker_items(
+    queue: Any, tar_files: List[Path], futures: List[Future]
+) -> Iterator[Tuple[int, Any]]:
+    """Yields `(index, Paper | _ArchiveResult)` items until every archive has a result.
+
+    `futures` holds the archives submitted so far and may grow while this
+    generator is suspended. A worker process that dies (e.g. killed by the
+    OOM killer) never sends its result; its future fails instead, and the
+    archive is reported as not read cleanly rather than leaving the consumer
+    waiting forever.
+    """
+    unfinished = set(range(len(tar_files)))
+    next_check = time.monotonic() + _WORKER_POLL_SECONDS
+    while unfinished:
+        try:
+            index, items = queue.get(timeout=_WORKER_POLL_SECONDS)
+        except queue_module.Empty:
+            index, items = None, None
+        if index in unfinished:
+            if isinstance(items[-1], _ArchiveResult):
+                unfinished.discard(index)
+            for item in items:
+                yield index, item
+
+        if items is None or time.monotonic() >= next_check:
+            next_check = time.monotonic() + _WORKER_POLL_SECONDS
+            for index in sorted(unfinished):
+                if index >= len(futures):
+                    break
+                future = futures[index]
+                if not future.done() or (
+                    not future.cancelled() and future.exception() is None
+                ):
+                    continue  # Running, or finished with its result still in the pipe
+                exc = None if future.cancelled() else future.exception()
+                logging.error(
+                    f"Extraction worker for {tar_files[index].name} failed: {exc}",
+                    exc_info=exc,
+                )
+                unfinished.discard(index)
+                yield index, _ArchiveResult(clean=False)
+
+
+def _iter_papers_parallel(
+    tar_files: List[Path],
+    config: ExtractionConfig,
+    on_archive_done: Optional[ArchiveDoneHook] = None,
+) -> Iterator[Paper]:
+    """Extracts several archives concurrently in a process pool.
+
+    Each archive is handled by one worker process; all workers stream
+    batches of Papers into one bounded `multiprocessing.Queue` holding two
+    batches per worker. In ordered mode the Papers of archives ahead of the
+    one being yielded are buffered here, in this process, so workers never
+    wait on each other and the output is exactly the sequence of the serial
+    extractor. Archives are only submitted up to `num_workers` ahead of the
+    one being yielded, which bounds that buffer to `num_workers - 1`
+    archives. Otherwise all archives are submitted at once and Papers are
+    yielded as they arrive.
+
+    Args:
+        tar_files: The archives to process.
+        config: The effective ExtractionConfig (num_workers > 1).
+        on_archive_done: See `iter_extracted_content`.
+
+    Yields:
+        `Paper` objects from all archives.
+    """
+    context = multiprocessing.get_context()
+    queue = context.Queue(maxsize=2 * config.num_workers)
+    stop = context.Event()
+    executor = ProcessPoolExecutor(
+        max_workers=config.num_workers,
+        mp_context=context,
+        initializer=_init_extraction_worker,
+        initargs=(queue, stop),
+    )
+    results: Dict[int, _ArchiveResult] = {}
+    futures: List[Future] = []
+    current = 0  # Archive being yielded in ordered mode
+
+    def submit_archives() -> None:
+        window = current + config.num_workers if config.preserve_order else len(tar_files)
+        while len(futures) < min(window, len(tar_files)):
+            index = len(futures)
+            try:
+                future = executor.submit(
+                    _extract_tar_to_queue,
+                    index,
+                    tar_files[index],
+                    config,
+                    EXTRACTION_METRICS.enabled,
+                )
+            except BrokenProcessPool as e:
+                # An earlier worker died; report the archive as failed.
+                future = Future()
+                future.set_exception(e)
+            futures.append(future)
+
+    try:
+        submit_archives()
+        buffers: List[Deque[Any]] = [deque() for _ in tar_files]
+
+        for index, payload in _iter_worker_items(queue, tar_files, futures):
+            if isinstance(payload, _ArchiveResult):
+                results[index] = payload
+                if payload.metrics is not None:
+                    EXTRACTION_METRICS.merge(payload.metrics)
+                if not config.preserve_order:
+                    continue
+            elif not config.preserve_order:
+                if not config.lazy_pdf_content and payload.pdf_source is not None:
+                    _load_pdf_content(payload)
+                yield payload
+                continue
+            buffers[index].append(payload)
+
+            while config.preserve_order and current < len(tar_files) and buffers[current]:
+                item = buffers[current].popleft()
+                if isinstance(item, _ArchiveResult):
+                    if on_archive_done is not None:
+                        on_archive_done(tar_files[current].name, item.clean)
+                    current += 1
+                    submit_archives()
+                    continue
+                if not config.lazy_pdf_content and item.pdf_source is not None:
+                    _load_pdf_content(item)
+                yield item
+
+        if not config.preserve_order and on_archive_done is not None:
+            for index, tar_path in enumerate(tar_files):
+                on_archive_done(tar_path.name, results[index].clean)
+    finally:
+        # Also runs when the consumer stops early: workers notice the stop
+        # event within one poll interval instead of blocking on a full queue.
+        stop.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+        queue.close()
+
+
+def _iter_papers_serial(
+    tar_files: List[Path],
+    config: ExtractionConfig,
+    on_archive_done: Optional[ArchiveDoneHook] = None,
+) -> Iterator[Paper]:
+    for tar_path in tar_files:
+        clean = yield from _iter_papers_from_tar(tar_path, config)
+        if on_archive_done is not None:
+            on_archive_done(tar_path.name, clean)
 
 
 def iter_extracted_content(
-    input_dir: Path, config: Optional[ExtractionConfig] = None
+    input_dir: Path,
+    config: Optional[ExtractionConfig] = None,
+    on_archive_done: Optional[ArchiveDoneHook] = None,
 ) -> Iterator[Paper]:
     """Iterates through .tar archives (expected to be arXiv PDF tarballs)
     and directly extracts PDF files found within them.
 
+    Compressed .tar.gz, .tgz and .tar.zst archives are read directly as well.
+
+    Archives are processed in sorted filename order. With
+    `config.num_workers > 1` they are spread over a process pool; see
+    `ExtractionConfig.preserve_order` for the ordering guarantees.
+
     Args:
         input_dir: The pathlib.Path object representing the directory
                    containing the PDF .tar archives (e.g., arXiv_pdf_YYMM_NNN.tar).
         config: An optional ExtractionConfig object. Defaults (for .pdf) will be used if None.
+        on_archive_done: Optional hook called in this process with the name
+            of each archive and whether it was read to its end without an
+            archive error, once its last Paper has been yielded (for an
+            unordered parallel run, only after all archives are done).
 
     Yields:
         A `Paper` object for each processed .pdf file found within the .tar archives.
@@ -110,116 +619,44 @@ def iter_extracted_content(
     assert all(
         ext.startswith(".") for ext in effective_config.supported_extensions
     ), "Config extensions should start with '.'"
+    assert effective_config.num_workers >= 1, "num_workers must be at least 1"
+    assert effective_config.queue_size >= 1, "queue_size must be at least 1"
 
     logging.info(f"Starting direct PDF extraction from PDF tarballs in: {input_dir}")
     logging.info(
         f"Supported file extensions for extraction: {effective_config.supported_extensions}"
     )
 
-    processed_pdf_files_count = 0
     yielded_papers_count = 0
-    processed_tar_archives = 0
 
     try:
-        tar_files = list(input_dir.glob("*.tar"))
+        tar_files = list_archives(input_dir)
     except Exception as e:
         logging.error(f"Error listing .tar files in {input_dir}: {e}", exc_info=True)
         return
 
-    logging.info(f"Found {len(tar_files)} .tar archives to process.")
-
-    for tar_path in tar_files:
-        assert tar_path.is_file(), f"Archive path {tar_path} should be a file"
-        processed_tar_archives += 1
-        logging.info(f"Processing PDF tarball: {tar_path.name}")
-
-        try:
-            with tarfile.open(tar_path, "r:") as archive:
-                members = archive.getmembers()
-                logging.debug(f"Found {len(members)} members in {tar_path.name}")
+    if effective_config.skip_tar_filenames:
+        skipped = set(effective_config.skip_tar_filenames)
+        tar_files = [path for path in tar_files if path.name not in skipped]
+        logging.info(f"Skipping {len(skipped)} archives listed in skip_tar_filenames.")
 
-                for member in members:
-                    logging.debug(
-                        f"  Inspecting member: '{member.name}' (IsFile: {member.isfile()}, IsDir: {member.isdir()}) "
-                    )
-                    if not member.isfile() or not member.name.lower().endswith(
-                        tuple(effective_config.supported_extensions)
-                    ):
-                        if member.isfile():
-                            logging.debug(
-                                f"    -> Member '{member.name}' is a file, but does not have a supported PDF extension. Skipping."
-                            )
-                        elif member.isdir():
-                            logging.debug(
-                                f"    -> Member '{member.name}' is a directory. Skipping."
-                            )
-                        else:
-                            logging.debug(
-                                f"    -> Member '{member.name}' is not a regular file or directory. Skipping."
-                            )
-                        continue
-
-                    pdf_filename = Path(member.name).name
-                    paper_id = _extract_paper_id_from_filename(pdf_filename)
-
-                    if not paper_id:
-                        logging.warning(
-                            f"  Could not derive paper ID for PDF member: {member.name} in {tar_path.name}. Skipping."
-                        )
-                        continue
-
-                    logging.info(
-                        f"  Found PDF: '{member.name}' (Paper ID: {paper_id}, Size: {member.size} bytes)"
-                    )
-                    processed_pdf_files_count += 1
-                    paper = Paper(paper_id=paper_id, source_gz_member_name=member.name)
-
-                    # Set the source tar filename for the V2 metadata schema
-                    paper.source_tar_filename = tar_path.name
-
-                    try:
-                        pdf_file_obj = archive.extractfile(member)
-                        if not pdf_file_obj:
-                            logging.warning(
-                                f"    Could not extract PDF member stream: {member.name}"
-                            )
-                            paper.extraction_error = (
-                                "Could not extract PDF member stream"
-                            )
-                        else:
-                            paper.pdf_content = pdf_file_obj.read()
-                            pdf_file_obj.close()
-                            assert isinstance(
-                                paper.pdf_content, bytes
-                            ), "PDF content should be bytes"
-                            logging.debug(
-                                f"    Successfully read {len(paper.pdf_content)} bytes for {paper_id}"
-                            )
-                    except Exception as e:
-                        logging.error(
-                            f"    Error reading content of PDF member {member.name}: {e}",
-                            exc_info=True,
-                        )
-                        paper.extraction_error = f"Error reading PDF content: {e}"
+    logging.info(f"Found {len(tar_files)} .tar archives to process.")
 
-                    yielded_papers_count += 1
-                    yield paper
+    if effective_config.num_workers > 1 and len(tar_files) > 1:
+        logging.info(
+            f"Extracting with {effective_config.num_workers} worker processes "
+            f"(preserve_order={effective_config.preserve_order})."
+        )
+        papers = _iter_papers_parallel(tar_files, effective_config, on_archive_done)
+    else:
+        papers = _iter_papers_serial(tar_files, effective_config, on_archive_done)
 
-        except tarfile.ReadError as e:
-            logging.error(
-                f"Could not read PDF tarball {tar_path.name}: {e} (Skipping this tar)"
-            )
-        except Exception as e:
-            logging.error(
-                f"An unexpected error occurred processing PDF tarball {tar_path.name}: {e} (Skipping this tar)",
-                exc_info=True,
-            )
+    for paper in papers:
+        yielded_papers_count += 1
+        yield paper
 
     logging.info(f"Finished direct PDF extraction from: {input_dir}.")
-    logging.info(f"Processed {processed_tar_archives} .tar archives.")
-    logging.info(
-        f"Found and attempted processing for {processed_pdf_files_count} PDF files."
-    )
+    logging.info(f"Processed {len(tar_files)} .tar archives.")
     logging.info(
         f"Yielded {yielded_papers_count} Paper objects (some may have errors)."
     )
@@ -235,6 +672,13 @@ def main_test_extraction():
     - EXTRACTOR_TARGET_COUNT: Number of papers to attempt to process (default: 20, aims for 1000 if default is hit).
     - EXTRACTOR_OUTPUT_PDF_DIR: Directory to save extracted PDF files (default: sample_direct_extracted_pdfs).
     - EXTRACTOR_OUTPUT_METADATA_FILE: Path for the JSONL metadata file (default: extracted_direct_pdfs_sample.jsonl).
+    - EXTRACTOR_LAZY_PDF: If "1", papers carry a lazy PDF reference and bytes are only read when saving.
+    - EXTRACTOR_WRITER_THREADS: Background threads for PDF writes (default: 0, blocking writes).
+    - EXTRACTOR_SHARD_DEPTH: Levels of hashed subdirectories for PDFs (default: 2 with writer threads, else 0).
+    - EXTRACTOR_METADATA_BATCH_SIZE: Metadata records per JSONL write (default: 100 with writer threads, else 1).
+    - EXTRACTOR_METRICS_FILE: If set, extraction metrics are collected and exported to this file
+      (Prometheus text format if it ends in .prom, JSON otherwise).
+    - EXTRACTOR_METRICS_INTERVAL: Seconds between metrics exports (default: 30).
     """
     folder_path_str = ARXIV_DATA_PATH
     if not folder_path_str:
@@ -310,9 +754,79 @@ def main_test_extraction():
     )
     logging.info(f"Saving PDF metadata to: {output_jsonl_file.resolve()}")
 
+    metrics_exporter = None
+    metrics_file_str = os.getenv("EXTRACTOR_METRICS_FILE")
+    if metrics_file_str:
+        EXTRACTION_METRICS.enabled = True
+        metrics_exporter = PeriodicMetricsExporter(
+            EXTRACTION_METRICS,
+            Path(metrics_file_str),
+            interval_seconds=float(os.getenv("EXTRACTOR_METRICS_INTERVAL", "30")),
+        ).start()
+        logging.info(f"Exporting extraction metrics to: {metrics_file_str}")
+
+    writer_threads = int(os.getenv("EXTRACTOR_WRITER_THREADS", "0"))
+    shard_depth = int(
+        os.getenv("EXTRACTOR_SHARD_DEPTH", DEFAULT_SHARD_DEPTH if writer_threads else 0)
+    )
+    metadata_batch_size = int(
+        os.getenv(
+            "EXTRACTOR_METADATA_BATCH_SIZE",
+            DEFAULT_METADATA_BATCH_SIZE if writer_threads else 1,
+        )
+    )
+    logging.info(
+        f"PDF writer: {writer_threads} background threads, shard depth {shard_depth}, "
+        f"metadata batch size {metadata_batch_size}."
+    )
+
+    # Metadata records wait here, in processing order, until their PDF write
+    # has finished and their final status is known.
+    pending_records: Deque[Tuple[Dict, Optional[Future]]] = deque()
+
+    def finalize_record(paper_dict_to_save: Dict, save_future: Optional[Future]) -> None:
+        nonlocal error_count
+        if save_future is None:
+            return
+        try:
+            relative_path = save_future.result()
+            logging.info(
+                f"  -> Saved extracted PDF to: {pdfs_output_dir / relative_path}"
+            )
+            # Update metadata for successful save
+            paper_dict_to_save["status"] = "extracted_and_saved"
+            paper_dict_to_save["extracted_pdf_filename"] = relative_path.as_posix()
+        except IOError as e:
+            logging.error(
+                f"  -> IOError saving PDF for {paper_dict_to_save['paper_id']}: {e}"
+            )
+            paper_dict_to_save["status"] = "save_failed"
+            error_msg = f"PDF save error: {e}"
+            paper_dict_to_save["error_details"] = (
+                error_msg
+                if not paper_dict_to_save["error_details"]
+                else f"{paper_dict_to_save['error_details']}; {error_msg}"
+            )
+            error_count += 1
+
+    def drain_records(metadata_writer: BatchedJsonlWriter, wait_all: bool) -> None:
+        while pending_records and (
+            wait_all or pending_records[0][1] is None or pending_records[0][1].done()
+        ):
+            paper_dict_to_save, save_future = pending_records.popleft()
+            finalize_record(paper_dict_to_save, save_future)
+            metadata_writer.write(paper_dict_to_save)
+
     try:
-        with open(output_jsonl_file, "w", encoding="utf-8") as f_out:
-            for paper in iter_extracted_content(folder_path):
+        with BatchedJsonlWriter(
+            output_jsonl_file, batch_size=metadata_batch_size
+        ) as metadata_writer, ShardedPdfWriter(
+            pdfs_output_dir, num_threads=writer_threads, shard_depth=shard_depth
+        ) as pdf_writer:
+            extraction_config = ExtractionConfig(
+                lazy_pdf_content=os.getenv("EXTRACTOR_LAZY_PDF") == "1"
+            )
+            for paper in iter_extracted_content(folder_path, extraction_config):
                 assert isinstance(paper, Paper), "Iterator should yield Paper objects"
 
                 papers_processed_sample += 1
@@ -341,9 +855,10 @@ def main_test_extraction():
                     "arxiv_abstract_url": f"https://arxiv.org/abs/{paper.paper_id}",
                     "arxiv_pdf_url": f"https://arxiv.org/pdf/{paper.paper_id}.pdf",
                 }
+                save_future = None
 
                 # Determine status and handle PDF extraction/saving
-                if paper.has_errors() or not paper.pdf_content:
+                if paper.has_errors() or not paper.pdf_size:
                     error_count += 1
                     paper_dict_to_save["status"] = "extraction_failed_content"
                     if not paper.extraction_error:
@@ -354,10 +869,10 @@ def main_test_extraction():
                         f"Paper ID {paper.paper_id} - Problem: {paper.extraction_error}"
                     )
                     paper_dict_to_save["error_details"] = paper.extraction_error
-                elif paper.pdf_content:
-                    # PDF content was successfully extracted
+                else:
+                    # PDF content was successfully extracted (or referenced)
                     extracted_papers_with_pdf += 1
-                    current_pdf_size = len(paper.pdf_content)
+                    current_pdf_size = paper.pdf_size
                     total_pdf_bytes_extracted += current_pdf_size
                     logging.info(
                         f"Paper ID {paper.paper_id} - PDF Extracted: {current_pdf_size} bytes from '{paper.source_gz_member_name}'."
@@ -365,44 +880,25 @@ def main_test_extraction():
 
                     paper_dict_to_save["extracted_pdf_size_bytes"] = current_pdf_size
 
-                    # Prepare to save the PDF file
-                    sanitized_paper_id = paper.paper_id.replace("/", "_")
-                    pdf_filename = f"{sanitized_paper_id}.pdf"
-                    pdf_save_path = pdfs_output_dir / pdf_filename
-
-                    try:
-                        if pdfs_output_dir.exists():
-                            with open(pdf_save_path, "wb") as pdf_file:
-                                pdf_file.write(paper.pdf_content)
-                            logging.info(
-                                f"  -> Saved extracted PDF to: {pdf_save_path}"
-                            )
-
-                            # Update metadata for successful save
-                            paper_dict_to_save["status"] = "extracted_and_saved"
-                            paper_dict_to_save["extracted_pdf_filename"] = pdf_filename
-                        else:
-                            logging.warning(
-                                f"  -> PDF output directory {pdfs_output_dir} not available. Skipping PDF save for {paper.paper_id}."
-                            )
-                            paper_dict_to_save["status"] = "save_failed"
-                            paper_dict_to_save["error_details"] = (
-                                "PDF output directory unavailable"
-                            )
-                    except IOError as e:
-                        logging.error(f"  -> IOError saving PDF {pdf_save_path}: {e}")
+                    if pdfs_output_dir.exists():
+                        save_future = pdf_writer.submit(
+                            paper.paper_id, paper.get_pdf_content()
+                        )
+                    else:
+                        logging.warning(
+                            f"  -> PDF output directory {pdfs_output_dir} not available. Skipping PDF save for {paper.paper_id}."
+                        )
                         paper_dict_to_save["status"] = "save_failed"
-                        error_msg = f"PDF save error: {e}"
                         paper_dict_to_save["error_details"] = (
-                            error_msg
-                            if not paper_dict_to_save["error_details"]
-                            else f"{paper_dict_to_save['error_details']}; {error_msg}"
+                            "PDF output directory unavailable"
                         )
-                        error_count += 1
 
-                # Write the metadata to the JSONL file
-                json.dump(paper_dict_to_save, f_out)
-                f_out.write("\n")
+                    # The writer holds the bytes now; don't keep them alive while logging.
+                    paper.release_pdf_content()
+
+                # Queue the metadata; it is written once the PDF save has finished
+                pending_records.append((paper_dict_to_save, save_future))
+                drain_records(metadata_writer, wait_all=False)
                 print(f"Sample Processed Paper {papers_processed_sample}: {paper!r}")
 
                 if papers_processed_sample >= max_papers_to_process:
@@ -411,6 +907,8 @@ def main_test_extraction():
                     )
                     break
 
+            drain_records(metadata_writer, wait_all=True)
+
         print("-" * 80)
         logging.info("Direct PDF Sample run summary:")
         logging.info(
@@ -443,7 +941,27 @@ def main_test_extraction():
             f"An unexpected error occurred during the direct PDF sample run: {e}",
             exc_info=True,
         )
+    finally:
+        if metrics_exporter is not None:
+            metrics_exporter.stop()
+
+
+def _configure_standalone_logging() -> None:
+    """Sets up file and console logging for standalone runs of this module."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(module)s - %(funcName)s - %(message)s",
+        filename="pdf_extractor_direct.log",
+        filemode="w",
+    )
+
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.INFO)
+    console_formatter = logging.Formatter("%(levelname)s - %(message)s")
+    console_handler.setFormatter(console_formatter)
+    logging.getLogger().addHandler(console_handler)
 
 
 if __name__ == "__main__":
+    _configure_standalone_logging()
     main_test_extraction()
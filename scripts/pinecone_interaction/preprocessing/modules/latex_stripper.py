@@ -0,0 +1,291 @@
+import logging
+import re
+import time
+from difflib import SequenceMatcher
+from typing import Callable, Dict, List, Optional, Sequence, Set
+
+logger = logging.getLogger(__name__)
+
+# Environments whose whole body is dropped (math, floats, code, bibliography).
+DROPPED_ENVIRONMENTS = frozenset(
+    {
+        "equation", "equation*", "align", "align*", "alignat", "alignat*",
+        "gather", "gather*", "multline", "multline*", "eqnarray", "eqnarray*",
+        "displaymath", "math", "array", "matrix", "pmatrix", "bmatrix",
+        "figure", "figure*", "table", "table*", "tabular", "tabular*",
+        "tikzpicture", "picture", "algorithm", "algorithmic", "lstlisting",
+        "verbatim", "minted", "thebibliography", "comment",
+    }
+)
+# Macros whose arguments are not prose, with the number of braced arguments
+# dropped along with them (an optional [...] argument before each one goes
+# too). Any other macro is removed on its own and the text of its arguments
+# is kept, so a group that merely follows a macro (`\noindent {\bf A.}`)
+# is never lost.
+DROPPED_ARGUMENT_MACROS: Dict[str, int] = {
+    "cite": 1, "citep": 1, "citet": 1, "citealp": 1, "citeauthor": 1,
+    "citeyear": 1, "nocite": 1, "ref": 1, "eqref": 1, "pageref": 1,
+    "autoref": 1, "cref": 1, "Cref": 1, "label": 1, "bibitem": 1,
+    "includegraphics": 1, "input": 1, "include": 1, "url": 1, "href": 1,
+    "documentclass": 1, "usepackage": 1, "bibliography": 1,
+    "bibliographystyle": 1, "graphicspath": 1, "hypersetup": 1,
+    "pagestyle": 1, "thispagestyle": 1, "vspace": 1, "hspace": 1,
+    "linespread": 1, "color": 1, "textcolor": 1, "ensuremath": 1,
+    "index": 1, "thanks": 1, "email": 1, "affiliation": 1,
+    "setlength": 2, "setcounter": 2, "addtocounter": 2, "fontsize": 2,
+    "newcommand": 2, "renewcommand": 2, "providecommand": 2,
+    "newtheorem": 2, "DeclareMathOperator": 2, "newenvironment": 3,
+    "renewenvironment": 3,
+}
+# Macros whose text argument stands apart from the text around it, so it
+# is kept with a space on either side instead of being run into it.
+SEPARATED_ARGUMENT_MACROS = frozenset(
+    {
+        "part", "chapter", "section", "subsection", "subsubsection",
+        "paragraph", "subparagraph", "title", "caption", "footnote",
+    }
+)
+
+STRIPPER_VERSION = 2  # Bump when strip_latex output changes (invalidates caches)
+
+DEFAULT_MIN_OUTPUT_RATIO = 0.2  # Output chars per input char below this is suspect
+DEFAULT_MAX_MARKUP_RATIO = 0.01  # Backslashes and braces left in the output
+
+_TOKEN = re.compile(
+    r"""
+      (?P<comment>(?<!\\)%[^\n]*)
+    | (?P<display>\$\$.*?\$\$|\\\[.*?\\\])
+    | (?P<inline>(?<!\\)\$(?:\\.|[^$\\])+\$|\\\(.*?\\\))
+    | (?P<begin>\\begin\s*\{(?P<env>[^}]+)\})
+    | (?P<end>\\end\s*\{[^}]+\})
+    | (?P<macro>\\(?P<name>[A-Za-z@]+\*?|.))
+    | (?P<brace>[{}])
+    """,
+    re.DOTALL | re.VERBOSE,
+)
+_OPTIONAL_ARG = re.compile(r"\s*\[[^\]]*\]")
+_WHITESPACE_RUN = re.compile(r"[ \t]+")
+_BLANK_LINES = re.compile(r"\n\s*\n\s*")
+_ESCAPED_CHARS = {"%": "%", "$": "$", "&": "&", "#": "#", "_": "_", "{": "{", "}": "}"}
+
+
+def _skip_braced(text: str, start: int) -> int:
+    """Returns the index after the braced group starting at `start` (if any)."""
+    pos = start
+    while pos < len(text) and text[pos] in " \t\n":
+        pos += 1
+    if pos >= len(text) or text[pos] != "{":
+        return start
+    depth = 0
+    while pos < len(text):
+        char = text[pos]
+        if char == "\\":
+            pos += 2
+            continue
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return pos + 1
+        pos += 1
+    return len(text)
+
+
+def strip_latex(latex: str) -> str:
+    """Strips LaTeX markup in a single pass over the source.
+
+    Comments, math, and the environments in DROPPED_ENVIRONMENTS are removed
+    entirely. Other `\\begin`/`\\end` markers and macros are removed, keeping
+    the text of their arguments; the macros in DROPPED_ARGUMENT_MACROS
+    (e.g. `\\cite`, `\\label`, `\\includegraphics`) are dropped with theirs.
+    The result is meant for fingerprinting, not for display: unlike
+    pylatexenc it does not render accents, symbols or section headings.
+
+    Args:
+        latex: The LaTeX source.
+
+    Returns:
+        The remaining text with whitespace normalised.
+    """
+    body_start = latex.find("\\begin{document}")
+    if body_start != -1:
+        latex = latex[body_start + len("\\begin{document}") :]
+    body_end = latex.find("\\end{document}")
+    if body_end != -1:
+        latex = latex[:body_end]
+
+    out: List[str] = []
+    pos = 0
+    length = len(latex)
+    spaced_braces: Set[int] = set()  # Closing braces of SEPARATED_ARGUMENT_MACROS
+    while pos < length:
+        match = _TOKEN.search(latex, pos)
+        if match is None:
+            out.append(latex[pos:])
+            break
+        out.append(latex[pos : match.start()])
+        pos = match.end()
+        kind = match.lastgroup
+
+        if kind == "begin":
+            env = match.group("env").strip()
+            if env in DROPPED_ENVIRONMENTS:
+                end_marker = f"\\end{{{env}}}"
+                end_pos = latex.find(end_marker, pos)
+                pos = length if end_pos == -1 else end_pos + len(end_marker)
+            out.append(" ")
+        elif kind == "macro":
+            name = match.group("name")
+            if name in _ESCAPED_CHARS:
+                out.append(_ESCAPED_CHARS[name])
+            elif name == "\\":
+                out.append("\n")
+            elif not name[0].isalpha():
+                out.append(" ")  # Spacing and accent macros
+            else:
+                name = name.rstrip("*")
+                for _ in range(DROPPED_ARGUMENT_MACROS.get(name, 0)):
+                    optional = _OPTIONAL_ARG.match(latex, pos)
+                    if optional is not None:
+                        pos = optional.end()
+                    pos = _skip_braced(latex, pos)
+                if name in SEPARATED_ARGUMENT_MACROS:
+                    optional = _OPTIONAL_ARG.match(latex, pos)
+                    if optional is not None:
+                        pos = optional.end()
+                    group_end = _skip_braced(latex, pos)
+                    if group_end != pos:
+                        spaced_braces.add(group_end - 1)
+                out.append(" ")
+                # Argument text that is kept stays in the output, and its
+                # braces are dropped as ordinary tokens.
+        elif kind in ("display", "inline", "end"):
+            out.append(" ")
+        elif kind == "brace" and match.start() in spaced_braces:
+            out.append(" ")
+        # Comments and other braces are dropped.
+
+    text = "".join(out).replace("~", " ")
+    text = _WHITESPACE_RUN.sub(" ", text)
+    text = _BLANK_LINES.sub("\n\n", text)
+    return "\n".join(line.strip() for line in text.split("\n")).strip()
+
+
+def passes_quality_check(
+    latex: str,
+    text: str,
+    min_output_ratio: float = DEFAULT_MIN_OUTPUT_RATIO,
+    max_markup_ratio: float = DEFAULT_MAX_MARKUP_RATIO,
+) -> bool:
+    """Checks whether stripped text looks like prose rather than a failed strip.
+
+    Fails when the output is empty, much shorter than the input (an unclosed
+    group or environment swallowed the document), still full of markup
+    (macro syntax the tokenizer did not understand), or mostly non-letters.
+    """
+    if not text:
+        return False
+    if len(text) < min_output_ratio * len(latex):
+        return False
+    markup = text.count("\\") + text.count("{") + text.count("}")
+    if markup > max_markup_ratio * len(text):
+        return False
+    letters = sum(1 for char in text if char.isalpha())
+    return letters >= 0.5 * len(text.replace(" ", "").replace("\n", ""))
+
+
+def text_agreement(a: str, b: str) -> float:
+    """Similarity of two conversions' word sequences, between 0.0 and 1.0."""
+    words_a, words_b = a.lower().split(), b.lower().split()
+    if not words_a and not words_b:
+        return 1.0
+    return SequenceMatcher(None, words_a, words_b, autojunk=False).ratio()
+
+
+def benchmark_engines(
+    documents: Sequence[str],
+    engines: Dict[str, Callable[[str], Optional[str]]],
+    reference: str,
+) -> Dict[str, Dict[str, float]]:
+    """Measures conversion throughput and agreement with a reference engine.
+
+    Args:
+        documents: LaTeX sources.
+        engines: Engine name to a function converting LaTeX to text.
+        reference: The engine the others' output is compared against.
+
+    Returns:
+        Per engine: documents and megabytes per second, mean agreement with
+        the reference, and the number of failed conversions.
+    """
+    input_mb = sum(len(doc.encode("utf-8")) for doc in documents) / 1e6
+    outputs: Dict[str, List[Optional[str]]] = {}
+    results: Dict[str, Dict[str, float]] = {}
+    for name, convert in engines.items():
+        converted: List[Optional[str]] = []
+        failures = 0
+        start = time.perf_counter()
+        for doc in documents:
+            try:
+                converted.append(convert(doc))
+            except Exception:
+                converted.append(None)
+                failures += 1
+        elapsed = max(time.perf_counter() - start, 1e-9)
+        outputs[name] = converted
+        results[name] = {
+            "docs_per_second": len(documents) / elapsed,
+            "mb_per_second": input_mb / elapsed,
+            "failures": failures,
+        }
+
+    for name, converted in outputs.items():
+        scores = [
+            text_agreement(ours or "", theirs or "")
+            for ours, theirs in zip(converted, outputs[reference])
+        ]
+        results[name]["agreement"] = sum(scores) / len(scores) if scores else 1.0
+    return results
+
+
+if __name__ == "__main__":
+    """Benchmarks the fast stripper against pylatexenc on a directory of .tex files."""
+    import argparse
+    from pathlib import Path
+
+    from .converter import CONVERTER_ENGINE_FAST, CONVERTER_ENGINE_PYLATEXENC, convert_latex_text
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("corpus_dir", type=Path, help="Directory of .tex files")
+    parser.add_argument("--limit", type=int, default=200, help="Max documents")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    tex_files = sorted(args.corpus_dir.rglob("*.tex"))[: args.limit]
+    sample = [path.read_text(encoding="utf-8", errors="replace") for path in tex_files]
+    print(f"Benchmarking on {len(sample)} documents from {args.corpus_dir}")
+
+    report = benchmark_engines(
+        sample,
+        {
+            CONVERTER_ENGINE_PYLATEXENC: lambda doc: convert_latex_text(
+                doc, CONVERTER_ENGINE_PYLATEXENC
+            ),
+            "regex": strip_latex,
+            CONVERTER_ENGINE_FAST: lambda doc: convert_latex_text(
+                doc, CONVERTER_ENGINE_FAST
+            ),
+        },
+        reference=CONVERTER_ENGINE_PYLATEXENC,
+    )
+    fallbacks = sum(
+        1 for doc in sample if not passes_quality_check(doc, strip_latex(doc))
+    )
+    for name, stats in report.items():
+        print(
+            f"{name:>12}: {stats['docs_per_second']:8.1f} docs/s "
+            f"{stats['mb_per_second']:7.2f} MB/s  agreement {stats['agreement']:.3f}  "
+            f"failures {int(stats['failures'])}"
+        )
+    print(f"Fast engine fell back to pylatexenc on {fallbacks}/{len(sample)} documents")
@@ -50,3 +50,26 @@ def load_jsonl_data(file_path: str) -> Generator[Dict[str, Any], None, None]:
     except Exception as e:
         print(f"Error reading file {file_path}: {e}")
         raise
+
+
+def load_data_generator(file_path: str) -> Generator[Dict[str, Any], None, None]:
+    """Yields the records of a JSON Lines file or a JSON file.
+
+    A `.jsonl` file yields one record per line. A `.json` file holding a
+    list yields its items, and one holding a single object yields that
+    object.
+
+    Args:
+        file_path: The path to the data file.
+
+    Yields:
+        A dictionary for each record.
+    """
+    if file_path.endswith(".jsonl"):
+        yield from load_jsonl_data(file_path)
+        return
+    data = load_json_data(file_path)
+    if isinstance(data, list):
+        yield from data
+    else:
+        yield data
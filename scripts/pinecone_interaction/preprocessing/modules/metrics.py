@@ -0,0 +1,193 @@
+import bisect
+import json
+import logging
+import math
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DURATION_BUCKETS = (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+DEFAULT_SIZE_BUCKETS = (1e4, 1e5, 5e5, 1e6, 5e6, 1e7, 5e7)
+DEFAULT_EXPORT_INTERVAL_SECONDS = 30.0
+
+EXPORT_FORMAT_JSON = "json"
+EXPORT_FORMAT_PROMETHEUS = "prometheus"
+
+
+class Counter:
+    """A monotonically increasing value."""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self.value = 0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+
+class Histogram:
+    """Counts observations in fixed, cumulative-on-export buckets."""
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float]):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self.bucket_counts = [0] * (len(self.buckets) + 1)  # Last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """A set of named counters and histograms with JSON/Prometheus export.
+
+    Metrics are plain Python attributes updated without locks, which is safe
+    for the single consuming thread of a pipeline stage. Call sites in hot
+    loops are expected to check `enabled` once and skip updates entirely
+    when metrics are off. Values from other processes can be folded in with
+    `merge`.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._counters: Dict[str, Counter] = {}
+        self._histograms: Dict[str, Histogram] = {}
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        if name not in self._counters:
+            self._counters[name] = Counter(name, help_text)
+        return self._counters[name]
+
+    def histogram(
+        self, name: str, help_text: str, buckets: Sequence[float]
+    ) -> Histogram:
+        if name not in self._histograms:
+            self._histograms[name] = Histogram(name, help_text, buckets)
+        return self._histograms[name]
+
+    def reset(self) -> None:
+        """Zeroes every metric, keeping the metric objects themselves."""
+        for counter in self._counters.values():
+            counter.value = 0
+        for histogram in self._histograms.values():
+            histogram.bucket_counts = [0] * len(histogram.bucket_counts)
+            histogram.sum = 0.0
+            histogram.count = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Returns the current values as a JSON-serialisable dictionary."""
+        return {
+            "counters": {name: c.value for name, c in self._counters.items()},
+            "histograms": {
+                name: {
+                    "buckets": list(h.buckets),
+                    "bucket_counts": list(h.bucket_counts),
+                    "sum": h.sum,
+                    "count": h.count,
+                }
+                for name, h in self._histograms.items()
+            },
+        }
+
+    def merge(self, snapshot: Dict[str, Any]) -> None:
+        """Adds the values of a snapshot (e.g. from a worker process)."""
+        for name, value in snapshot.get("counters", {}).items():
+            if name in self._counters:
+                self._counters[name].value += value
+        for name, data in snapshot.get("histograms", {}).items():
+            histogram = self._histograms.get(name)
+            if histogram is None or list(histogram.buckets) != data["buckets"]:
+                continue
+            for i, count in enumerate(data["bucket_counts"]):
+                histogram.bucket_counts[i] += count
+            histogram.sum += data["sum"]
+            histogram.count += data["count"]
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self) -> str:
+        """Renders the metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+        for counter in self._counters.values():
+            lines.append(f"# HELP {counter.name} {counter.help_text}")
+            lines.append(f"# TYPE {counter.name} counter")
+            lines.append(f"{counter.name} {counter.value}")
+        for h in self._histograms.values():
+            lines.append(f"# HELP {h.name} {h.help_text}")
+            lines.append(f"# TYPE {h.name} histogram")
+            cumulative = 0
+            for bound, count in zip(list(h.buckets) + [math.inf], h.bucket_counts):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else repr(float(bound))
+                lines.append(f'{h.name}_bucket{{le="{le}"}} {cumulative}')
+            lines.append(f"{h.name}_sum {h.sum}")
+            lines.append(f"{h.name}_count {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: Path, fmt: str = EXPORT_FORMAT_JSON) -> None:
+        """Atomically writes a snapshot to a file in the given format."""
+        text = self.to_prometheus() if fmt == EXPORT_FORMAT_PROMETHEUS else self.to_json()
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+
+class PeriodicMetricsExporter:
+    """Writes registry snapshots to a file on a background thread.
+
+    A final snapshot is written when the exporter is stopped.
+    """
+
+    def __init__(
+        self,
+        registry: MetricsRegistry,
+        path: Path,
+        interval_seconds: float = DEFAULT_EXPORT_INTERVAL_SECONDS,
+        fmt: Optional[str] = None,
+    ):
+        self.registry = registry
+        self.path = path
+        self.interval_seconds = interval_seconds
+        self.fmt = fmt or (
+            EXPORT_FORMAT_PROMETHEUS if path.suffix == ".prom" else EXPORT_FORMAT_JSON
+        )
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="metrics-exporter", daemon=True
+        )
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            self._export()
+
+    def _export(self) -> None:
+        try:
+            self.registry.export(self.path, self.fmt)
+        except OSError as e:
+            logger.warning(f"[METRICS] Could not export metrics to {self.path}: {e}")
+
+    def start(self) -> "PeriodicMetricsExporter":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self._export()
+
+    def __enter__(self) -> "PeriodicMetricsExporter":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
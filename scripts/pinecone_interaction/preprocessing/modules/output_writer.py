@@ -0,0 +1,138 @@
+import hashlib
+import json
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Set
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WRITER_THREADS = 4
+DEFAULT_SHARD_DEPTH = 2  # Two levels of 256 subdirectories each
+DEFAULT_METADATA_BATCH_SIZE = 100
+
+
+class ShardedPdfWriter:
+    """Writes PDF files into hashed subdirectories, optionally on a thread pool.
+
+    A paper's file goes to `<output_dir>/<ab>/<cd>/<paper_id>.pdf`, where
+    `ab`, `cd` are the leading hex pairs of the SHA-1 of its ID, so no single
+    directory grows to millions of entries. With `num_threads > 0` writes run
+    on a bounded pool and `submit` blocks once `max_pending` writes are
+    queued, which keeps memory bounded while reads and writes overlap. With
+    `num_threads=0` and `shard_depth=0` it behaves like a plain blocking
+    write into a flat directory.
+    """
+
+    def __init__(
+        self,
+        output_dir: Path,
+        num_threads: int = DEFAULT_WRITER_THREADS,
+        shard_depth: int = DEFAULT_SHARD_DEPTH,
+        max_pending: int = 0,
+    ):
+        assert num_threads >= 0, "num_threads cannot be negative"
+        assert 0 <= shard_depth <= 20, "shard_depth must be between 0 and 20"
+        self.output_dir = output_dir
+        self.shard_depth = shard_depth
+        self._executor = (
+            ThreadPoolExecutor(max_workers=num_threads, thread_name_prefix="pdf-writer")
+            if num_threads > 0
+            else None
+        )
+        self._slots = threading.BoundedSemaphore(max_pending or 4 * max(num_threads, 1))
+        self._created_dirs: Set[Path] = set()
+
+    def relative_path_for(self, paper_id: str) -> Path:
+        """Returns the path of a paper's PDF relative to the output directory."""
+        filename = f"{paper_id.replace('/', '_')}.pdf"
+        if not self.shard_depth:
+            return Path(filename)
+        digest = hashlib.sha1(paper_id.encode("utf-8")).hexdigest()
+        shards = [digest[2 * i : 2 * i + 2] for i in range(self.shard_depth)]
+        return Path(*shards, filename)
+
+    def _write(self, relative_path: Path, data: bytes) -> Path:
+        target = self.output_dir / relative_path
+        if target.parent not in self._created_dirs:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            self._created_dirs.add(target.parent)
+        with open(target, "wb") as f:
+            f.write(data)
+        return relative_path
+
+    def submit(self, paper_id: str, data: bytes) -> "Future[Path]":
+        """Schedules a PDF write.
+
+        Args:
+            paper_id: The paper's ID, used for the file name and shard.
+            data: The PDF bytes.
+
+        Returns:
+            A future resolving to the written path relative to the output
+            directory, or raising the IOError of a failed write.
+        """
+        relative_path = self.relative_path_for(paper_id)
+        if self._executor is None:
+            future: Future = Future()
+            try:
+                future.set_result(self._write(relative_path, data))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        self._slots.acquire()
+        future = self._executor.submit(self._write, relative_path, data)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def close(self) -> None:
+        """Waits for all queued writes to finish."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    def __enter__(self) -> "ShardedPdfWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class BatchedJsonlWriter:
+    """Appends JSON records to a JSON Lines file in batches.
+
+    Records are serialised immediately but written with a single `write`
+    call per batch, and the batch is flushed when the writer is closed.
+    """
+
+    def __init__(
+        self, path: Path, batch_size: int = DEFAULT_METADATA_BATCH_SIZE, mode: str = "w"
+    ):
+        assert batch_size > 0, "batch_size must be positive"
+        self.path = path
+        self.batch_size = batch_size
+        self._file = open(path, mode, encoding="utf-8")
+        self._lines: List[str] = []
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self._lines.append(json.dumps(record))
+        if len(self._lines) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._lines:
+            self._file.write("\n".join(self._lines) + "\n")
+            self._lines.clear()
+        self._file.flush()
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self) -> "BatchedJsonlWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
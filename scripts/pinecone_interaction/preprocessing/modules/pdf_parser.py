@@ -0,0 +1,353 @@
+import io
+import itertools
+import logging
+import os
+import re
+import signal
+import tempfile
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Deque, Iterable, Iterator, List, Optional, Tuple, Union
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # Only needed when the parsing stage is used
+    PdfReader = None
+
+from .types import Paper, PdfPayloadRef
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARSE_TIMEOUT_SECONDS = 120.0
+DEFAULT_SPLIT_MIN_BYTES = 5 * 1024 * 1024  # Only count pages of PDFs above 5 MiB
+DEFAULT_PAGES_PER_TASK = 20
+
+PdfSource = Union[bytes, PdfPayloadRef]
+
+
+@dataclass
+class PdfParsingConfig:
+    """Configuration for the parallel PDF-to-text parsing stage."""
+
+    num_workers: int = field(default_factory=lambda: os.cpu_count() or 1)
+    timeout_seconds: float = DEFAULT_PARSE_TIMEOUT_SECONDS  # Per parse task
+    split_min_bytes: int = DEFAULT_SPLIT_MIN_BYTES  # 0 disables page splitting
+    pages_per_task: int = DEFAULT_PAGES_PER_TASK
+    max_pending_papers: int = 0  # Papers in flight; 0 means 4 * num_workers
+    release_pdf_content: bool = True  # Drop PDF bytes once text is extracted
+    spill_dir: Optional[Path] = None  # Temp files for split in-memory PDFs (None: system default)
+
+
+class _ParseTimeout(TimeoutError):
+    """Raised inside a worker when a parse task exceeds its time budget."""
+
+
+# The last split PDF opened in this worker, keyed by the parent's task key,
+# so the page-range tasks of one PDF that land here parse it only once.
+_worker_reader: Optional[Tuple[int, "PdfReader"]] = None
+
+
+def _raise_parse_timeout(signum, frame) -> None:
+    raise _ParseTimeout()
+
+
+def _init_parse_worker() -> None:
+    """Installs the SIGALRM handler used to interrupt slow parse tasks."""
+    signal.signal(signal.SIGALRM, _raise_parse_timeout)
+
+
+def _open_pdf(source: PdfSource, reader_key: Optional[int] = None) -> "PdfReader":
+    """Opens a PDF, reusing this worker's cached reader for `reader_key`."""
+    global _worker_reader
+    if PdfReader is None:
+        raise ImportError("The 'pypdf' package is required for PDF parsing")
+    if reader_key is not None and _worker_reader is not None:
+        if _worker_reader[0] == reader_key:
+            return _worker_reader[1]
+        _worker_reader = None
+    data = source.read() if isinstance(source, PdfPayloadRef) else source
+    reader = PdfReader(io.BytesIO(data))
+    if reader_key is not None:
+        _worker_reader = (reader_key, reader)
+    return reader
+
+
+def _run_with_alarm(timeout_seconds: float, func, *args):
+    global _worker_reader
+    signal.setitimer(signal.ITIMER_REAL, timeout_seconds)
+    try:
+        return func(*args)
+    except BaseException:
+        _worker_reader = None  # An interrupted task may leave it half-read
+        raise
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def _count_pdf_pages(
+    source: PdfSource, timeout_seconds: float, reader_key: Optional[int] = None
+) -> int:
+    """Worker task: returns the number of pages of a PDF."""
+    return _run_with_alarm(
+        timeout_seconds, lambda: len(_open_pdf(source, reader_key).pages)
+    )
+
+
+def _extract_pdf_text(
+    source: PdfSource,
+    page_range: Optional[Tuple[int, int]],
+    timeout_seconds: float,
+    reader_key: Optional[int] = None,
+) -> str:
+    """Worker task: extracts the raw text of a PDF or of a range of its pages.
+
+    Args:
+        source: The PDF bytes or a lazy reference to them.
+        page_range: Optional (start, end) page indices, end exclusive.
+        timeout_seconds: Wall-clock budget enforced with SIGALRM.
+        reader_key: Set for split PDFs: the parsed PDF is kept in the worker
+            under this key for the next range of the same PDF.
+
+    Returns:
+        The extracted text, pages separated by blank lines.
+    """
+
+    def extract() -> str:
+        reader = _open_pdf(source, reader_key)
+        pages = reader.pages
+        start, end = page_range if page_range is not None else (0, len(pages))
+        return "\n\n".join(pages[i].extract_text() or "" for i in range(start, end))
+
+    return _run_with_alarm(timeout_seconds, extract)
+
+
+_HYPHENATED_BREAK = re.compile(r"(\w)-\n(\w)")
+_SOFT_LINE_BREAK = re.compile(r"(?<!\n)\n(?!\n)")
+_HORIZONTAL_WHITESPACE = re.compile(r"[ \t\f\v]+")
+_EXTRA_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+def clean_extracted_text(text: str) -> str:
+    """Normalises raw PDF text into prose.
+
+    Re-joins words hyphenated across line breaks, turns single line breaks
+    into spaces while keeping paragraph breaks, and collapses whitespace.
+    """
+    text = text.replace("\r\n", "\n").replace("\x00", "")
+    text = _HYPHENATED_BREAK.sub(r"\1\2", text)
+    text = _SOFT_LINE_BREAK.sub(" ", text)
+    text = _HORIZONTAL_WHITESPACE.sub(" ", text)
+    text = _EXTRA_BLANK_LINES.sub("\n\n", text)
+    return text.strip()
+
+
+class _PendingPaper:
+    """Book-keeping for one paper while its parse tasks are in flight."""
+
+    def __init__(
+        self, paper: Paper, source: Optional[PdfSource], passthrough: bool = False
+    ):
+        self.paper = paper
+        self.source = source
+        self.passthrough = passthrough
+        self.reader_key: Optional[int] = None  # Set when the PDF is split
+        self.spill_path: Optional[Path] = None
+        self.count_future: Optional[Future] = None
+        self.part_futures: List[Future] = []
+
+    def split(self, reader_key: int, spill_dir: Optional[Path]) -> None:
+        """Prepares the PDF for page-range tasks.
+
+        In-memory bytes are written to a temporary file once, so each task
+        is sent a small PdfPayloadRef rather than a copy of the PDF.
+        """
+        self.reader_key = reader_key
+        if isinstance(self.source, bytes):
+            fd, path = tempfile.mkstemp(suffix=".pdf", dir=spill_dir)
+            with os.fdopen(fd, "wb") as f:
+                f.write(self.source)
+            self.spill_path = Path(path)
+            self.source = PdfPayloadRef(self.spill_path, 0, len(self.source))
+
+    def discard_spill(self) -> None:
+        if self.spill_path is not None:
+            self.spill_path.unlink(missing_ok=True)
+            self.spill_path = None
+
+    def is_done(self) -> bool:
+        if self.passthrough or self.source is None:
+            return True
+        if not self.part_futures:
+            return self.count_future is not None and self.count_future.done() and (
+                self.count_future.exception() is not None
+            )
+        return all(future.done() for future in self.part_futures)
+
+    def futures(self) -> List[Future]:
+        if self.part_futures:
+            return self.part_futures
+        return [self.count_future] if self.count_future is not None else []
+
+
+def _paper_source(paper: Paper) -> Optional[PdfSource]:
+    if paper.pdf_content is not None:
+        return paper.pdf_content
+    return paper.pdf_source
+
+
+def _submit_parts(
+    executor: ProcessPoolExecutor,
+    pending: _PendingPaper,
+    page_count: Optional[int],
+    config: PdfParsingConfig,
+) -> None:
+    if page_count is None or page_count <= config.pages_per_task:
+        ranges: List[Optional[Tuple[int, int]]] = [None]
+    else:
+        ranges = [
+            (start, min(start + config.pages_per_task, page_count))
+            for start in range(0, page_count, config.pages_per_task)
+        ]
+    pending.part_futures = [
+        executor.submit(
+            _extract_pdf_text,
+            pending.source,
+            page_range,
+            config.timeout_seconds,
+            pending.reader_key if len(ranges) > 1 else None,
+        )
+        for page_range in ranges
+    ]
+
+
+def _finish_paper(pending: _PendingPaper, config: PdfParsingConfig) -> Paper:
+    """Collects the results of a finished paper into its parsing fields."""
+    paper = pending.paper
+    pending.discard_spill()
+    if pending.passthrough:
+        return paper
+    if pending.source is None:
+        paper.parsing_error = "No PDF content available for parsing"
+        return paper
+
+    try:
+        futures = pending.futures()
+        parts = [future.result() for future in futures]
+        text = clean_extracted_text("\n\n".join(parts))
+    except _ParseTimeout:
+        paper.parsing_error = f"Parsing timed out after {config.timeout_seconds}s"
+        logger.warning(f"[PDF_PARSER][{paper.paper_id}] {paper.parsing_error}")
+        return paper
+    except Exception as e:
+        paper.parsing_error = f"Parsing failed: {type(e).__name__}: {str(e)}"
+        logger.warning(f"[PDF_PARSER][{paper.paper_id}] {paper.parsing_error}")
+        return paper
+
+    if not text:
+        paper.parsing_error = "Parsing resulted in empty text"
+        logger.warning(f"[PDF_PARSER][{paper.paper_id}] {paper.parsing_error}")
+        return paper
+
+    paper.cleaned_prose_text = text
+    if config.release_pdf_content:
+        paper.release_pdf_content()
+    logger.debug(
+        f"[PDF_PARSER][{paper.paper_id}] Parsed {len(text)} chars in {len(futures)} task(s)."
+    )
+    return paper
+
+
+def iter_parsed_papers(
+    papers: Iterable[Paper], config: Optional[PdfParsingConfig] = None
+) -> Iterator[Paper]:
+    """Fills `cleaned_prose_text` for a stream of papers using a process pool.
+
+    Papers are parsed concurrently, with at most `max_pending_papers` in
+    flight, and yielded in input order. Each parse task is interrupted in
+    its worker (via SIGALRM) after `timeout_seconds`, so a pathological PDF
+    costs at most that budget per task and never blocks a worker. PDFs
+    larger than `split_min_bytes` are split into ranges of `pages_per_task`
+    pages so that one long document is spread across several workers; each
+    worker parses such a PDF once for all the ranges it gets, and reads it
+    from the archive (or a temporary file under `spill_dir`) instead of being
+    sent its bytes. Papers with pre-existing errors are passed through
+    untouched; failures set `parsing_error`.
+
+    Args:
+        papers: Papers with `pdf_content` or `pdf_source` set.
+        config: Optional PdfParsingConfig.
+
+    Yields:
+        The input papers, in order, with parsing fields populated.
+    """
+    effective_config = config if config is not None else PdfParsingConfig()
+    assert effective_config.num_workers >= 1, "num_workers must be at least 1"
+    assert effective_config.pages_per_task >= 1, "pages_per_task must be at least 1"
+    max_pending = effective_config.max_pending_papers or 4 * effective_config.num_workers
+
+    paper_iter = iter(papers)
+    exhausted = False
+    pending: Deque[_PendingPaper] = deque()
+    reader_keys = itertools.count()
+
+    with ProcessPoolExecutor(
+        max_workers=effective_config.num_workers, initializer=_init_parse_worker
+    ) as executor:
+        try:
+            while True:
+                while not exhausted and len(pending) < max_pending:
+                    paper = next(paper_iter, None)
+                    if paper is None:
+                        exhausted = True
+                        break
+                    if paper.has_errors():
+                        pending.append(_PendingPaper(paper, None, passthrough=True))
+                        continue
+                    entry = _PendingPaper(paper, _paper_source(paper))
+                    if entry.source is not None:
+                        if effective_config.split_min_bytes and (
+                            paper.pdf_size >= effective_config.split_min_bytes
+                        ):
+                            entry.split(next(reader_keys), effective_config.spill_dir)
+                            entry.count_future = executor.submit(
+                                _count_pdf_pages,
+                                entry.source,
+                                effective_config.timeout_seconds,
+                                entry.reader_key,
+                            )
+                        else:
+                            _submit_parts(executor, entry, None, effective_config)
+                    pending.append(entry)
+
+                if not pending:
+                    break
+
+                # Fan out page ranges for any large PDF whose page count is known.
+                for entry in pending:
+                    if (
+                        entry.count_future is not None
+                        and not entry.part_futures
+                        and entry.count_future.done()
+                        and entry.count_future.exception() is None
+                    ):
+                        _submit_parts(
+                            executor,
+                            entry,
+                            entry.count_future.result(),
+                            effective_config,
+                        )
+
+                if pending[0].is_done():
+                    yield _finish_paper(pending.popleft(), effective_config)
+                    continue
+
+                in_flight = [
+                    f for entry in pending for f in entry.futures() if not f.done()
+                ]
+                wait(in_flight, timeout=1.0, return_when=FIRST_COMPLETED)
+        finally:
+            # Also runs when the consumer stops early.
+            for entry in pending:
+                entry.discard_spill()
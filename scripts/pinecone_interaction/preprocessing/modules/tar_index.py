@@ -0,0 +1,306 @@
+import gzip
+import json
+import logging
+import os
+import tarfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from dotenv import load_dotenv
+
+from .extractor import (
+    ExtractionConfig,
+    extract_paper_id_from_filename,
+    iter_archive_members,
+)
+from .types import PdfPayloadRef
+
+logger = logging.getLogger(__name__)
+load_dotenv()
+
+INDEX_FORMAT_VERSION = 1
+INDEX_SUFFIX = ".idx.json.gz"
+
+
+@dataclass(frozen=True)
+class TarMemberLocation:
+    """Where a single PDF member lives inside an uncompressed .tar archive."""
+
+    tar_path: Path  # Archive that contains the member
+    member_name: str  # Path of the member within the archive
+    offset: int  # Byte offset of the member's data (TarInfo.offset_data)
+    size: int  # Size of the member's data in bytes
+
+
+def index_path_for(tar_path: Path) -> Path:
+    """Returns the sidecar index path for an archive (e.g. 'x.tar.idx.json.gz')."""
+    return tar_path.with_name(tar_path.name + INDEX_SUFFIX)
+
+
+def _scan_tar_members(
+    tar_path: Path, config: Optional[ExtractionConfig] = None
+) -> Dict[str, TarMemberLocation]:
+    """Reads an archive's header chain and locates its PDF members.
+
+    Raises:
+        tarfile.ReadError: If the archive cannot be read.
+    """
+    effective_config = config if config is not None else ExtractionConfig()
+    extensions = tuple(effective_config.supported_extensions)
+
+    locations: Dict[str, TarMemberLocation] = {}
+    with tarfile.open(tar_path, "r:") as archive:
+        for member in iter_archive_members(archive, stream_members=True):
+            if not member.isfile() or not member.name.lower().endswith(extensions):
+                continue
+            paper_id = extract_paper_id_from_filename(Path(member.name).name)
+            if not paper_id:
+                continue
+            if paper_id in locations:
+                logger.warning(
+                    f"[TAR_INDEX] Duplicate paper ID {paper_id} in {tar_path.name}; keeping the later member."
+                )
+            locations[paper_id] = TarMemberLocation(
+                tar_path=tar_path,
+                member_name=member.name,
+                offset=member.offset_data,
+                size=member.size,
+            )
+    return locations
+
+
+def _write_tar_index(tar_path: Path, locations: Dict[str, TarMemberLocation]) -> Path:
+    """Atomically writes an archive's sidecar index.
+
+    Raises:
+        OSError: If the sidecar cannot be written (e.g. a read-only input directory).
+    """
+    stat = tar_path.stat()
+    payload = {
+        "version": INDEX_FORMAT_VERSION,
+        "tar_filename": tar_path.name,
+        "tar_size": stat.st_size,
+        "tar_mtime_ns": stat.st_mtime_ns,
+        "entries": {
+            paper_id: [loc.member_name, loc.offset, loc.size]
+            for paper_id, loc in locations.items()
+        },
+    }
+
+    sidecar_path = index_path_for(tar_path)
+    tmp_path = sidecar_path.with_name(sidecar_path.name + ".tmp")
+    try:
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(payload, f, separators=(",", ":"))
+        os.replace(tmp_path, sidecar_path)
+    except OSError:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return sidecar_path
+
+
+def build_tar_index(
+    tar_path: Path, config: Optional[ExtractionConfig] = None
+) -> Dict[str, TarMemberLocation]:
+    """Scans an archive once and writes its paper_id -> member location sidecar.
+
+    Only the tar header chain is read; member data is skipped. The sidecar is
+    written to a temporary file and atomically renamed into place, and records
+    the archive's size and mtime so that stale indexes can be detected. If it
+    cannot be written, the index is still returned, and only lives in memory.
+
+    Args:
+        tar_path: Path to an uncompressed PDF .tar archive.
+        config: Optional ExtractionConfig; its supported_extensions are used to
+                select members.
+
+    Returns:
+        A dictionary mapping paper_id to its TarMemberLocation.
+
+    Raises:
+        tarfile.ReadError: If the archive cannot be read.
+    """
+    locations = _scan_tar_members(tar_path, config)
+    try:
+        sidecar_path = _write_tar_index(tar_path, locations)
+    except OSError as e:
+        logger.warning(
+            f"[TAR_INDEX] Could not write the index of {tar_path.name}: {e} "
+            "(Keeping it in memory only)"
+        )
+        return locations
+
+    logger.info(
+        f"[TAR_INDEX] Indexed {len(locations)} PDFs in {tar_path.name} -> {sidecar_path.name}"
+    )
+    return locations
+
+
+def _read_fresh_index(tar_path: Path) -> Optional[Dict]:
+    """Returns the payload of an archive's sidecar, or None if missing or stale."""
+    sidecar_path = index_path_for(tar_path)
+    if not sidecar_path.is_file():
+        return None
+    try:
+        with gzip.open(sidecar_path, "rt", encoding="utf-8") as f:
+            payload = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"[TAR_INDEX] Could not read index {sidecar_path}: {e}")
+        return None
+
+    stat = tar_path.stat()
+    if (
+        payload.get("version") != INDEX_FORMAT_VERSION
+        or payload.get("tar_size") != stat.st_size
+        or payload.get("tar_mtime_ns") != stat.st_mtime_ns
+    ):
+        logger.info(f"[TAR_INDEX] Index {sidecar_path.name} is stale.")
+        return None
+    return payload
+
+
+def load_tar_index(
+    tar_path: Path,
+    build_missing: bool = True,
+    config: Optional[ExtractionConfig] = None,
+) -> Dict[str, TarMemberLocation]:
+    """Loads the sidecar index of an archive, (re)building it when needed.
+
+    An index is rebuilt if it is missing, unreadable, written by another
+    format version, or if the archive's size or mtime no longer match.
+
+    Args:
+        tar_path: Path to an uncompressed PDF .tar archive.
+        build_missing: Build the index if it is missing or stale. If False,
+                       an empty mapping is returned in that case.
+        config: Optional ExtractionConfig passed on to `build_tar_index`.
+
+    Returns:
+        A dictionary mapping paper_id to its TarMemberLocation.
+    """
+    payload = _read_fresh_index(tar_path)
+    if payload is None:
+        return build_tar_index(tar_path, config) if build_missing else {}
+
+    return {
+        paper_id: TarMemberLocation(tar_path, member_name, offset, size)
+        for paper_id, (member_name, offset, size) in payload["entries"].items()
+    }
+
+
+class TarMemberIndex:
+    """Random access to PDF members of one or more archives by paper_id.
+
+    Reads and views go through `PdfPayloadRef`: a read is one seek and one
+    read on the archive, and a view is a zero-copy slice of the memory map
+    of the archive that all payload references share.
+    """
+
+    def __init__(self, locations: Dict[str, TarMemberLocation]):
+        self.locations = locations
+
+    @classmethod
+    def for_archive(
+        cls, tar_path: Path, config: Optional[ExtractionConfig] = None
+    ) -> "TarMemberIndex":
+        """Creates an index over a single archive, building its sidecar if needed."""
+        return cls(load_tar_index(tar_path, config=config))
+
+    @classmethod
+    def for_directory(
+        cls, input_dir: Path, config: Optional[ExtractionConfig] = None
+    ) -> "TarMemberIndex":
+        """Creates an index over every .tar archive in a directory.
+
+        Archives are merged in sorted filename order, so if a paper_id occurs
+        in several archives the one from the last archive wins. Archives that
+        cannot be read are left out; sidecars that cannot be written (e.g. in
+        a read-only directory) are only kept in memory.
+        """
+        locations: Dict[str, TarMemberLocation] = {}
+        for tar_path in sorted(input_dir.glob("*.tar")):
+            try:
+                locations.update(load_tar_index(tar_path, config=config))
+            except (tarfile.ReadError, OSError) as e:
+                logger.error(
+                    f"[TAR_INDEX] Could not index {tar_path.name}: {e} (Skipping this tar)"
+                )
+        return cls(locations)
+
+    def __contains__(self, paper_id: str) -> bool:
+        return paper_id in self.locations
+
+    def __len__(self) -> int:
+        return len(self.locations)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.locations)
+
+    def locate(self, paper_id: str) -> TarMemberLocation:
+        """Returns the location of a paper's PDF.
+
+        Raises:
+            KeyError: If the paper_id is not in the index.
+        """
+        return self.locations[paper_id]
+
+    def payload_ref(self, paper_id: str) -> PdfPayloadRef:
+        """Returns a lazy PDF handle suitable for `Paper.pdf_source`.
+
+        Raises:
+            KeyError: If the paper_id is not in the index.
+        """
+        loc = self.locate(paper_id)
+        return PdfPayloadRef(loc.tar_path.resolve(), loc.offset, loc.size)
+
+    def read_pdf(self, paper_id: str) -> bytes:
+        """Reads a paper's PDF bytes with a single seek.
+
+        Raises:
+            KeyError: If the paper_id is not in the index.
+            IOError: If the archive is shorter than the indexed member.
+        """
+        return self.payload_ref(paper_id).read()
+
+    def view_pdf(self, paper_id: str) -> memoryview:
+        """Returns a read-only, zero-copy memoryview of a paper's PDF bytes.
+
+        Raises:
+            KeyError: If the paper_id is not in the index.
+        """
+        return self.payload_ref(paper_id).view()
+
+
+def build_directory_indexes(
+    input_dir: Path, config: Optional[ExtractionConfig] = None
+) -> List[Path]:
+    """Builds (or refreshes stale) sidecar indexes for every archive in a directory.
+
+    Archives that cannot be read, and sidecars that cannot be written, are
+    logged and left out.
+
+    Returns:
+        The list of sidecar index paths that are now up to date.
+    """
+    sidecars = []
+    for tar_path in sorted(input_dir.glob("*.tar")):
+        try:
+            if _read_fresh_index(tar_path) is None:
+                _write_tar_index(tar_path, _scan_tar_members(tar_path, config))
+            sidecars.append(index_path_for(tar_path))
+        except (tarfile.ReadError, OSError) as e:
+            logger.error(
+                f"[TAR_INDEX] Could not index {tar_path.name}: {e} (Skipping this tar)"
+            )
+    return sidecars
+
+
+if __name__ == "__main__":
+    ARXIV_DATA_PATH = os.getenv("ARXIV_DATA_PATH")
+    if not ARXIV_DATA_PATH or not Path(ARXIV_DATA_PATH).is_dir():
+        logger.error("ARXIV_DATA_PATH must point to a directory of .tar archives.")
+        exit(1)
+
+    written = build_directory_indexes(Path(ARXIV_DATA_PATH))
+    logger.info(f"[TAR_INDEX] {len(written)} sidecar indexes up to date.")
@@ -0,0 +1,211 @@
+import base64
+import functools
+import hashlib
+import logging
+import os
+import re
+import urllib.request
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Protocol
+
+try:
+    import tiktoken
+except ImportError:  # Only needed for exact OpenAI token counts
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+TOKENIZER_REGEX = "regex"
+DEFAULT_TIKTOKEN_ENCODING = "cl100k_base"  # Used by text-embedding-3-* models
+DEFAULT_VOCAB_CACHE_DIR = Path.home() / ".cache" / "rag_antyplagiat" / "tiktoken"
+
+
+class TiktokenVocabulary(NamedTuple):
+    """Where to get a tiktoken encoding's vocabulary, and how it splits text."""
+
+    url: str
+    sha256: str
+    pattern: str
+
+
+# From tiktoken_ext.openai_public; only the vocabulary files are fetched.
+TIKTOKEN_VOCABULARIES: Dict[str, TiktokenVocabulary] = {
+    "cl100k_base": TiktokenVocabulary(
+        url="https://openaipublic.blob.core.windows.net/encodings/cl100k_base.tiktoken",
+        sha256="223921b76ee99bde995b7ff738513eef100fb51d18c93597a113bcffe865b2a7",
+        pattern=(
+            r"""'(?i:[sdmt]|ll|ve|re)|[^\r\n\p{L}\p{N}]?+\p{L}++|\p{N}{1,3}+|"""
+            r""" ?[^\s\p{L}\p{N}]++[\r\n]*+|\s++$|\s*[\r\n]|\s+(?!\S)|\s"""
+        ),
+    ),
+}
+
+# Word pieces: runs of letters, runs of digits, or single other characters.
+_WORD_PIECE = re.compile(r"[^\W\d_]+|\d+|[^\w\s]")
+_CHARS_PER_TOKEN = 4  # Rough length of a BPE token in English text
+
+
+class Tokenizer(Protocol):
+    """Counts the tokens a text costs an embedding model."""
+
+    name: str
+
+    def count(self, text: str) -> int: ...
+
+
+class RegexTokenizer:
+    """Dependency-free approximation of BPE token counts.
+
+    Counts one token per punctuation mark or digit group and one per
+    `_CHARS_PER_TOKEN` letters of each word, which is within roughly 10% of
+    cl100k_base on English prose.
+    """
+
+    name = TOKENIZER_REGEX
+
+    def count(self, text: str) -> int:
+        return sum(
+            1 + (len(piece) - 1) // _CHARS_PER_TOKEN
+            for piece in _WORD_PIECE.findall(text)
+        )
+
+
+class TiktokenTokenizer:
+    """Exact token counts for OpenAI models via tiktoken.
+
+    The vocabulary is read from `<vocab_dir>/<encoding>.tiktoken` and checked
+    against its known hash; nothing is downloaded implicitly, so every host
+    either counts the same tokens or fails the same way. Fetch the file once
+    with `download_vocabulary` (or `python -m modules.tokenizer`).
+
+    Raises:
+        ImportError: If tiktoken is not installed.
+        ValueError: If the encoding is not in TIKTOKEN_VOCABULARIES, or its
+            vocabulary file does not match the expected hash.
+        FileNotFoundError: If the vocabulary file is missing.
+    """
+
+    def __init__(
+        self,
+        encoding_name: str = DEFAULT_TIKTOKEN_ENCODING,
+        vocab_dir: Path = DEFAULT_VOCAB_CACHE_DIR,
+    ):
+        if tiktoken is None:
+            raise ImportError("The 'tiktoken' package is required for this tokenizer")
+        if encoding_name not in TIKTOKEN_VOCABULARIES:
+            raise ValueError(
+                f"Unknown tiktoken encoding {encoding_name!r}; "
+                f"expected one of {sorted(TIKTOKEN_VOCABULARIES)}"
+            )
+        vocabulary = TIKTOKEN_VOCABULARIES[encoding_name]
+        path = vocabulary_path(encoding_name, vocab_dir)
+        if not path.is_file():
+            raise FileNotFoundError(
+                f"No {encoding_name} vocabulary at {path}; fetch it with "
+                f"`python -m modules.tokenizer {encoding_name} --vocab-dir {vocab_dir}`"
+            )
+        data = path.read_bytes()
+        if hashlib.sha256(data).hexdigest() != vocabulary.sha256:
+            raise ValueError(f"{path} does not match the {encoding_name} vocabulary hash")
+
+        self.name = encoding_name
+        self._encoding = tiktoken.Encoding(
+            name=encoding_name,
+            pat_str=vocabulary.pattern,
+            mergeable_ranks={
+                base64.b64decode(token): int(rank)
+                for token, rank in (line.split() for line in data.splitlines() if line)
+            },
+            special_tokens={},  # Not needed by encode_ordinary
+        )
+
+    def count(self, text: str) -> int:
+        return len(self._encoding.encode_ordinary(text))
+
+
+def vocabulary_path(encoding_name: str, vocab_dir: Path = DEFAULT_VOCAB_CACHE_DIR) -> Path:
+    """Returns where the vocabulary file of a tiktoken encoding is expected."""
+    return vocab_dir / f"{encoding_name}.tiktoken"
+
+
+def download_vocabulary(
+    encoding_name: str = DEFAULT_TIKTOKEN_ENCODING,
+    vocab_dir: Path = DEFAULT_VOCAB_CACHE_DIR,
+    timeout: float = 60.0,
+) -> Path:
+    """Downloads and verifies the vocabulary file of a tiktoken encoding.
+
+    Raises:
+        ValueError: If the encoding is unknown or the download is corrupt.
+        OSError: If the download fails.
+    """
+    if encoding_name not in TIKTOKEN_VOCABULARIES:
+        raise ValueError(f"Unknown tiktoken encoding {encoding_name!r}")
+    vocabulary = TIKTOKEN_VOCABULARIES[encoding_name]
+    with urllib.request.urlopen(vocabulary.url, timeout=timeout) as response:
+        data = response.read()
+    if hashlib.sha256(data).hexdigest() != vocabulary.sha256:
+        raise ValueError(f"Corrupt download of {vocabulary.url}")
+
+    path = vocabulary_path(encoding_name, vocab_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+    logger.info(f"[TOKENIZER] Saved the {encoding_name} vocabulary to {path}")
+    return path
+
+
+def tokenizer_name() -> str:
+    """Returns the tokenizer selected by TOKENIZER (default "regex")."""
+    return os.getenv("TOKENIZER", TOKENIZER_REGEX)
+
+
+def tokenizer_vocab_dir() -> Path:
+    """Returns the vocabulary directory set by TOKENIZER_VOCAB_DIR, if any."""
+    value = os.getenv("TOKENIZER_VOCAB_DIR")
+    return Path(value) if value else DEFAULT_VOCAB_CACHE_DIR
+
+
+@functools.lru_cache(maxsize=None)
+def _load_tokenizer(name: str, vocab_dir: Optional[Path]) -> Tokenizer:
+    """Builds a tokenizer; cached on the resolved settings."""
+    if name == TOKENIZER_REGEX:
+        return RegexTokenizer()
+    return TiktokenTokenizer(name, vocab_dir)
+
+
+def get_tokenizer(name: Optional[str] = None, vocab_dir: Optional[Path] = None) -> Tokenizer:
+    """Returns a shared tokenizer instance, loading its vocabulary once.
+
+    The defaults are read from the environment on every call, and one
+    instance is kept per resolved (name, vocabulary directory) pair, so
+    changing TOKENIZER or TOKENIZER_VOCAB_DIR takes effect on the next call.
+
+    Args:
+        name: TOKENIZER_REGEX, or a tiktoken encoding name (defaults to the
+            TOKENIZER environment variable, then TOKENIZER_REGEX).
+        vocab_dir: Directory holding tiktoken vocabulary files (defaults to
+            the TOKENIZER_VOCAB_DIR environment variable, then
+            DEFAULT_VOCAB_CACHE_DIR).
+
+    Raises:
+        ImportError, ValueError, FileNotFoundError: If a tiktoken encoding
+            is selected and cannot be loaded (see TiktokenTokenizer).
+    """
+    name = name if name is not None else tokenizer_name()
+    if name == TOKENIZER_REGEX:
+        return _load_tokenizer(name, None)
+    vocab_dir = Path(vocab_dir) if vocab_dir is not None else tokenizer_vocab_dir()
+    return _load_tokenizer(name, vocab_dir.expanduser().resolve())
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Download a tiktoken vocabulary.")
+    parser.add_argument("encoding", nargs="?", default=DEFAULT_TIKTOKEN_ENCODING)
+    parser.add_argument("--vocab-dir", type=Path, default=tokenizer_vocab_dir())
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    download_vocabulary(args.encoding, args.vocab_dir)
@@ -1,8 +1,60 @@
+import mmap
 import numpy as np  # Assuming numpy arrays for embeddings
 from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
 from typing import List, Optional, Any
 
 
+MAX_CACHED_ARCHIVE_MAPS = 16  # Each open map holds a file descriptor
+
+
+@lru_cache(maxsize=MAX_CACHED_ARCHIVE_MAPS)
+def _archive_map(tar_path: Path, size: int, mtime_ns: int) -> mmap.mmap:
+    """Returns a shared read-only memory map of a whole archive.
+
+    Size and mtime are part of the cache key, so a rewritten archive is
+    mapped again. A map evicted from the cache is closed once no view into
+    it is left.
+    """
+    with open(tar_path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+@dataclass(frozen=True)
+class PdfPayloadRef:
+    """Lazy handle to a PDF stored uncompressed inside a .tar archive."""
+
+    tar_path: Path  # Absolute path of the archive holding the PDF
+    offset: int  # Byte offset of the PDF data within the archive
+    size: int  # Size of the PDF data in bytes
+
+    def read(self) -> bytes:
+        """Reads the PDF bytes with a single seek.
+
+        Raises:
+            IOError: If the archive is shorter than the referenced range.
+        """
+        with open(self.tar_path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read(self.size)
+        if len(data) != self.size:
+            raise IOError(
+                f"Short read from {self.tar_path.name}: expected {self.size} bytes, got {len(data)}"
+            )
+        return data
+
+    def view(self) -> memoryview:
+        """Returns a read-only memoryview of the PDF over a memory map of the archive.
+
+        One map per archive is shared by all views (see `_archive_map`); it
+        stays open for as long as a view (or a slice of it) is referenced.
+        """
+        stat = self.tar_path.stat()
+        archive_map = _archive_map(self.tar_path, stat.st_size, stat.st_mtime_ns)
+        return memoryview(archive_map)[self.offset : self.offset + self.size]
+
+
 @dataclass
 class Paper:
     """Represents a single paper and its data through the preprocessing pipeline."""
@@ -13,6 +65,9 @@ class Paper:
         None  # Name of the source tar file (e.g., 'arXiv_pdf_2301_001.tar')
     )
     pdf_content: Optional[bytes] = None  # Raw extracted PDF binary content
+    pdf_source: Optional[PdfPayloadRef] = None  # Lazy handle used instead of pdf_content
+    raw_latex_text: Optional[str] = None  # LaTeX source, input to the converter
+    plain_text: Optional[str] = None  # Text converted from raw_latex_text
     cleaned_prose_text: Optional[str] = (
         None  # Text after parsing/cleaning (potentially from PDF)
     )
@@ -28,6 +83,7 @@ class Paper:
         None  # Error during extraction phase (now for PDF)
     )
     parsing_error: Optional[str] = None  # Error during parsing phase (e.g. PDF to text)
+    conversion_error: Optional[str] = None  # Error during LaTeX to text conversion
     chunking_error: Optional[str] = None  # Error during chunking phase
     embedding_error: Optional[str] = None  # Error during embedding phase
 
@@ -42,13 +98,55 @@ class Paper:
             ]
         )
 
+    def has_conversion_error(self) -> bool:
+        """Checks if the LaTeX conversion stage failed."""
+        return self.conversion_error is not None
+
+    @property
+    def pdf_size(self) -> int:
+        """Size of the PDF in bytes without loading it (0 if there is no PDF)."""
+        if self.pdf_content is not None:
+            return len(self.pdf_content)
+        if self.pdf_source is not None:
+            return self.pdf_source.size
+        return 0
+
+    def get_pdf_content(self, cache: bool = False) -> Optional[bytes]:
+        """Returns the PDF bytes, reading them through `pdf_source` if needed.
+
+        Args:
+            cache: Keep loaded bytes in `pdf_content` for later stages.
+
+        Returns:
+            The PDF bytes, or None if the paper has no PDF.
+        """
+        if self.pdf_content is not None or self.pdf_source is None:
+            return self.pdf_content
+        data = self.pdf_source.read()
+        if cache:
+            self.pdf_content = data
+        return data
+
+    def release_pdf_content(self) -> None:
+        """Drops in-memory PDF bytes once a stage no longer needs them.
+
+        If the paper has a `pdf_source`, the bytes can still be re-read later.
+        """
+        self.pdf_content = None
+
     def __repr__(self) -> str:
         """Provides a concise representation for logging."""
         status_parts = []
         if self.pdf_content is not None:
             status_parts.append(f"pdf_extracted ({len(self.pdf_content)} bytes)")
+        elif self.pdf_source is not None:
+            status_parts.append(f"pdf_referenced ({self.pdf_source.size} bytes)")
+        if self.plain_text is not None:
+            status_parts.append("text_converted")
         if self.cleaned_prose_text is not None:
             status_parts.append("text_parsed")
+        if self.conversion_error:
+            status_parts.append("CONVERSION_ERROR")
         if self.text_chunks:
             status_parts.append("chunked")
         if self.embeddings:
@@ -0,0 +1,364 @@
+import json
+import logging
+import os
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .embedding_compression import QuantizedVectors, dequantize_int8, quantize_int8
+
+logger = logging.getLogger(__name__)
+
+VECTOR_STORE_FORMAT_VERSION = 1
+MANIFEST_FILENAME = "manifest.json"
+METADATA_FILENAME = "metadata.sqlite"
+SHARD_FILENAME = "vectors-{:05d}.npy"
+SCALES_FILENAME = "scales-{:05d}.npy"  # Per-row scales of int8 shards
+DEFAULT_SHARD_ROWS = 8192  # 48 MiB per shard of 1536-dim float32 vectors
+VECTOR_DTYPES = ("float32", "float16", "int8")
+
+
+class ChunkMetadata(NamedTuple):
+    """Describes the chunk a stored vector was computed from."""
+
+    paper_id: str
+    chunk_index: int
+    start: int  # Character span of the chunk in its paper's text
+    end: int
+    text: Optional[str] = None  # Kept only when the text is not stored elsewhere
+
+
+def _fsync_replace(tmp_path: Path, path: Path) -> None:
+    with open(tmp_path, "rb+") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class VectorStoreWriter:
+    """Appends embeddings to a directory of binary shards.
+
+    Vectors are stored row-major in `.npy` shards of `shard_rows` rows each
+    (float32, float16 for half the size, or int8 for a quarter: each vector
+    is quantized against its largest component, and the per-row float32
+    scales go into a parallel `scales-*.npy` shard), so readers can
+    memory-map them without parsing or copying. Row `r` lives in shard `r // shard_rows` at
+    offset `r % shard_rows`. Per-row chunk metadata goes into a SQLite table
+    keyed by row, and a JSON manifest records the model, dimensions, dtype
+    and shards, plus the file of the projection that produced the vectors,
+    if any (see embedding_compression.compress_store).
+
+    Each shard is created at its full size and filled in place through a
+    memory map. `flush()` writes back only the pages dirtied since the last
+    flush, commits the metadata and atomically replaces the manifest, after
+    which the first `len(self)` rows are durable; readers ignore rows past
+    the manifest's count, so appending never touches committed rows. Opening
+    an existing store continues it (unless `overwrite` is set); `truncate()`
+    drops rows written after an earlier commit point.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        model: str,
+        dimensions: int,
+        dtype: str = "float32",
+        shard_rows: int = DEFAULT_SHARD_ROWS,
+        overwrite: bool = False,
+        projection: Optional[str] = None,
+    ):
+        assert dtype in VECTOR_DTYPES, f"dtype must be one of {VECTOR_DTYPES}"
+        assert shard_rows > 0, "shard_rows must be positive"
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.model = model
+        self.dimensions = dimensions
+        self.dtype = np.dtype(dtype)
+        self.shard_rows = shard_rows
+        self.projection = projection
+        self.quantized = self.dtype == np.int8
+
+        self._rows = 0
+        manifest_path = directory / MANIFEST_FILENAME
+        if overwrite:
+            for pattern in (SHARD_FILENAME, SCALES_FILENAME):
+                for path in directory.glob(pattern.replace("{:05d}", "*")):
+                    path.unlink()
+            for name in (MANIFEST_FILENAME, METADATA_FILENAME):
+                (directory / name).unlink(missing_ok=True)
+        elif manifest_path.is_file():
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            settings = (model, dimensions, dtype, shard_rows)
+            stored = (
+                manifest["model"],
+                manifest["dimensions"],
+                manifest["dtype"],
+                manifest["shard_rows"],
+            )
+            if stored != settings:
+                raise ValueError(
+                    f"Vector store {directory} holds {stored}, not {settings}"
+                )
+            self._rows = manifest["rows"]
+
+        # The shard being appended to, mapped on the first append into it.
+        self._shard: Optional[int] = None
+        self._vectors: Optional[np.memmap] = None
+        self._scales: Optional[np.memmap] = None
+
+        self._db = sqlite3.connect(str(directory / METADATA_FILENAME))
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                row INTEGER PRIMARY KEY, paper_id TEXT, chunk_index INTEGER,
+                start INTEGER, end INTEGER, text TEXT
+            )
+            """
+        )
+        self._db.execute("DELETE FROM chunks WHERE row >= ?", (self._rows,))
+
+    def _shard_path(self, shard: int) -> Path:
+        return self.directory / SHARD_FILENAME.format(shard)
+
+    def _scales_path(self, shard: int) -> Path:
+        return self.directory / SCALES_FILENAME.format(shard)
+
+    def _open_shard_file(
+        self, path: Path, shape: Tuple[int, ...], dtype: np.dtype
+    ) -> np.memmap:
+        """Maps a shard file for writing, creating it at its full size if needed.
+
+        A shard saved with fewer rows (by an earlier version of this writer)
+        is copied into a full-size file first.
+        """
+        existing = None
+        if path.is_file():
+            existing = np.load(path, mmap_mode="r+")
+            if existing.shape == shape:
+                return existing
+        tmp_path = path.with_name(path.name + ".tmp")
+        array = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=dtype, shape=shape)
+        if existing is not None:
+            array[: len(existing)] = existing
+            del existing
+        array.flush()
+        _fsync_replace(tmp_path, path)
+        return array
+
+    def _map_shard(self, shard: int) -> None:
+        if self._shard == shard:
+            return
+        self._release_shard(sync=True)
+        self._vectors = self._open_shard_file(
+            self._shard_path(shard), (self.shard_rows, self.dimensions), self.dtype
+        )
+        if self.quantized:
+            self._scales = self._open_shard_file(
+                self._scales_path(shard), (self.shard_rows,), np.dtype(np.float32)
+            )
+        self._shard = shard
+
+    def _sync_shard(self) -> None:
+        # Order does not matter: new rows only become visible through the
+        # manifest, which is replaced after both files are synced.
+        for array in (self._vectors, self._scales):
+            if array is not None:
+                array.flush()
+
+    def _release_shard(self, sync: bool) -> None:
+        if sync:
+            self._sync_shard()
+        self._shard = self._vectors = self._scales = None
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def append(
+        self, vectors: Sequence[Sequence[float]], metadata: Sequence[ChunkMetadata]
+    ) -> int:
+        """Appends vectors with their chunk metadata.
+
+        Returns:
+            The row of the first appended vector.
+        """
+        assert len(vectors) == len(metadata), "one metadata row per vector"
+        if self.quantized:
+            array, scales = quantize_int8(
+                np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimensions)
+            )
+        else:
+            array = np.asarray(vectors, dtype=self.dtype).reshape(-1, self.dimensions)
+        first_row = self._rows
+        self._db.executemany(
+            "INSERT INTO chunks VALUES (?, ?, ?, ?, ?, ?)",
+            [(first_row + i, *meta) for i, meta in enumerate(metadata)],
+        )
+
+        position = 0
+        while position < len(array):
+            shard, offset = divmod(self._rows, self.shard_rows)
+            self._map_shard(shard)
+            take = min(self.shard_rows - offset, len(array) - position)
+            self._vectors[offset : offset + take] = array[position : position + take]
+            if self.quantized:
+                self._scales[offset : offset + take] = scales[position : position + take]
+            self._rows += take
+            position += take
+        return first_row
+
+    def truncate(self, rows: int) -> None:
+        """Drops every row from `rows` on (e.g. to return to a commit point)."""
+        if rows >= self._rows:
+            return
+        logger.info(f"[VECTOR_STORE] Discarding {self._rows - rows} uncommitted rows.")
+        self._release_shard(sync=False)
+        for shard in range(-(-rows // self.shard_rows), -(-self._rows // self.shard_rows)):
+            self._shard_path(shard).unlink(missing_ok=True)
+            self._scales_path(shard).unlink(missing_ok=True)
+        self._rows = rows
+        self._db.execute("DELETE FROM chunks WHERE row >= ?", (rows,))
+
+    def flush(self) -> None:
+        """Makes every appended row durable and rewrites the manifest."""
+        self._sync_shard()
+        self._db.commit()
+
+        num_shards = -(-self._rows // self.shard_rows)
+        shards = []
+        for shard in range(num_shards):
+            info = {
+                "file": SHARD_FILENAME.format(shard),
+                "rows": min(self.shard_rows, self._rows - shard * self.shard_rows),
+            }
+            if self.quantized:
+                info["scales"] = SCALES_FILENAME.format(shard)
+            shards.append(info)
+        manifest = {
+            "version": VECTOR_STORE_FORMAT_VERSION,
+            "model": self.model,
+            "dimensions": self.dimensions,
+            "dtype": self.dtype.name,
+            "shard_rows": self.shard_rows,
+            "rows": self._rows,
+            "shards": shards,
+            "metadata": METADATA_FILENAME,
+        }
+        if self.projection is not None:
+            manifest["projection"] = self.projection
+        manifest_path = self.directory / MANIFEST_FILENAME
+        tmp_path = manifest_path.with_name(MANIFEST_FILENAME + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1)
+        _fsync_replace(tmp_path, manifest_path)
+
+    def close(self) -> None:
+        self.flush()
+        self._release_shard(sync=False)
+        self._db.close()
+        logger.info(
+            f"[VECTOR_STORE] Wrote {self._rows} {self.dtype.name} vectors to {self.directory}."
+        )
+
+    def __enter__(self) -> "VectorStoreWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class VectorStore:
+    """Read-only view of a store written by VectorStoreWriter.
+
+    Shards are memory-mapped on first use, so opening a store and reading
+    a few rows costs no more than the pages touched. For int8 stores,
+    `shard()` returns the raw codes and `vectors()` / `iter_shards(
+    dequantize=True)` return float32 vectors rebuilt from codes and scales.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        with open(directory / MANIFEST_FILENAME, "r", encoding="utf-8") as f:
+            self.manifest: Dict[str, Any] = json.load(f)
+        if self.manifest.get("version") != VECTOR_STORE_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported vector store version {self.manifest.get('version')} "
+                f"in {directory}"
+            )
+        self.model: str = self.manifest["model"]
+        self.dimensions: int = self.manifest["dimensions"]
+        self.shard_rows: int = self.manifest["shard_rows"]
+        self.quantized = self.manifest["dtype"] == "int8"
+        self.projection: Optional[Path] = (
+            directory / self.manifest["projection"] if "projection" in self.manifest else None
+        )
+        self._shards: Dict[int, np.ndarray] = {}
+        self._scales: Dict[int, np.ndarray] = {}
+        self._db = sqlite3.connect(
+            f"file:{directory / self.manifest['metadata']}?mode=ro", uri=True
+        )
+
+    def __len__(self) -> int:
+        return self.manifest["rows"]
+
+    def shard(self, index: int) -> np.ndarray:
+        """Returns one shard as a read-only memory map."""
+        if index not in self._shards:
+            info = self.manifest["shards"][index]
+            array = np.load(self.directory / info["file"], mmap_mode="r")
+            self._shards[index] = array[: info["rows"]]
+        return self._shards[index]
+
+    def scales(self, index: int) -> np.ndarray:
+        """Returns the per-row scales of one int8 shard as a memory map."""
+        assert self.quantized, "only int8 stores have scales"
+        if index not in self._scales:
+            info = self.manifest["shards"][index]
+            array = np.load(self.directory / info["scales"], mmap_mode="r")
+            self._scales[index] = array[: info["rows"]]
+        return self._scales[index]
+
+    def iter_shards(self, dequantize: bool = False) -> Iterator[Tuple[int, np.ndarray]]:
+        """Yields (first row, memory-mapped vectors) for every shard.
+
+        With `dequantize`, int8 shards are converted to float32 copies.
+        """
+        for index in range(len(self.manifest["shards"])):
+            shard = self.shard(index)
+            if dequantize and self.quantized:
+                shard = dequantize_int8(QuantizedVectors(shard, self.scales(index)))
+            yield index * self.shard_rows, shard
+
+    def vectors(self, rows: Sequence[int]) -> np.ndarray:
+        """Gathers the vectors of some rows into a new array (float32 for int8)."""
+        dtype = np.float32 if self.quantized else self.manifest["dtype"]
+        out = np.empty((len(rows), self.dimensions), dtype=dtype)
+        for i, row in enumerate(rows):
+            index, offset = divmod(row, self.shard_rows)
+            out[i] = self.shard(index)[offset]
+            if self.quantized:
+                out[i] *= self.scales(index)[offset]
+        return out
+
+    def metadata(self, rows: Sequence[int]) -> List[ChunkMetadata]:
+        """Returns the chunk metadata of some rows, in the same order."""
+        found = {}
+        for i in range(0, len(rows), 500):
+            part = list(rows[i : i + 500])
+            for row, *values in self._db.execute(
+                f"SELECT * FROM chunks WHERE row IN ({','.join('?' * len(part))})", part
+            ):
+                found[row] = ChunkMetadata(*values)
+        return [found[row] for row in rows]
+
+    def close(self) -> None:
+        self._shards.clear()
+        self._scales.clear()
+        self._db.close()
+
+    def __enter__(self) -> "VectorStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,9 @@
+import sys
+from pathlib import Path
+
+PREPROCESSING_DIR = Path(__file__).resolve().parents[1]
+if str(PREPROCESSING_DIR) not in sys.path:
+    sys.path.insert(0, str(PREPROCESSING_DIR))
+
+# A manual script (`python tests/test_chunking.py`), not a pytest module.
+collect_ignore = ["test_chunking.py"]
@@ -0,0 +1,97 @@
+import json
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def embedding_for(text):
+    """The vector the stand-in server returns for a text."""
+    return [float(len(text)), float(zlib.crc32(text.encode()) % 1000)]
+
+
+class EmbeddingServer:
+    """Local stand-in for the OpenAI /v1/embeddings endpoint.
+
+    Results are returned in reverse order (clients must use `index`).
+    Requests with more than `max_inputs` inputs are rejected as too large
+    with `too_large_status`, and the next `rate_limited` requests get a 429
+    with `retry_after_ms`. Every input list received is kept in `requests`.
+    """
+
+    def __init__(self, max_inputs=None, too_large_status=400, rate_limited=0,
+                 retry_after_ms=10):
+        self.max_inputs = max_inputs
+        self.too_large_status = too_large_status
+        self.rate_limited = rate_limited
+        self.retry_after_ms = retry_after_ms
+        self.requests = []
+        self.rejected = []  # Status codes sent instead of embeddings
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _respond(self, texts):
+        """Returns (status, headers, body) for one request."""
+        with self._lock:
+            self.requests.append(texts)
+            if self.rate_limited > 0:
+                self.rate_limited -= 1
+                self.rejected.append(429)
+                return 429, {"retry-after-ms": str(self.retry_after_ms)}, {
+                    "error": {"message": "Rate limit reached", "type": "requests"}
+                }
+            if self.max_inputs is not None and len(texts) > self.max_inputs:
+                self.rejected.append(self.too_large_status)
+                return self.too_large_status, {}, {
+                    "error": {
+                        "message": "Too many tokens in this request",
+                        "type": "invalid_request_error",
+                    }
+                }
+        data = [
+            {"object": "embedding", "index": index, "embedding": embedding_for(text)}
+            for index, text in enumerate(texts)
+        ]
+        return 200, {}, {
+            "object": "list",
+            "data": data[::-1],
+            "model": "stand-in",
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        }
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                texts = json.loads(self.rfile.read(length))["input"]
+                status, headers, body = server._respond(texts)
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,67 @@
+"""Builds small text PDFs and tar archives of them for tests."""
+
+import io
+import tarfile
+from pathlib import Path
+from typing import Iterable, List, Tuple, Union
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages: Union[str, List[str]]) -> bytes:
+    """Returns a minimal PDF with one line of Helvetica text per page."""
+    if isinstance(pages, str):
+        pages = [pages]
+    num_pages = len(pages)
+    font = 3 + 2 * num_pages
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [%s] /Count %d >>"
+        % (b" ".join(b"%d 0 R" % (3 + 2 * i) for i in range(num_pages)), num_pages),
+    ]
+    for i, text in enumerate(pages):
+        content = f"BT /F1 12 Tf 72 712 Td ({_escape(text)}) Tj ET".encode("latin-1")
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (4 + 2 * i, font)
+        )
+        objects.append(
+            b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content)
+        )
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(
+        b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+        % (len(objects) + 1, xref)
+    )
+    return out.getvalue()
+
+
+def make_tar(path: Path, members: Iterable[Tuple[str, bytes]], mode: str = "w") -> Path:
+    """Writes (name, data) members to a tar archive (`mode` "w:gz" compresses)."""
+    with tarfile.open(path, mode) as archive:
+        for name, data in members:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return path
+
+
+def paper_text(paper_id: str) -> str:
+    """Distinct, chunkable prose for a fake paper."""
+    return (
+        f"Paper {paper_id} studies the effect of parameter {paper_id[-3:]} on "
+        f"retrieval quality across several corpora and reports its findings."
+    )
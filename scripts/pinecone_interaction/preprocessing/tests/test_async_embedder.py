@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+
+from modules.async_embedder import (
+    AdaptiveTokenBucket,
+    AsyncEmbeddingEngine,
+    parse_reset_duration,
+)
+from modules.tokenizer import RegexTokenizer
+from embedding_server import EmbeddingServer, embedding_for
+
+
+@pytest.fixture(autouse=True)
+def no_proxy(monkeypatch):
+    monkeypatch.setenv("NO_PROXY", "127.0.0.1")
+
+
+def texts(count):
+    return [f"passage {i} " + "token " * (i % 5) for i in range(count)]
+
+
+async def embed(server, inputs, **kwargs):
+    async with AsyncEmbeddingEngine(
+        "test-key",
+        base_url=server.base_url,
+        tokenizer=RegexTokenizer(),
+        retry_base_delay=0.01,
+        **kwargs,
+    ) as engine:
+        return await engine.embed(inputs), engine
+
+
+@pytest.mark.parametrize(
+    "value, seconds",
+    [("2", 2.0), ("250ms", 0.25), ("1m30s", 90.0), ("6m0s", 360.0), ("", None), ("soon", None)],
+)
+def test_parse_reset_duration(value, seconds):
+    assert parse_reset_duration(value) == seconds
+
+
+def test_token_bucket_backs_off_and_recovers():
+    bucket = AdaptiveTokenBucket(tokens_per_minute=6000, min_tokens_per_minute=600)
+
+    bucket.on_rate_limited(5.0, {})
+    bucket.on_rate_limited(5.0, {})  # Same pause only lowers the rate once
+    assert bucket.rate == pytest.approx(50.0)
+    bucket.on_success({})
+    assert bucket.rate == pytest.approx(51.0)
+
+    bucket.on_success({"x-ratelimit-limit-tokens": "1200"})
+    assert bucket.max_rate == bucket.rate == pytest.approx(20.0)
+
+
+def test_token_bucket_waits_for_refill():
+    async def spend():
+        bucket = AdaptiveTokenBucket(tokens_per_minute=600)  # 10 tokens/s, 100 burst
+        await bucket.acquire(100)
+        started = asyncio.get_running_loop().time()
+        await bucket.acquire(2)
+        return asyncio.get_running_loop().time() - started
+
+    assert 0.1 < asyncio.run(spend()) < 1.0
+
+
+def test_concurrent_requests_keep_input_order():
+    inputs = texts(40)
+
+    async def run():
+        with EmbeddingServer() as server:
+            vectors, engine = await embed(
+                server, inputs, max_in_flight=4, max_inputs_per_request=3
+            )
+        return vectors, engine, server
+
+    vectors, engine, server = asyncio.run(run())
+
+    assert vectors == [embedding_for(text) for text in inputs]
+    assert engine.requests_sent == len(server.requests) == 14
+
+
+@pytest.mark.parametrize("status", [400, 413])
+def test_too_large_requests_are_split(status):
+    inputs = texts(10)
+
+    async def run():
+        with EmbeddingServer(max_inputs=2, too_large_status=status) as server:
+            return (await embed(server, inputs))[0], server
+
+    vectors, server = asyncio.run(run())
+
+    assert vectors == [embedding_for(text) for text in inputs]
+    assert set(server.rejected) == {status}
+
+
+def test_rate_limits_are_retried_through_the_limiter():
+    inputs = texts(6)
+
+    async def run():
+        with EmbeddingServer(rate_limited=2, retry_after_ms=30) as server:
+            vectors, engine = await embed(server, inputs, max_inputs_per_request=2)
+        return vectors, engine
+
+    vectors, engine = asyncio.run(run())
+
+    assert vectors == [embedding_for(text) for text in inputs]
+    assert engine.retries == 2
+    assert engine.limiter.rate < engine.limiter.max_rate
+
+
+def test_embed_batches_reports_failed_batches():
+    async def run():
+        with EmbeddingServer(max_inputs=0) as server:
+            async with AsyncEmbeddingEngine(
+                "test-key", base_url=server.base_url, tokenizer=RegexTokenizer()
+            ) as engine:
+                batches = [("a", ["one"]), ("b", ["two", "three"])]
+                return [item async for item in engine.embed_batches(batches)]
+
+    assert sorted(asyncio.run(run())) == [("a", None), ("b", None)]
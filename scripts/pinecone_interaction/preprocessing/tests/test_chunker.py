@@ -0,0 +1,157 @@
+import io
+
+import pytest
+
+from modules.chunker import (
+    _is_heading,
+    chunk_batch_fixed_size,
+    chunk_spans_by_sentence,
+    chunk_spans_fixed_size,
+    chunk_text_fixed_size,
+    iter_chunks_fixed_size,
+)
+from modules.tokenizer import RegexTokenizer
+
+
+def reference_chunks(text, chunk_size, chunk_overlap):
+    """The slicing loop the offset-based chunkers replaced."""
+    step = chunk_size - chunk_overlap
+    return [text[start : start + chunk_size] for start in range(0, len(text), step)]
+
+
+def sample_text(length):
+    return "".join(chr(ord("a") + i % 26) for i in range(length))
+
+
+@pytest.mark.parametrize("length", [0, 1, 49, 50, 462, 512, 513, 1000, 4097])
+@pytest.mark.parametrize("chunk_size, chunk_overlap", [(512, 50), (10, 0), (7, 6)])
+def test_fixed_size_spans_match_slicing(length, chunk_size, chunk_overlap):
+    text = sample_text(length)
+    expected = reference_chunks(text, chunk_size, chunk_overlap)
+
+    chunks = chunk_spans_fixed_size(text, chunk_size, chunk_overlap)
+
+    assert list(chunks) == chunk_text_fixed_size(text, chunk_size, chunk_overlap) == expected
+    assert [text[start:end] for start, end in chunks.spans()] == expected
+    streamed = iter_chunks_fixed_size(io.StringIO(text), chunk_size, chunk_overlap, block_size=5)
+    assert [(start, end) for start, end, _ in streamed] == chunks.spans()
+
+
+def test_text_chunks_slice_the_parent_text():
+    text = sample_text(100)
+    chunks = chunk_spans_fixed_size(text, 30, 10)
+
+    assert len(chunks) == 5
+    assert chunks.text is text
+    assert chunks[0] == text[:30] and chunks[-1] == text[80:]
+    assert chunks[1:3] == [text[20:50], text[40:70]]
+    assert chunks.span(4) == (80, 100)
+    assert chunks.starts.itemsize == chunks.ends.itemsize == 8
+
+
+def test_streaming_sources_give_the_same_chunks():
+    text = sample_text(1234)
+    pieces = (text[i : i + 97] for i in range(0, len(text), 97))
+
+    from_string = list(iter_chunks_fixed_size(text, 100, 20))
+    from_pieces = list(iter_chunks_fixed_size(pieces, 100, 20))
+
+    assert from_pieces == from_string
+    assert [chunk for _, _, chunk in from_string] == reference_chunks(text, 100, 20)
+
+
+def test_batch_matches_per_document_spans():
+    texts = [sample_text(n) for n in (0, 5, 512, 1300, 0, 77)]
+
+    batch = chunk_batch_fixed_size(texts, 100, 30)
+
+    for doc, text in enumerate(texts):
+        rows = batch.document_rows(doc)
+        chunks = chunk_spans_fixed_size(text, 100, 30)
+        assert list(batch.iter_texts(rows.start, rows.stop)) == list(chunks)
+        assert batch.chunk_ids[rows].tolist() == list(range(len(chunks)))
+    assert batch.text(len(batch) - 1) == texts[-1][70:]
+
+
+def test_sentence_chunks_stay_within_budget():
+    tokenizer = RegexTokenizer()
+    sentences = [f"Sentence {i} reports a measured value of {i * 3} units." for i in range(40)]
+    text = "Introduction\n\n" + " ".join(sentences[:20]) + "\n\nMethods\n\n" + " ".join(sentences[20:])
+
+    chunks = chunk_spans_by_sentence(text, max_tokens=40, tokenizer=tokenizer)
+
+    assert len(chunks) > 2
+    for (start, end), tokens in zip(chunks.spans(), chunks.token_counts):
+        assert 0 <= start < end <= len(text)
+        assert tokens <= 40
+        assert text[start:end] == text[start:end].strip()
+        assert "Methods" not in text[start:end] or text[start:end].startswith("Methods")
+    covered = "".join(chunks)
+    assert all(sentence in covered for sentence in sentences)
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        "§ INTRODUCTION",
+        "§.§ Related Work",
+        "Introduction",
+        "Related Work",
+        "RELATED WORK",
+        "3 Results",
+        "3.2 Training Details",
+        "IV. EXPERIMENTAL RESULTS",
+        "II. Methods",
+    ],
+)
+def test_section_headings_are_recognised(line):
+    assert _is_heading(line)
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        "John Smith",
+        "University of Warsaw",
+        "Figure 3",
+        "Table 2",
+        "Graph Neural Networks",
+        "I. Newton",
+        "NASA",
+        "x = y + z",
+        "(3)",
+        "42",
+        "2019 IEEE International Conference on Robotics",
+        "and the results show",
+        "Introduction.",
+        "Results:",
+        "3 results of the ablation",
+    ],
+)
+def test_short_capitalised_lines_are_not_headings(line):
+    assert not _is_heading(line)
+
+
+def test_short_lines_do_not_break_sections():
+    tokenizer = RegexTokenizer()
+    text = (
+        "Graph Neural Networks\n\nJohn Smith\n\nUniversity of Warsaw\n\n"
+        "We study message passing. It scales well.\n\nFigure 3\n\nThe figure shows it."
+    )
+
+    chunks = chunk_spans_by_sentence(text, max_tokens=200, tokenizer=tokenizer)
+
+    assert chunks.spans() == [(0, len(text))]
+
+
+def test_pylatexenc_heading_is_split_from_its_first_line():
+    tokenizer = RegexTokenizer()
+    body = " ".join(f"Sentence {i} describes the setup." for i in range(30))
+    text = f"\n\n§ INTRODUCTION\n {body} \n\n §.§ Related Work\n Prior work exists."
+
+    chunks = list(chunk_spans_by_sentence(text, max_tokens=40, tokenizer=tokenizer))
+
+    assert len(chunks) > 3
+    assert chunks[0].startswith("§ INTRODUCTION\n Sentence 0")
+    assert all(tokenizer.count(chunk) <= 45 for chunk in chunks)
+    assert chunks[-1] == "§.§ Related Work\n Prior work exists."
@@ -0,0 +1,100 @@
+import os
+import random
+import zlib
+
+from modules import converter
+from modules.conversion_cache import ConversionCache
+from modules.converter import (
+    CONVERTER_ENGINE_FAST,
+    CONVERTER_ENGINE_PYLATEXENC,
+    converter_config,
+)
+
+
+def random_text(seed, length=4000):
+    """Hex text, which zlib compresses to a similar size for every seed."""
+    return random.Random(seed).randbytes(length // 2).hex()
+
+
+def set_mtime(cache, key, seconds):
+    os.utime(cache._path_for(key), (seconds, seconds))
+
+
+def test_key_changes_with_converter_config(monkeypatch):
+    latex = r"\section{Intro} Some text."
+    key = ConversionCache.key_for(latex, converter_config())
+
+    assert key == ConversionCache.key_for(latex, converter_config())
+    assert key != ConversionCache.key_for(latex + " ", converter_config())
+    assert key != ConversionCache.key_for(latex, converter_config(CONVERTER_ENGINE_FAST))
+
+    monkeypatch.setattr(converter, "PYLATEXENC_VERSION", "0.0")
+    assert key != ConversionCache.key_for(latex, converter_config(CONVERTER_ENGINE_PYLATEXENC))
+
+
+def test_entries_round_trip_compressed(tmp_path):
+    cache = ConversionCache(tmp_path)
+    text = "Café résumé, naïve text. " * 200
+    key = ConversionCache.key_for("latex", "config")
+
+    assert cache.get(key) is None
+    cache.put(key, text)
+
+    (entry,) = tmp_path.glob("*/*/*.txt.z")
+    assert entry.name == f"{key}.txt.z" and entry.parent.parent.name == key[:2]
+    assert zlib.decompress(entry.read_bytes()).decode("utf-8") == text
+    assert entry.stat().st_size < len(text) and cache.total_bytes == entry.stat().st_size
+    assert cache.get(key) == text
+    assert ConversionCache(tmp_path).get(key) == text
+    assert (cache.stats.hits, cache.stats.misses) == (1, 1)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ConversionCache(tmp_path)
+    texts = {key: random_text(key) for key in ("aa01", "bb02", "cc03")}
+    for seconds, (key, text) in enumerate(texts.items(), start=1):
+        cache.put(key, text)
+        set_mtime(cache, key, seconds * 1_000)
+    entry_bytes = cache.total_bytes // 3
+
+    cache = ConversionCache(tmp_path, max_bytes=int(entry_bytes * 2.5))
+    assert len(cache) == 2 and cache.stats.evictions == 1
+    assert cache.get("aa01") is None  # Oldest put, evicted on open
+
+    assert cache.get("bb02") == texts["bb02"]  # Now more recent than cc03
+    cache.put("dd04", random_text("dd04"))
+    assert cache.get("cc03") is None
+    assert cache.get("bb02") == texts["bb02"]
+    assert cache.total_bytes <= cache.max_bytes
+    assert len(list(tmp_path.glob("*/*/*.txt.z"))) == 2
+
+
+def test_eviction_order_on_open_follows_mtime(tmp_path):
+    cache = ConversionCache(tmp_path)
+    for key in ("aa01", "bb02", "cc03"):
+        cache.put(key, random_text(key))
+    entry_bytes = cache.total_bytes // 3
+    # A hit in an earlier run touched aa01 last.
+    set_mtime(cache, "aa01", 3_000)
+    set_mtime(cache, "bb02", 1_000)
+    set_mtime(cache, "cc03", 2_000)
+
+    reopened = ConversionCache(tmp_path, max_bytes=int(entry_bytes * 1.5))
+
+    assert len(reopened) == 1
+    assert reopened.get("aa01") == random_text("aa01")
+    assert reopened.get("bb02") is None and reopened.get("cc03") is None
+
+
+def test_unreadable_entry_is_dropped(tmp_path):
+    cache = ConversionCache(tmp_path)
+    cache.put("aa01", "fine text")
+    cache.put("bb02", "other text")
+    cache._path_for("aa01").write_bytes(b"not zlib data")
+
+    assert cache.get("aa01") is None
+    assert not cache._path_for("aa01").exists()
+    assert len(cache) == 1 and cache.total_bytes == cache._path_for("bb02").stat().st_size
+    assert cache.stats.misses == 1
+    cache.put("aa01", "rewritten")
+    assert cache.get("aa01") == "rewritten"
@@ -0,0 +1,164 @@
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from modules import converter
+from modules.converter import (
+    ConversionBudget,
+    ConversionRetryQueue,
+    ConversionWatchdog,
+    iter_converted_papers,
+)
+from modules.types import Paper
+
+
+def fake_convert(paper_id, raw_latex_text, engine=converter.DEFAULT_CONVERTER_ENGINE):
+    """Stands in for pylatexenc in the worker processes (inherited by fork)."""
+    if raw_latex_text.startswith("HANG"):
+        time.sleep(60)
+    if raw_latex_text.startswith("CRASH"):
+        os._exit(1)  # Like a segfault or the OOM killer
+    if raw_latex_text.startswith("SLOW"):
+        time.sleep(0.3)
+    return f"{raw_latex_text} converted by {os.getpid()}", None
+
+
+@pytest.fixture(autouse=True)
+def fake_converter(monkeypatch):
+    monkeypatch.setattr(converter, "_convert_latex", fake_convert)
+
+
+def make_paper(paper_id, latex):
+    return Paper(
+        paper_id=paper_id,
+        source_gz_member_name=f"src/{paper_id}.gz",
+        source_tar_filename="arXiv_src_0.tar",
+        raw_latex_text=latex,
+    )
+
+
+def test_hung_conversion_is_killed_and_worker_replaced():
+    retry_queue = ConversionRetryQueue()
+    with ConversionWatchdog(ConversionBudget(timeout_seconds=0.5), retry_queue) as watchdog:
+        watchdog.convert(make_paper("2301.00001", "before"))
+        first_worker = watchdog._worker.process.pid
+
+        hung = make_paper("2301.00002", "HANG forever")
+        started = time.monotonic()
+        watchdog.convert(hung)
+        elapsed = time.monotonic() - started
+
+        after = make_paper("2301.00003", "after")
+        watchdog.convert(after)
+        second_worker = watchdog._worker.process.pid
+
+    assert 0.5 <= elapsed < 5
+    assert hung.plain_text is None
+    assert hung.conversion_error == "Conversion timed out after 0.5s"
+    assert second_worker != first_worker
+    assert after.plain_text == f"after converted by {second_worker}"
+    assert [entry["paper_id"] for entry in retry_queue.entries] == ["2301.00002"]
+
+
+def test_worker_crash_queues_the_paper_for_retry():
+    retry_queue = ConversionRetryQueue()
+    with ConversionWatchdog(retry_queue=retry_queue) as watchdog:
+        crashed = make_paper("2301.00001", "CRASH now")
+        watchdog.convert(crashed)
+        after = make_paper("2301.00002", "after")
+        watchdog.convert(after)
+
+    assert crashed.conversion_error == "Converter process exited unexpectedly"
+    assert retry_queue.entries[0]["reason"] == "Converter process exited unexpectedly"
+    assert after.plain_text.startswith("after converted by")
+
+
+def test_oversized_input_is_not_attempted():
+    retry_queue = ConversionRetryQueue()
+    paper = make_paper("2301.00001", "x" * 11)
+    with ConversionWatchdog(ConversionBudget(max_input_chars=10), retry_queue) as watchdog:
+        watchdog.convert(paper)
+        assert watchdog._worker is None
+
+    assert paper.plain_text is None
+    assert paper.conversion_error == "Input too large for conversion: 11 > 10 chars"
+    assert len(retry_queue) == 1
+
+
+def test_retry_file_lists_papers_over_budget(tmp_path):
+    path = tmp_path / "retry.jsonl"
+    budget = ConversionBudget(timeout_seconds=0.5, max_input_chars=20)
+    with ConversionWatchdog(budget, ConversionRetryQueue(path)) as watchdog:
+        for paper in (
+            make_paper("2301.00001", "fine"),
+            make_paper("2301.00002", "HANG" + "x" * 10),
+            make_paper("2301.00003", "y" * 30),
+        ):
+            watchdog.convert(paper)
+
+    assert ConversionRetryQueue.load(path) == [
+        {
+            "paper_id": "2301.00002",
+            "source_tar_filename": "arXiv_src_0.tar",
+            "source_gz_member_name": "src/2301.00002.gz",
+            "input_chars": 14,
+            "reason": "Conversion timed out after 0.5s",
+        },
+        {
+            "paper_id": "2301.00003",
+            "source_tar_filename": "arXiv_src_0.tar",
+            "source_gz_member_name": "src/2301.00003.gz",
+            "input_chars": 30,
+            "reason": "Input too large for conversion: 30 > 20 chars",
+        },
+    ]
+    assert ConversionRetryQueue.load(tmp_path / "missing.jsonl") == []
+
+
+def converter_processes():
+    return [p for p in multiprocessing.active_children() if p.name == "latex-converter"]
+
+
+def worker_pid(paper):
+    return int(paper.plain_text.rsplit(" ", 1)[1])
+
+
+def test_pool_preserves_input_order():
+    papers = [
+        make_paper(f"2301.{i:05d}", ("SLOW " if i % 3 == 0 else "") + f"paper {i}")
+        for i in range(12)
+    ]
+    no_latex = make_paper("2301.99999", "")
+    papers.insert(5, no_latex)
+
+    ordered = list(iter_converted_papers(papers, num_workers=3))
+    unordered = list(iter_converted_papers(papers, num_workers=3, ordered=False))
+
+    assert [id(p) for p in ordered] == [id(p) for p in papers]
+    assert sorted(p.paper_id for p in unordered) == sorted(p.paper_id for p in papers)
+    assert no_latex.conversion_error == "No raw LaTeX text available for conversion"
+    assert all(p.plain_text for p in papers if p is not no_latex)
+
+
+def test_pool_reuses_its_workers():
+    papers = [make_paper(f"2301.{i:05d}", f"paper {i}") for i in range(10)]
+
+    converted = list(iter_converted_papers(papers, num_workers=2))
+
+    pids = {worker_pid(paper) for paper in converted}
+    assert len(pids) <= 2 and os.getpid() not in pids
+
+
+def test_pool_shuts_down_when_consumer_stops_early():
+    papers = [make_paper("2301.00000", "first")]
+    papers += [make_paper(f"2301.{i:05d}", "HANG") for i in range(1, 5)]
+    converted = iter_converted_papers(papers, num_workers=2, max_pending=3)
+
+    assert next(converted).paper_id == "2301.00000"
+    started = time.monotonic()
+    converted.close()
+
+    assert time.monotonic() - started < 5
+    assert converter_processes() == []
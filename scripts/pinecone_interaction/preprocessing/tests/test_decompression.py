@@ -0,0 +1,95 @@
+import gzip
+import io
+import random
+import threading
+import time
+
+import pytest
+
+from modules.decompression import CODEC_GZIP, CODEC_ZSTD, ThreadedDecompressedStream
+from modules.extractor import ExtractionConfig, iter_extracted_content
+from pdf_fixtures import make_tar
+
+
+def sample_bytes(size):
+    return bytes(i * 7 % 251 for i in range(size))
+
+
+def decompress_threads():
+    return [t for t in threading.enumerate() if t.name.startswith("decompress-")]
+
+
+def test_stream_matches_plain_decompression(tmp_path):
+    data = sample_bytes(300_000)
+    path = tmp_path / "data.gz"
+    path.write_bytes(gzip.compress(data))
+
+    with ThreadedDecompressedStream(path, CODEC_GZIP, block_size=4096, max_blocks=2) as stream:
+        assert stream.read() == data
+        assert stream.read() == b""
+
+
+def test_reader_thread_error_reaches_the_consumer(tmp_path):
+    data = random.Random(0).randbytes(300_000)  # Incompressible, so truncation loses its end
+    path = tmp_path / "truncated.gz"
+    path.write_bytes(gzip.compress(data)[:-5000])
+
+    read = io.BytesIO()
+    with ThreadedDecompressedStream(path, CODEC_GZIP, block_size=4096) as stream:
+        with pytest.raises(EOFError):
+            while True:
+                block = stream.read(1000)
+                if not block:
+                    break
+                read.write(block)
+
+    # Every block decompressed before the error is delivered first.
+    assert len(read.getvalue()) > 100_000
+    assert data.startswith(read.getvalue())
+
+
+def test_close_stops_the_reader_thread_mid_stream(tmp_path):
+    path = tmp_path / "data.gz"
+    path.write_bytes(gzip.compress(sample_bytes(2_000_000), compresslevel=1))
+
+    stream = ThreadedDecompressedStream(path, CODEC_GZIP, block_size=1024, max_blocks=2)
+    assert len(stream.read(10)) == 10
+    time.sleep(0.2)  # Let the reader fill the queue and block on it
+    assert decompress_threads()
+
+    started = time.monotonic()
+    stream.close()
+
+    assert time.monotonic() - started < 2
+    assert decompress_threads() == []
+
+
+@pytest.mark.parametrize("threaded_decompression", [True, False])
+@pytest.mark.parametrize("suffix", [".tar.gz", ".tar.zst"])
+def test_compressed_extraction_matches_plain_tar(tmp_path, suffix, threaded_decompression):
+    members = [("0/README.txt", b"not a pdf")] + [
+        (f"0/2301.{i:05d}v1.pdf", f"%PDF-1.4 paper {i} ".encode() * (i * 50 + 1))
+        for i in range(20)
+    ]
+    plain_dir, compressed_dir = tmp_path / "plain", tmp_path / "compressed"
+    plain_dir.mkdir()
+    compressed_dir.mkdir()
+    tar_path = make_tar(plain_dir / "arXiv_pdf_0.tar", members)
+    if suffix == ".tar.gz":
+        compressed = gzip.compress(tar_path.read_bytes())
+    else:
+        zstandard = pytest.importorskip("zstandard")
+        compressed = zstandard.ZstdCompressor().compress(tar_path.read_bytes())
+    (compressed_dir / f"arXiv_pdf_0{suffix}").write_bytes(compressed)
+
+    def extract(input_dir):
+        config = ExtractionConfig(threaded_decompression=threaded_decompression)
+        return [
+            (p.paper_id, p.get_pdf_content(), p.has_errors())
+            for p in iter_extracted_content(input_dir, config)
+        ]
+
+    expected = extract(plain_dir)
+    assert len(expected) == 20
+    assert extract(compressed_dir) == expected
+    assert decompress_threads() == []
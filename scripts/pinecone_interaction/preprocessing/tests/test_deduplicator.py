@@ -0,0 +1,138 @@
+import json
+
+from modules import deduplicator as deduplicator_module
+from modules.deduplicator import (
+    VERSION_POLICY_LATEST,
+    PaperDeduplicator,
+    scan_latest_versions,
+)
+from modules.extractor import list_archives
+from modules.types import Paper, PdfPayloadRef, _archive_map
+from pdf_fixtures import make_tar
+
+
+def build_versioned_input(input_dir):
+    input_dir.mkdir()
+    make_tar(
+        input_dir / "arXiv_pdf_0.tar",
+        [("0/2301.00001v1.pdf", b"v1"), ("0/2301.00002.pdf", b"b")],
+    )
+    make_tar(
+        input_dir / "arXiv_pdf_1.tar.gz",
+        [("1/2301.00001v3.pdf", b"v3"), ("1/2301.00003v2.pdf", b"c")],
+        mode="w:gz",
+    )
+    (input_dir / "arXiv_pdf_2.tar.zst").write_bytes(b"not a zstd frame")
+    return input_dir
+
+
+def test_scan_latest_versions_covers_compressed_archives(tmp_path):
+    input_dir = build_versioned_input(tmp_path / "in")
+    cache_path = tmp_path / "versions.json"
+
+    latest = scan_latest_versions(list_archives(input_dir), cache_path=cache_path)
+
+    assert latest == {"2301.00001": 3, "2301.00002": 0, "2301.00003": 2}
+    assert sorted(path.name for path in input_dir.iterdir()) == [
+        "arXiv_pdf_0.tar",
+        "arXiv_pdf_1.tar.gz",
+        "arXiv_pdf_2.tar.zst",
+    ]
+    cached = json.loads(cache_path.read_text())["archives"]
+    assert sorted(cached) == ["arXiv_pdf_0.tar", "arXiv_pdf_1.tar.gz"]
+
+
+def test_scan_latest_versions_reuses_cache_until_archive_changes(tmp_path):
+    input_dir = build_versioned_input(tmp_path / "in")
+    cache_path = tmp_path / "versions.json"
+    scan_latest_versions(list_archives(input_dir), cache_path=cache_path)
+
+    make_tar(input_dir / "arXiv_pdf_0.tar", [("0/2301.00002v5.pdf", b"b5")])
+    latest = scan_latest_versions(list_archives(input_dir), cache_path=cache_path)
+
+    assert latest == {"2301.00001": 3, "2301.00002": 5, "2301.00003": 2}
+
+
+def test_latest_versions_callable_is_resolved_once_on_first_check():
+    calls = []
+
+    def scan():
+        calls.append(1)
+        return {"2301.00001": 2}
+
+    deduplicator = PaperDeduplicator(
+        version_policy=VERSION_POLICY_LATEST, latest_versions=scan
+    )
+    assert calls == []
+
+    older = Paper("2301.00001v1", "a.pdf", pdf_content=b"1")
+    newer = Paper("2301.00001v2", "b.pdf", pdf_content=b"2")
+    assert deduplicator.check(older) == "superseded_version"
+    assert deduplicator.check(newer) is None
+    assert calls == [1]
+
+
+def test_first_paper_waits_for_a_scan_of_every_pending_archive(tmp_path, monkeypatch):
+    input_dir = build_versioned_input(tmp_path / "in")
+    cache_path = tmp_path / "versions.json"
+    events = []
+    scan_paper_ids = deduplicator_module._scan_paper_ids
+
+    def recording_scan(tar_path, config):
+        events.append(f"scan {tar_path.name}")
+        return scan_paper_ids(tar_path, config)
+
+    def papers():
+        for name, paper_id in (
+            ("arXiv_pdf_0.tar", "2301.00002"),
+            ("arXiv_pdf_1.tar.gz", "2301.00001v3"),
+        ):
+            events.append(f"read {name}")
+            yield Paper(paper_id, f"{paper_id}.pdf", pdf_content=paper_id.encode())
+
+    def run():
+        deduplicator = PaperDeduplicator(
+            version_policy=VERSION_POLICY_LATEST,
+            latest_versions=lambda: scan_latest_versions(
+                list_archives(input_dir), cache_path=cache_path
+            ),
+        )
+        return [paper.paper_id for paper in deduplicator.filter(papers())]
+
+    monkeypatch.setattr(deduplicator_module, "_scan_paper_ids", recording_scan)
+    assert run() == ["2301.00002", "2301.00001v3"]
+    assert events == [
+        "read arXiv_pdf_0.tar",
+        "scan arXiv_pdf_0.tar",
+        "scan arXiv_pdf_1.tar.gz",
+        "scan arXiv_pdf_2.tar.zst",
+        "read arXiv_pdf_1.tar.gz",
+    ]
+
+    events.clear()
+    assert run() == ["2301.00002", "2301.00001v3"]
+    # Unchanged archives come from the cache; the unreadable one is retried.
+    assert events == [
+        "read arXiv_pdf_0.tar",
+        "scan arXiv_pdf_2.tar.zst",
+        "read arXiv_pdf_1.tar.gz",
+    ]
+
+
+def test_payload_views_share_one_map_per_archive(tmp_path):
+    tar_path = make_tar(
+        tmp_path / "a.tar", [("2301.00001.pdf", b"first"), ("2301.00002.pdf", b"second")]
+    )
+    data = tar_path.read_bytes()
+    refs = [
+        PdfPayloadRef(tar_path, data.index(payload), len(payload))
+        for payload in (b"first", b"second")
+    ]
+    misses = _archive_map.cache_info().misses
+
+    views = [ref.view() for ref in refs]
+
+    assert [bytes(view) for view in views] == [b"first", b"second"]
+    assert _archive_map.cache_info().misses == misses + 1
+    for view in views:
+        view.release()
@@ -0,0 +1,71 @@
+import pytest
+
+from modules.embedder import (
+    EmbeddingRequestTooLargeError,
+    EmbeddingService,
+    pack_requests,
+)
+from modules.tokenizer import RegexTokenizer
+from embedding_server import EmbeddingServer, embedding_for
+
+
+@pytest.fixture(autouse=True)
+def no_proxy(monkeypatch):
+    monkeypatch.setenv("NO_PROXY", "127.0.0.1")
+
+
+def service(server, **kwargs):
+    return EmbeddingService(
+        "test-key", base_url=server.base_url, tokenizer=RegexTokenizer(), **kwargs
+    )
+
+
+def texts(count):
+    return [f"chunk number {i} " + "word " * (i % 7) for i in range(count)]
+
+
+def test_pack_requests_respects_token_and_input_limits():
+    assert pack_requests([3, 3, 3, 10, 1], max_tokens=6, max_inputs=5) == [
+        (0, 2), (2, 3), (3, 4), (4, 5)
+    ]
+    assert pack_requests([1] * 5, max_tokens=100, max_inputs=2) == [(0, 2), (2, 4), (4, 5)]
+    assert pack_requests([]) == []
+
+
+def test_results_keep_input_order_across_requests():
+    inputs = texts(25)
+    with EmbeddingServer() as server, service(server, max_inputs_per_request=10) as client:
+        vectors = client.embed(inputs)
+
+    assert vectors == [embedding_for(text) for text in inputs]
+    assert [len(request) for request in server.requests] == [10, 10, 5]
+
+
+@pytest.mark.parametrize("status", [400, 413])
+def test_too_large_requests_are_split(status):
+    inputs = texts(12)
+    with EmbeddingServer(max_inputs=3, too_large_status=status) as server:
+        with service(server) as client:
+            vectors = client.embed(inputs)
+
+    assert vectors == [embedding_for(text) for text in inputs]
+    assert set(server.rejected) == {status}
+    accepted = [request for request in server.requests if len(request) <= 3]
+    assert [text for request in accepted for text in request] == inputs
+
+
+def test_single_input_too_large_raises():
+    with EmbeddingServer(max_inputs=0) as server, service(server) as client:
+        with pytest.raises(EmbeddingRequestTooLargeError):
+            client.embed(["one", "two"])
+
+
+def test_rate_limited_request_is_retried():
+    inputs = texts(4)
+    with EmbeddingServer(rate_limited=2, retry_after_ms=20) as server:
+        with service(server) as client:
+            vectors = client.embed(inputs)
+
+    assert vectors == [embedding_for(text) for text in inputs]
+    assert server.rejected == [429, 429]
+    assert server.requests == [inputs] * 3
@@ -0,0 +1,72 @@
+from modules.embedding_cache import EmbeddingCache, normalize_text
+
+
+def vector_for(text, dimensions=4):
+    return [float(len(text) + i) for i in range(dimensions)]
+
+
+class CountingEmbedder:
+    def __init__(self, dimensions=4, fail=False):
+        self.dimensions = dimensions
+        self.fail = fail
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        if self.fail:
+            return None
+        return [vector_for(text, self.dimensions) for text in texts]
+
+
+def test_normalize_text():
+    assert normalize_text("  Café \n\tbar  ") == "Café bar"
+
+
+def test_embeds_only_misses_once_per_normalised_text():
+    embed_fn = CountingEmbedder()
+    with EmbeddingCache(dimensions=4) as cache:
+        first = cache.embed(["alpha", "beta", " alpha  "], embed_fn)
+        second = cache.embed(["gamma", "beta", "alpha"], embed_fn)
+
+    assert first == [vector_for("alpha"), vector_for("beta"), vector_for("alpha")]
+    assert second == [vector_for("gamma"), vector_for("beta"), vector_for("alpha")]
+    assert embed_fn.calls == [["alpha", "beta"], ["gamma"]]
+    assert (cache.stats.hits, cache.stats.misses) == (2, 4)
+
+
+def test_entries_persist_per_model_and_dimensions(tmp_path):
+    path = tmp_path / "embeddings.sqlite"
+    with EmbeddingCache(path, model="m1", dimensions=4) as cache:
+        cache.put_many(["alpha"], [vector_for("alpha")])
+
+    with EmbeddingCache(path, model="m1", dimensions=4) as cache:
+        assert cache.get_many(["alpha"])[0].tolist() == vector_for("alpha")
+    with EmbeddingCache(path, model="m2", dimensions=4) as cache:
+        assert cache.get_many(["alpha"]) == [None]
+    with EmbeddingCache(path, model="m1", dimensions=2) as cache:
+        assert cache.get_many(["alpha"]) == [None]
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    path = tmp_path / "embeddings.sqlite"
+    with EmbeddingCache(path, dimensions=4, max_bytes=3 * 16) as cache:
+        cache.put_many(["a", "b", "c"], [vector_for(t) for t in "abc"])
+        cache.get_many(["a"])  # "b" is now the least recently used
+        cache.put_many(["d"], [vector_for("d")])
+
+        assert [v is not None for v in cache.get_many(["a", "b", "c", "d"])] == [
+            True, False, True, True
+        ]
+        assert cache.total_bytes == 3 * 16 and cache.stats.evictions == 1
+
+    with EmbeddingCache(path, dimensions=4, max_bytes=16) as cache:
+        assert len(cache) == 1 and cache.total_bytes == 16
+
+
+def test_failed_or_mismatched_embeddings_are_not_cached():
+    with EmbeddingCache(dimensions=4) as cache:
+        assert cache.embed(["alpha"], CountingEmbedder(fail=True)) is None
+        assert cache.embed(["beta"], CountingEmbedder(dimensions=3)) == [
+            vector_for("beta", 3)
+        ]
+        assert len(cache) == 0
@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+
+from modules.embedding_compression import (
+    COMPRESSION_PCA,
+    COMPRESSION_TRUNCATE,
+    PROJECTION_FILENAME,
+    CompressionConfig,
+    EmbeddingCompressor,
+    PCAProjection,
+    compress_store,
+    compression_report,
+    dequantize_int8,
+    normalize_rows,
+    quantize_int8,
+    top_k,
+)
+from modules.vector_store import ChunkMetadata, VectorStore, VectorStoreWriter
+
+
+def low_rank_vectors(count, rank=4, dimensions=32, seed=0):
+    """Vectors that span only `rank` directions, like a well-compressible corpus."""
+    rng = np.random.default_rng(seed)
+    basis = rng.standard_normal((rank, dimensions))
+    return (rng.standard_normal((count, rank)) @ basis).astype(np.float32)
+
+
+def test_int8_round_trip():
+    vectors = normalize_rows(np.random.default_rng(1).standard_normal((50, 16)))
+    quantized = quantize_int8(vectors)
+
+    assert quantized.codes.dtype == np.int8 and quantized.scales.shape == (50,)
+    np.testing.assert_allclose(dequantize_int8(quantized), vectors, atol=0.01)
+    assert not dequantize_int8(quantize_int8(np.zeros((1, 4)))).any()
+
+
+def test_top_k_matches_brute_force_across_blocks():
+    database = normalize_rows(np.random.default_rng(2).standard_normal((100, 8)))
+    queries = database[:5] + 0.01
+
+    found = top_k(database, queries, k=7, block_rows=16)
+
+    expected = np.argsort(-(queries @ database.T), axis=1)[:, :7]
+    np.testing.assert_array_equal(found, expected)
+    assert top_k(database, queries, k=500).shape == (5, 100)
+
+
+def test_pca_keeps_low_rank_structure(tmp_path):
+    vectors = low_rank_vectors(300)
+    projection = PCAProjection.fit(vectors, 4)
+
+    assert projection.explained_variance > 0.999
+    projection.save(tmp_path / "projection.npz")
+    loaded = PCAProjection.load(tmp_path / "projection.npz")
+    np.testing.assert_allclose(loaded.transform(vectors), projection.transform(vectors))
+
+
+def test_config_validation_and_sizes():
+    with pytest.raises(ValueError):
+        CompressionConfig("zip", 8)
+    with pytest.raises(ValueError):
+        CompressionConfig(COMPRESSION_PCA)
+
+    assert CompressionConfig().name == "float32"
+    assert CompressionConfig(COMPRESSION_PCA, 256, quantize=True).name == "pca256+int8"
+    assert CompressionConfig(COMPRESSION_TRUNCATE, 256).bytes_per_vector(1536) == 1024
+    assert CompressionConfig(quantize=True).bytes_per_vector(1536) == 1540
+
+
+def test_compression_report_recall():
+    vectors = low_rank_vectors(400)
+    configs = [
+        CompressionConfig(),
+        CompressionConfig(COMPRESSION_PCA, 4),
+        CompressionConfig(COMPRESSION_PCA, 4, quantize=True),
+        CompressionConfig(COMPRESSION_TRUNCATE, 2),
+    ]
+
+    report = compression_report(vectors[40:], vectors[:40], configs, ks=(1, 10))
+
+    by_name = {row["config"]: row for row in report}
+    assert by_name["float32"]["recall@10"] == 1.0
+    assert by_name["pca4"]["recall@10"] == pytest.approx(1.0)  # Lossless on rank-4 data
+    assert by_name["pca4+int8"]["recall@10"] > 0.97
+    assert by_name["truncate2"]["recall@10"] < by_name["pca4"]["recall@10"]
+    assert by_name["pca4"]["ratio"] == 8.0
+
+
+def test_compress_store_keeps_queries_searchable(tmp_path):
+    vectors = low_rank_vectors(30)
+    metadata = [ChunkMetadata("2301.00001", i, i, i + 1) for i in range(30)]
+    with VectorStoreWriter(tmp_path / "full", "test-model", 32, shard_rows=8) as writer:
+        writer.append(vectors, metadata)
+
+    compress_store(
+        tmp_path / "full",
+        tmp_path / "small",
+        CompressionConfig(COMPRESSION_PCA, 4, quantize=True),
+    )
+
+    with VectorStore(tmp_path / "small") as store:
+        assert store.model == "test-model+pca4+int8"
+        assert store.dimensions == 4 and len(store) == 30
+        assert store.projection == tmp_path / "small" / PROJECTION_FILENAME
+        assert store.metadata(range(30)) == metadata
+        compressor = EmbeddingCompressor(
+            CompressionConfig(COMPRESSION_PCA, 4), PCAProjection.load(store.projection)
+        )
+        database = store.vectors(range(30))
+    found = top_k(database, compressor.reduce(vectors[:5]), k=1)
+    assert found[:, 0].tolist() == [0, 1, 2, 3, 4]
@@ -0,0 +1,150 @@
+import os
+import tarfile
+import time
+
+import pytest
+
+from modules import extractor
+from modules.extractor import ExtractionConfig, iter_extracted_content
+from pdf_fixtures import make_tar
+
+
+def build_archives(input_dir, archives=4, papers_per_archive=30):
+    """Uncompressed and gzip-compressed archives of small fake PDFs."""
+    input_dir.mkdir()
+    for archive in range(archives):
+        members = [(f"{archive}/README.txt", b"not a pdf")]
+        members += [
+            (
+                f"{archive}/2301.{archive * 100 + i:05d}.pdf",
+                f"%PDF-1.4 archive {archive} paper {i}".encode() * (i + 1),
+            )
+            for i in range(papers_per_archive)
+        ]
+        suffix, mode = (".tar.gz", "w:gz") if archive % 2 else (".tar", "w")
+        make_tar(input_dir / f"arXiv_pdf_{archive}{suffix}", members, mode)
+    return input_dir
+
+
+def extract(input_dir, **config):
+    done = []
+    papers = list(
+        iter_extracted_content(
+            input_dir,
+            ExtractionConfig(**config),
+            on_archive_done=lambda name, clean: done.append((name, clean)),
+        )
+    )
+    return [(p.paper_id, p.source_tar_filename, p.get_pdf_content()) for p in papers], done
+
+
+def test_streamed_members_match_getmembers(tmp_path):
+    input_dir = build_archives(tmp_path / "in")
+    make_tar(
+        input_dir / "arXiv_pdf_9.tar",
+        [("9/notes.pdf", b"no paper id"), ("9/2301.09999v2.PDF", b"%PDF-1.4 upper case")],
+    )
+
+    streamed, streamed_done = extract(input_dir, stream_members=True)
+    listed, listed_done = extract(input_dir, stream_members=False)
+
+    assert streamed == listed
+    assert len(streamed) == 4 * 30 + 1
+    assert streamed_done == listed_done
+
+
+def test_streaming_does_not_keep_member_headers(tmp_path):
+    input_dir = build_archives(tmp_path / "in", archives=1)
+
+    with tarfile.open(input_dir / "arXiv_pdf_0.tar") as archive:
+        held = [
+            len(archive.members)
+            for _ in extractor.iter_archive_members(archive, stream_members=True)
+        ]
+
+    assert len(held) == 31
+    assert max(held) <= 1
+
+
+def test_streaming_keeps_papers_before_a_truncation(tmp_path):
+    input_dir = build_archives(tmp_path / "in", archives=1)
+    tar_path = input_dir / "arXiv_pdf_0.tar"
+    tar_path.write_bytes(tar_path.read_bytes()[: tar_path.stat().st_size // 2])
+
+    streamed, done = extract(input_dir, stream_members=True)
+    listed, _ = extract(input_dir, stream_members=False)
+
+    assert done == [("arXiv_pdf_0.tar", False)]
+    assert len([paper for paper in streamed if paper[2] is not None]) > 10
+    assert listed == []
+
+
+@pytest.mark.parametrize("lazy_pdf_content", [False, True])
+def test_parallel_ordered_matches_serial(tmp_path, lazy_pdf_content):
+    input_dir = build_archives(tmp_path / "in")
+    serial, serial_done = extract(input_dir, lazy_pdf_content=lazy_pdf_content)
+
+    parallel, parallel_done = extract(
+        input_dir, num_workers=2, queue_size=4, lazy_pdf_content=lazy_pdf_content
+    )
+
+    assert len(serial) == 4 * 30
+    assert parallel == serial
+    assert parallel_done == serial_done == [
+        ("arXiv_pdf_0.tar", True),
+        ("arXiv_pdf_1.tar.gz", True),
+        ("arXiv_pdf_2.tar", True),
+        ("arXiv_pdf_3.tar.gz", True),
+    ]
+
+
+def test_parallel_unordered_yields_every_paper(tmp_path):
+    input_dir = build_archives(tmp_path / "in")
+    serial, serial_done = extract(input_dir)
+
+    parallel, parallel_done = extract(input_dir, num_workers=3, preserve_order=False)
+
+    assert sorted(parallel) == sorted(serial)
+    assert parallel_done == serial_done
+
+
+def test_parallel_eager_content_is_loaded(tmp_path):
+    input_dir = build_archives(tmp_path / "in", archives=2)
+
+    papers = list(iter_extracted_content(input_dir, ExtractionConfig(num_workers=2)))
+
+    assert all(p.pdf_content is not None and p.pdf_source is None for p in papers)
+
+
+def test_parallel_early_close_stops_workers(tmp_path, capfd):
+    input_dir = build_archives(tmp_path / "in", papers_per_archive=200)
+    papers = iter_extracted_content(input_dir, ExtractionConfig(num_workers=2, queue_size=2))
+
+    started = time.monotonic()
+    assert len([paper for _, paper in zip(range(5), papers)]) == 5
+    papers.close()
+
+    assert time.monotonic() - started < 10
+    assert "Traceback" not in capfd.readouterr().err
+
+
+def test_parallel_dead_worker_does_not_hang(tmp_path, monkeypatch):
+    input_dir = build_archives(tmp_path / "in")
+    walk_members = extractor.iter_archive_members
+
+    def dying_walk(archive, stream_members):
+        for index, member in enumerate(walk_members(archive, stream_members)):
+            if archive.name.endswith("arXiv_pdf_1.tar.gz") and index == 10:
+                os._exit(1)  # Like a worker killed by the OOM killer
+            yield member
+
+    monkeypatch.setattr(extractor, "iter_archive_members", dying_walk)
+    _, done = extract(input_dir, num_workers=2)
+
+    assert [name for name, _ in done] == [
+        "arXiv_pdf_0.tar",
+        "arXiv_pdf_1.tar.gz",
+        "arXiv_pdf_2.tar",
+        "arXiv_pdf_3.tar.gz",
+    ]
+    assert dict(done)["arXiv_pdf_1.tar.gz"] is False
@@ -0,0 +1,261 @@
+import json
+import tarfile
+from pathlib import Path
+
+import pytest
+
+import main
+from modules import extractor
+from modules.checkpoint import checkpoint_path_for
+from modules.local_embedder import HashedNgramEmbedder
+from modules.pdf_parser import PdfParsingConfig
+from modules.vector_store import VectorStore
+from pdf_fixtures import make_pdf, make_tar, paper_text
+
+
+class Crash(BaseException):
+    """Stands in for the process dying (not caught by the pipeline)."""
+
+
+class CrashingEmbedder(HashedNgramEmbedder):
+    def __init__(self, crash_after_calls=None):
+        super().__init__()
+        self.calls = 0
+        self.crash_after_calls = crash_after_calls
+
+    def embed(self, texts, token_counts=None):
+        self.calls += 1
+        if self.crash_after_calls is not None and self.calls > self.crash_after_calls:
+            raise Crash()
+        return super().embed(texts, token_counts)
+
+
+def build_input(input_dir: Path, archives: int = 3, papers_per_archive: int = 20):
+    """Archives of distinct papers, plus one byte-identical copy per archive.
+
+    Returns:
+        The IDs that survive deduplication.
+    """
+    input_dir.mkdir(parents=True)
+    expected = []
+    for archive in range(archives):
+        members = []
+        for i in range(papers_per_archive):
+            paper_id = f"2301.{archive * 100 + i:05d}"
+            members.append((f"{archive}/{paper_id}.pdf", make_pdf(paper_text(paper_id))))
+            expected.append(paper_id)
+        if archive:
+            copied = f"2301.{(archive - 1) * 100:05d}"
+            members.append(
+                (f"{archive}/2301.{archive * 100 + 99:05d}.pdf", make_pdf(paper_text(copied)))
+            )
+        make_tar(input_dir / f"arXiv_pdf_{archive}.tar", members)
+    return expected
+
+
+def run(tmp_path, output_file, backend, resume=False, **kwargs):
+    main.get_embedding_backend = lambda *args, **kw: backend
+    main.process_papers(
+        tmp_path / "in",
+        output_file,
+        dedup_state_file=tmp_path / "dedup.jsonl",
+        resume=resume,
+        commit_every=4,
+        pdf_parsing_config=PdfParsingConfig(num_workers=2),
+        **kwargs,
+    )
+
+
+def read_records(output_file):
+    with open(output_file, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.fixture(autouse=True)
+def restore_backend_factory():
+    original = main.get_embedding_backend
+    yield
+    main.get_embedding_backend = original
+
+
+def test_process_papers_end_to_end(tmp_path):
+    expected = build_input(tmp_path / "in", archives=2, papers_per_archive=5)
+    output_file = tmp_path / "out.jsonl"
+
+    run(tmp_path, output_file, CrashingEmbedder())
+
+    records = read_records(output_file)
+    assert [r["paper_id"] for r in records] == expected
+    for record in records:
+        assert paper_text(record["paper_id"]) in record["text"]
+        assert len(record["embeddings"]) == len(record["chunk_spans"]) > 0
+        assert all(len(vector) == 384 for vector in record["embeddings"])
+        for start, end in record["chunk_spans"]:
+            assert 0 <= start < end <= len(record["text"])
+    checkpoint = json.loads(checkpoint_path_for(output_file).read_text())
+    assert checkpoint["completed_tars"] == ["arXiv_pdf_0.tar", "arXiv_pdf_1.tar"]
+
+
+@pytest.mark.parametrize("crash_after_calls", [1, 7, 25])
+@pytest.mark.parametrize("vector_store", [False, True])
+def test_resume_after_crash_writes_every_paper_once(
+    tmp_path, crash_after_calls, vector_store
+):
+    expected = build_input(tmp_path / "in")
+    output_file = tmp_path / "out.jsonl"
+    store_dir = tmp_path / "vectors" if vector_store else None
+
+    with pytest.raises(Crash):
+        run(
+            tmp_path,
+            output_file,
+            CrashingEmbedder(crash_after_calls),
+            vector_store_dir=store_dir,
+        )
+    run(tmp_path, output_file, CrashingEmbedder(), resume=True, vector_store_dir=store_dir)
+
+    records = read_records(output_file)
+    assert sorted(r["paper_id"] for r in records) == sorted(expected)
+    if vector_store:
+        rows = [tuple(r["vector_rows"]) for r in records]
+        assert rows[0][0] == 0
+        assert all(a[1] == b[0] for a, b in zip(rows, rows[1:]))
+        with VectorStore(store_dir) as store:
+            assert len(store) == rows[-1][1]
+            for record in records:
+                metadata = store.metadata(range(*record["vector_rows"]))
+                assert {m.paper_id for m in metadata} == {record["paper_id"]}
+
+
+def test_archive_abandoned_on_read_error_is_retried_on_resume(tmp_path, monkeypatch):
+    expected = build_input(tmp_path / "in")
+    output_file = tmp_path / "out.jsonl"
+    walk_members = extractor.iter_archive_members
+
+    def failing_walk(archive, stream_members):
+        for index, member in enumerate(walk_members(archive, stream_members)):
+            if archive.name.endswith("arXiv_pdf_1.tar") and index == 8:
+                raise tarfile.ReadError("simulated corruption")
+            yield member
+
+    monkeypatch.setattr(extractor, "iter_archive_members", failing_walk)
+    run(tmp_path, output_file, CrashingEmbedder())
+    checkpoint = json.loads(checkpoint_path_for(output_file).read_text())
+    assert checkpoint["completed_tars"] == ["arXiv_pdf_0.tar", "arXiv_pdf_2.tar"]
+    assert len(checkpoint["committed_papers"]["arXiv_pdf_1.tar"]) == 8
+
+    monkeypatch.setattr(extractor, "iter_archive_members", walk_members)
+    run(tmp_path, output_file, CrashingEmbedder(), resume=True)
+
+    records = read_records(output_file)
+    assert sorted(r["paper_id"] for r in records) == sorted(expected)
+
+
+def test_latest_version_policy_sees_compressed_archives(tmp_path):
+    input_dir = tmp_path / "in"
+    input_dir.mkdir()
+    make_tar(
+        input_dir / "arXiv_pdf_0.tar",
+        [("0/2301.00001v1.pdf", make_pdf(paper_text("2301.00001v1")))],
+    )
+    make_tar(
+        input_dir / "arXiv_pdf_1.tar.gz",
+        [("1/2301.00001v2.pdf", make_pdf(paper_text("2301.00001v2")))],
+        mode="w:gz",
+    )
+    output_file = tmp_path / "out.jsonl"
+
+    run(tmp_path, output_file, CrashingEmbedder())
+
+    assert [r["paper_id"] for r in read_records(output_file)] == ["2301.00001v2"]
+    assert sorted(path.name for path in input_dir.iterdir()) == [
+        "arXiv_pdf_0.tar",
+        "arXiv_pdf_1.tar.gz",
+    ]
+
+
+def long_page(topic):
+    return " ".join(
+        f"Section on {topic} sentence {i} describes measurement {i * 7} in detail."
+        for i in range(12)
+    )
+
+
+def test_near_duplicate_chunks_keep_their_chunk_index(tmp_path):
+    input_dir = tmp_path / "in"
+    input_dir.mkdir()
+    shared = [long_page("alpha"), long_page("beta")]
+    make_tar(
+        input_dir / "arXiv_pdf_0.tar",
+        [
+            ("0/2301.00001.pdf", make_pdf(shared + [long_page("gamma")])),
+            ("0/2301.00002.pdf", make_pdf(shared + [long_page("delta")])),
+            ("0/2301.00003.pdf", make_pdf(shared + [long_page("gamma") + " "])),
+        ],
+    )
+    output_file = tmp_path / "out.jsonl"
+    store_dir = tmp_path / "vectors"
+
+    run(tmp_path, output_file, CrashingEmbedder(), vector_store_dir=store_dir)
+
+    first, partial, copy = read_records(output_file)
+    assert first["chunk_aliases"] == []
+    assert [alias["chunk_index"] for alias in partial["chunk_aliases"]] == list(
+        range(len(partial["chunk_aliases"]))
+    )
+    assert partial["chunk_aliases"] and partial["chunk_spans"]
+    assert copy["paper_id"] == "2301.00003"
+    assert copy["chunk_spans"] == []
+    assert copy["vector_rows"][0] == copy["vector_rows"][1]
+    assert len(copy["chunk_aliases"]) == len(first["chunk_spans"])
+
+    with VectorStore(store_dir) as store:
+        metadata = store.metadata(range(*partial["vector_rows"]))
+    assert [m.chunk_index for m in metadata] == list(
+        range(len(partial["chunk_aliases"]), len(partial["chunk_aliases"]) + len(metadata))
+    )
+    assert [[m.start, m.end] for m in metadata] == partial["chunk_spans"]
+
+
+class FailingFirstCallEmbedder(HashedNgramEmbedder):
+    """Fails its first request, as an API outage would."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def embed(self, texts, token_counts=None):
+        self.calls += 1
+        if self.calls == 1:
+            raise RuntimeError("simulated API error")
+        return super().embed(texts, token_counts)
+
+
+def test_duplicate_of_a_paper_that_failed_to_embed_is_embedded(tmp_path):
+    input_dir = tmp_path / "in"
+    input_dir.mkdir()
+    pages = [long_page("alpha"), long_page("beta")]
+    make_tar(
+        input_dir / "arXiv_pdf_0.tar",
+        [
+            ("0/2301.00001.pdf", make_pdf(pages)),
+            ("0/2301.00002.pdf", make_pdf(pages[:1] + [pages[1] + " "])),
+        ],
+    )
+    output_file = tmp_path / "out.jsonl"
+    store_dir = tmp_path / "vectors"
+
+    run(
+        tmp_path,
+        output_file,
+        FailingFirstCallEmbedder(),
+        vector_store_dir=store_dir,
+        chunk_dedup_index=tmp_path / "chunks.sqlite",
+    )
+
+    (record,) = read_records(output_file)
+    assert record["paper_id"] == "2301.00002"
+    assert record["chunk_aliases"] == []
+    assert record["chunk_spans"]
+    with VectorStore(store_dir) as store:
+        assert len(store) == len(record["chunk_spans"])
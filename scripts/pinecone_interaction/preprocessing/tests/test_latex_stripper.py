@@ -0,0 +1,52 @@
+import pytest
+
+from modules.latex_stripper import passes_quality_check, strip_latex
+
+
+@pytest.mark.parametrize(
+    "latex, expected",
+    [
+        (r"\noindent {\bf Abstract.} We study graphs.", "Abstract. We study graphs."),
+        (
+            r"\begin{itemize}\item First point \item {Second} point\end{itemize}",
+            "First point Second point",
+        ),
+        (
+            r"It holds in all cases.\footnote{See \cite{knuth} for details.}Next, we",
+            "It holds in all cases. See for details. Next, we",
+        ),
+        (r"\section{Introduction}Graphs are useful.", "Introduction Graphs are useful."),
+        (
+            r"As shown in \cite[p.~3]{a,b} and Fig.~\ref{fig:x}\label{s:intro}, "
+            r"\emph{sparse} graphs \textbf{win}.",
+            "As shown in and Fig. , sparse graphs win.",
+        ),
+        (
+            r"\newcommand{\R}[1]{\mathbb{R}}See \href{https://arxiv.org}{the archive} "
+            r"and \url{https://example.org}.",
+            "See the archive and .",
+        ),
+        (r"Energy $E = mc^2$ is conserved. 50\% of it.", "Energy is conserved. 50% of it."),
+        (
+            "Before.\n\\begin{equation}\nx = 1\n\\end{equation}\nAfter.",
+            "Before.\n\nAfter.",
+        ),
+    ],
+)
+def test_strip_latex(latex, expected):
+    assert strip_latex(latex) == expected
+
+
+def test_strip_latex_keeps_only_the_document_body():
+    latex = (
+        "\\documentclass{article}\n\\usepackage{amsmath}\n"
+        "\\begin{document}\nBody text.\n\\end{document}\nTrailing junk"
+    )
+    assert strip_latex(latex) == "Body text."
+
+
+def test_quality_check_rejects_swallowed_document():
+    latex = r"Intro text. \begin{equation} x " + "words " * 100
+    assert not passes_quality_check(latex, strip_latex(latex))
+    prose = r"\section{Results} We find that " + "the method works well. " * 20
+    assert passes_quality_check(prose, strip_latex(prose))
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from modules.local_embedder import LOCAL_EMBEDDING_DIMENSION, HashedNgramEmbedder
+
+TEXTS = [
+    "Graph neural networks learn node representations by message passing.",
+    "We measure the thermal conductivity of thin graphene films.",
+    "Café résumé naïve",
+    "x",
+    "",
+]
+
+
+def test_vectors_do_not_depend_on_the_batch():
+    embedder = HashedNgramEmbedder()
+    batch = embedder.embed_array(TEXTS)
+
+    assert batch.shape == (len(TEXTS), LOCAL_EMBEDDING_DIMENSION)
+    assert batch.dtype == np.float32
+    for i, text in enumerate(TEXTS):
+        assert np.array_equal(embedder.embed_array([text])[0], batch[i])
+    reordered = embedder.embed_array(TEXTS[::-1])
+    assert np.array_equal(reordered, batch[::-1])
+    # Neighbours whose bytes would form n-grams across the boundary.
+    glued = embedder.embed_array(["abc", "def"])
+    assert np.array_equal(glued[0], embedder.embed_array(["abc"])[0])
+    assert np.array_equal(glued[1], embedder.embed_array(["def"])[0])
+    assert np.array_equal(HashedNgramEmbedder().embed_array(TEXTS), batch)
+
+
+def test_vectors_have_unit_norm():
+    vectors = HashedNgramEmbedder(dimensions=64).embed_array(TEXTS[:4])
+
+    np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1.0, rtol=1e-6)
+
+
+def test_near_duplicates_score_higher_than_unrelated_text():
+    embedder = HashedNgramEmbedder()
+    original, edited, unrelated = embedder.embed_array(
+        [
+            TEXTS[0] + " Experiments cover citation and protein graphs.",
+            TEXTS[0].upper() + "  Experiments cover citation and  protein graphs!",
+            TEXTS[1],
+        ]
+    )
+
+    assert original @ edited > 0.9
+    assert original @ unrelated < 0.5
+
+
+def test_normalisation_ignores_case_whitespace_and_unicode_form():
+    embedder = HashedNgramEmbedder()
+    composed, decomposed, spaced = embedder.embed_array(
+        ["Café Résumé", "Café Résumé", "  café \n\t résumé "]
+    )
+
+    assert np.array_equal(composed, decomposed)
+    assert np.array_equal(composed, spaced)
+
+
+@pytest.mark.parametrize("texts", [[""], ["", "   "], []])
+def test_empty_texts_give_zero_vectors(texts):
+    vectors = HashedNgramEmbedder().embed_array(texts)
+
+    assert vectors.shape == (len(texts), LOCAL_EMBEDDING_DIMENSION)
+    assert not vectors.any()
+
+
+def test_very_short_texts_still_embed():
+    embedder = HashedNgramEmbedder()
+    a, b, empty = embedder.embed_array(["a", "b", ""])
+
+    assert np.linalg.norm(a) == pytest.approx(1.0)
+    assert not np.array_equal(a, b)
+    assert not empty.any()
+    assert embedder.embed(["a"]) == [a.tolist()]
+
+
+def test_settings_change_the_vectors():
+    default = HashedNgramEmbedder().embed_array(TEXTS[:1])
+    reseeded = HashedNgramEmbedder(seed=1)
+
+    assert not np.array_equal(reseeded.embed_array(TEXTS[:1]), default)
+    assert reseeded.model != HashedNgramEmbedder().model
+    assert HashedNgramEmbedder(ngram_range=(2, 4)).model != HashedNgramEmbedder().model
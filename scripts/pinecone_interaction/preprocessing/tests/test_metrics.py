@@ -0,0 +1,124 @@
+import json
+
+import pytest
+
+from modules.extractor import EXTRACTION_METRICS, ExtractionConfig, iter_extracted_content
+from modules.metrics import MetricsRegistry, PeriodicMetricsExporter
+from pdf_fixtures import make_tar
+
+
+def build_registry():
+    registry = MetricsRegistry(enabled=True)
+    papers = registry.counter("papers_total", "Papers seen.")
+    duration = registry.histogram("stage_seconds", "Stage wall time.", (1.0, 0.1, 5.0))
+    return registry, papers, duration
+
+
+def test_counters_and_histograms_aggregate():
+    registry, papers, duration = build_registry()
+    papers.inc()
+    papers.inc(4)
+    for seconds in (0.05, 0.1, 0.2, 1.0, 7.5):
+        duration.observe(seconds)
+
+    assert registry.counter("papers_total", "Ignored on reuse.") is papers
+    assert duration.buckets == (0.1, 1.0, 5.0)
+    # A value on a bound counts towards that bound (Prometheus "le").
+    assert registry.snapshot() == {
+        "counters": {"papers_total": 5},
+        "histograms": {
+            "stage_seconds": {
+                "buckets": [0.1, 1.0, 5.0],
+                "bucket_counts": [2, 2, 0, 1],
+                "sum": pytest.approx(8.85),
+                "count": 5,
+            }
+        },
+    }
+
+
+def test_prometheus_output():
+    registry, papers, duration = build_registry()
+    papers.inc(3)
+    duration.observe(0.5)
+    duration.observe(2.0)
+
+    assert registry.to_prometheus() == (
+        "# HELP papers_total Papers seen.\n"
+        "# TYPE papers_total counter\n"
+        "papers_total 3\n"
+        "# HELP stage_seconds Stage wall time.\n"
+        "# TYPE stage_seconds histogram\n"
+        'stage_seconds_bucket{le="0.1"} 0\n'
+        'stage_seconds_bucket{le="1.0"} 1\n'
+        'stage_seconds_bucket{le="5.0"} 2\n'
+        'stage_seconds_bucket{le="+Inf"} 2\n'
+        "stage_seconds_sum 2.5\n"
+        "stage_seconds_count 2\n"
+    )
+
+
+def test_merge_adds_worker_snapshots_and_reset_keeps_metrics():
+    registry, papers, duration = build_registry()
+    worker, worker_papers, worker_duration = build_registry()
+    papers.inc(2)
+    duration.observe(0.5)
+    worker_papers.inc(3)
+    worker_duration.observe(0.05)
+    snapshot = worker.snapshot()
+    snapshot["counters"]["unknown_total"] = 10
+    snapshot["histograms"]["other_seconds"] = snapshot["histograms"]["stage_seconds"]
+
+    registry.merge(snapshot)
+
+    assert registry.snapshot()["counters"] == {"papers_total": 5}
+    assert duration.bucket_counts == [1, 1, 0, 0] and duration.count == 2
+
+    mismatched = MetricsRegistry()
+    mismatched.histogram("stage_seconds", "Other buckets.", (2.0,)).observe(1.0)
+    registry.merge(mismatched.snapshot())
+    assert duration.count == 2
+
+    registry.reset()
+    assert registry.counter("papers_total", "") is papers and papers.value == 0
+    assert duration.bucket_counts == [0, 0, 0, 0] and duration.sum == 0.0
+
+
+def test_exporter_writes_a_final_snapshot(tmp_path):
+    registry, papers, _ = build_registry()
+    json_path, prom_path = tmp_path / "metrics.json", tmp_path / "metrics.prom"
+
+    with PeriodicMetricsExporter(registry, json_path, interval_seconds=60):
+        papers.inc(7)
+    PeriodicMetricsExporter(registry, prom_path, interval_seconds=60).start().stop()
+
+    assert json.loads(json_path.read_text())["counters"] == {"papers_total": 7}
+    assert "papers_total 7\n" in prom_path.read_text()
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["metrics.json", "metrics.prom"]
+
+
+@pytest.mark.parametrize("num_workers", [1, 2])
+def test_extraction_metrics_match_the_archives(tmp_path, num_workers):
+    for archive in range(3):
+        members = [(f"{archive}/README.txt", b"not a pdf"), (f"{archive}/notes.pdf", b"no id")]
+        members += [(f"{archive}/2301.{archive}{i:04d}.pdf", b"%PDF" * 100) for i in range(4)]
+        make_tar(tmp_path / f"arXiv_pdf_{archive}.tar", members)
+
+    EXTRACTION_METRICS.reset()
+    EXTRACTION_METRICS.enabled = True
+    try:
+        papers = list(iter_extracted_content(tmp_path, ExtractionConfig(num_workers=num_workers)))
+        snapshot = EXTRACTION_METRICS.snapshot()
+    finally:
+        EXTRACTION_METRICS.enabled = False
+        EXTRACTION_METRICS.reset()
+
+    assert len(papers) == 12
+    counters = snapshot["counters"]
+    assert counters["extractor_members_scanned_total"] == 18
+    assert counters["extractor_pdfs_found_total"] == 12
+    assert counters["extractor_id_parse_failures_total"] == 3
+    assert counters["extractor_pdf_bytes_read_total"] == 12 * 400
+    assert counters["extractor_archives_processed_total"] == 3
+    assert snapshot["histograms"]["extractor_archive_duration_seconds"]["count"] == 3
+    assert snapshot["histograms"]["extractor_pdf_size_bytes"]["bucket_counts"][0] == 12
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import threading
+from pathlib import Path
+
+import pytest
+
+from modules.output_writer import BatchedJsonlWriter, ShardedPdfWriter
+
+
+def pdf_bytes(paper_id):
+    return f"%PDF-1.4 {paper_id}".encode() * 10
+
+
+def test_paths_are_sharded_by_id_hash(tmp_path):
+    writer = ShardedPdfWriter(tmp_path, num_threads=0)
+    digest = hashlib.sha1(b"2301.00001v1").hexdigest()
+
+    assert writer.relative_path_for("2301.00001v1") == Path(
+        digest[:2], digest[2:4], "2301.00001v1.pdf"
+    )
+    assert ShardedPdfWriter(tmp_path, num_threads=0, shard_depth=0).relative_path_for(
+        "hep-th/9901001"
+    ) == Path("hep-th_9901001.pdf")
+
+
+@pytest.mark.parametrize("num_threads", [0, 3])
+def test_every_write_is_complete_after_close(tmp_path, num_threads):
+    paper_ids = [f"2301.{i:05d}" for i in range(300)]
+
+    with ShardedPdfWriter(tmp_path, num_threads=num_threads, max_pending=2) as writer:
+        futures = [writer.submit(paper_id, pdf_bytes(paper_id)) for paper_id in paper_ids]
+
+    assert all(future.done() for future in futures)
+    written = sorted(tmp_path.glob("*/*/*.pdf"))
+    assert len(written) == len(paper_ids)
+    assert len({path.parent.parent for path in written}) > 150  # Spread over shards
+    for paper_id, future in zip(paper_ids, futures):
+        assert (tmp_path / future.result()).read_bytes() == pdf_bytes(paper_id)
+    assert [t for t in threading.enumerate() if t.name.startswith("pdf-writer")] == []
+
+
+@pytest.mark.parametrize("num_threads", [0, 2])
+def test_write_error_reaches_the_caller(tmp_path, num_threads):
+    writer = ShardedPdfWriter(tmp_path, num_threads=num_threads, max_pending=1)
+    blocked = writer.relative_path_for("2301.00001")
+    (tmp_path / blocked.parts[0]).write_bytes(b"a file where the shard should be")
+
+    later_ids = [
+        f"2301.{i:05d}"
+        for i in range(2, 40)
+        if writer.relative_path_for(f"2301.{i:05d}").parts[0] != blocked.parts[0]
+    ]
+
+    with writer:
+        failed = writer.submit("2301.00001", pdf_bytes("2301.00001"))
+        later = [writer.submit(paper_id, pdf_bytes(paper_id)) for paper_id in later_ids]
+
+    with pytest.raises(IOError):
+        failed.result()
+    # The failed write released its slot, and writes to other shards went through.
+    assert [(tmp_path / f.result()).read_bytes() for f in later] == [
+        pdf_bytes(paper_id) for paper_id in later_ids
+    ]
+
+
+def test_metadata_is_written_in_batches(tmp_path):
+    path = tmp_path / "metadata.jsonl"
+    records = [{"paper_id": f"2301.{i:05d}", "status": "ok"} for i in range(7)]
+
+    writer = BatchedJsonlWriter(path, batch_size=3)
+    for record in records[:2]:
+        writer.write(record)
+    assert path.read_text() == ""
+    writer.write(records[2])
+    assert len(path.read_text().splitlines()) == 3
+    for record in records[3:]:
+        writer.write(record)
+    assert len(path.read_text().splitlines()) == 6
+
+    writer.flush()
+    assert len(path.read_text().splitlines()) == 7
+    writer.close()
+    writer.close()
+
+    assert [json.loads(line) for line in path.read_text().splitlines()] == records
+
+
+def test_metadata_tail_is_written_on_close(tmp_path):
+    path = tmp_path / "metadata.jsonl"
+    with BatchedJsonlWriter(path, batch_size=100) as writer:
+        for i in range(5):
+            writer.write({"n": i})
+
+    with BatchedJsonlWriter(path, batch_size=100, mode="a") as writer:
+        writer.write({"n": 5})
+
+    assert [json.loads(line)["n"] for line in path.read_text().splitlines()] == list(range(6))
@@ -0,0 +1,76 @@
+import os
+
+import pytest
+
+from modules import tar_index
+from modules.tar_index import (
+    TarMemberIndex,
+    build_directory_indexes,
+    build_tar_index,
+    index_path_for,
+    load_tar_index,
+)
+from pdf_fixtures import make_pdf, make_tar
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return make_tar(
+        tmp_path / "arXiv_pdf_0.tar",
+        [
+            ("pdf/2301.00001v1.pdf", make_pdf("first paper")),
+            ("pdf/README.txt", b"not a paper"),
+            ("pdf/2301.00002v2.pdf", make_pdf("second paper")),
+        ],
+    )
+
+
+def test_index_round_trip(archive, monkeypatch):
+    built = build_tar_index(archive)
+
+    assert sorted(built) == ["2301.00001v1", "2301.00002v2"]
+    assert index_path_for(archive).is_file()
+
+    def fail_scan(*args, **kwargs):
+        raise AssertionError("A fresh index must not rescan the archive")
+
+    monkeypatch.setattr(tar_index, "_scan_tar_members", fail_scan)
+    assert load_tar_index(archive) == built
+
+
+def test_index_is_rebuilt_when_the_archive_changes(archive):
+    build_tar_index(archive)
+    make_tar(archive, [("pdf/2301.00003v1.pdf", make_pdf("replacement"))])
+
+    assert sorted(load_tar_index(archive)) == ["2301.00003v1"]
+
+    stat = archive.stat()
+    os.utime(archive, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert load_tar_index(archive, build_missing=False) == {}
+    assert sorted(load_tar_index(archive)) == ["2301.00003v1"]
+
+
+def test_read_pdf_by_paper_id(archive):
+    index = TarMemberIndex.for_archive(archive)
+
+    assert index.read_pdf("2301.00002v2") == make_pdf("second paper")
+    view = index.view_pdf("2301.00001v1")
+    assert view.readonly and bytes(view) == make_pdf("first paper")
+    view.release()
+    with pytest.raises(KeyError):
+        index.read_pdf("2301.99999v1")
+
+
+def test_unwritable_directory_falls_back_to_memory(archive, monkeypatch):
+    def fail_write(tar_path, locations):
+        raise PermissionError(13, "Read-only file system")
+
+    monkeypatch.setattr(tar_index, "_write_tar_index", fail_write)
+    (archive.parent / "broken.tar").write_bytes(b"not a tar archive")
+
+    index = TarMemberIndex.for_directory(archive.parent)
+
+    assert sorted(index) == ["2301.00001v1", "2301.00002v2"]
+    assert index.read_pdf("2301.00001v1") == make_pdf("first paper")
+    assert not index_path_for(archive).exists()
+    assert build_directory_indexes(archive.parent) == []
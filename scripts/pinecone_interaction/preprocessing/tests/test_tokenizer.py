@@ -0,0 +1,109 @@
+import base64
+import hashlib
+import os
+
+import pytest
+
+from modules import tokenizer
+from modules.tokenizer import (
+    RegexTokenizer,
+    TiktokenTokenizer,
+    TiktokenVocabulary,
+    get_tokenizer,
+    vocabulary_path,
+)
+
+
+def write_vocabulary(vocab_dir, name):
+    """A byte-level vocabulary with a single merge, "ab"."""
+    tokens = [bytes([byte]) for byte in range(256)] + [b"ab"]
+    data = b"".join(
+        base64.b64encode(token) + b" " + str(rank).encode() + b"\n"
+        for rank, token in enumerate(tokens)
+    )
+    vocab_dir.mkdir(exist_ok=True)
+    vocabulary_path(name, vocab_dir).write_bytes(data)
+    return TiktokenVocabulary(
+        url="http://unused.invalid/tiny.tiktoken",
+        sha256=hashlib.sha256(data).hexdigest(),
+        pattern=r"\S+|\s+",
+    )
+
+
+@pytest.fixture(autouse=True)
+def clean_settings(monkeypatch):
+    monkeypatch.delenv("TOKENIZER", raising=False)
+    monkeypatch.delenv("TOKENIZER_VOCAB_DIR", raising=False)
+    monkeypatch.delenv("TIKTOKEN_CACHE_DIR", raising=False)
+    tokenizer._load_tokenizer.cache_clear()
+    yield
+    tokenizer._load_tokenizer.cache_clear()
+
+
+def test_regex_tokenizer_is_the_default():
+    assert isinstance(get_tokenizer(), RegexTokenizer)
+    assert get_tokenizer().count("Tokenizers count tokens, 42 of them.") > 0
+
+
+def test_tiktoken_loads_only_from_the_vocab_dir(tmp_path, monkeypatch):
+    monkeypatch.setitem(
+        tokenizer.TIKTOKEN_VOCABULARIES, "tiny", write_vocabulary(tmp_path, "tiny")
+    )
+    monkeypatch.setenv("TOKENIZER", "tiny")
+    monkeypatch.setenv("TOKENIZER_VOCAB_DIR", str(tmp_path))
+
+    counter = get_tokenizer()
+
+    assert isinstance(counter, TiktokenTokenizer) and counter.name == "tiny"
+    assert counter.count("abc ab") == 4  # "ab" "c" " " "ab"
+    assert "TIKTOKEN_CACHE_DIR" not in os.environ
+
+
+
+def test_cache_follows_the_resolved_settings(tmp_path, monkeypatch):
+    for vocab_dir in (tmp_path / "a", tmp_path / "b"):
+        vocabulary = write_vocabulary(vocab_dir, "tiny")
+    monkeypatch.setitem(tokenizer.TIKTOKEN_VOCABULARIES, "tiny", vocabulary)
+
+    regex = get_tokenizer()
+    assert get_tokenizer() is regex
+
+    monkeypatch.setenv("TOKENIZER", "tiny")
+    monkeypatch.setenv("TOKENIZER_VOCAB_DIR", str(tmp_path / "a"))
+    from_a = get_tokenizer()
+    assert isinstance(from_a, TiktokenTokenizer)
+    assert get_tokenizer() is from_a
+    assert get_tokenizer("tiny", tmp_path / "a" / ".." / "a") is from_a
+
+    monkeypatch.setenv("TOKENIZER_VOCAB_DIR", str(tmp_path / "b"))
+    from_b = get_tokenizer()
+    assert from_b is not from_a and get_tokenizer("tiny", tmp_path / "b") is from_b
+
+    monkeypatch.delenv("TOKENIZER")
+    assert get_tokenizer() is regex
+
+def test_missing_vocabulary_is_not_downloaded(tmp_path, monkeypatch):
+    def no_network(*args, **kwargs):
+        raise AssertionError("tried to download")
+
+    monkeypatch.setattr(tokenizer.urllib.request, "urlopen", no_network)
+
+    with pytest.raises(FileNotFoundError, match="python -m modules.tokenizer"):
+        get_tokenizer("cl100k_base", tmp_path)
+    assert list(tmp_path.iterdir()) == []
+    assert "TIKTOKEN_CACHE_DIR" not in os.environ
+
+
+def test_corrupt_vocabulary_is_rejected(tmp_path, monkeypatch):
+    vocabulary = write_vocabulary(tmp_path, "tiny")
+    monkeypatch.setitem(
+        tokenizer.TIKTOKEN_VOCABULARIES, "tiny", vocabulary._replace(sha256="0" * 64)
+    )
+
+    with pytest.raises(ValueError, match="hash"):
+        TiktokenTokenizer("tiny", tmp_path)
+
+
+def test_unknown_encoding_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match="Unknown tiktoken encoding"):
+        get_tokenizer("p50k_whatever", tmp_path)
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from modules.vector_store import ChunkMetadata, VectorStore, VectorStoreWriter
+
+
+def make_rows(count, first=0, dimensions=8):
+    rng = np.random.default_rng(first)
+    vectors = rng.standard_normal((count, dimensions)).astype(np.float32)
+    metadata = [ChunkMetadata("2301.00001", first + i, i, i + 1) for i in range(count)]
+    return vectors, metadata
+
+
+def open_writer(directory, dtype="float32", **kwargs):
+    return VectorStoreWriter(
+        directory, "test-model", 8, dtype=dtype, shard_rows=5, **kwargs
+    )
+
+
+@pytest.mark.parametrize(
+    "dtype, tolerance", [("float32", 0), ("float16", 1e-2), ("int8", 3e-2)]
+)
+def test_rows_round_trip_across_shards(tmp_path, dtype, tolerance):
+    vectors, metadata = make_rows(12)
+    with open_writer(tmp_path, dtype) as writer:
+        assert writer.append(vectors[:3], metadata[:3]) == 0
+        writer.flush()
+        assert writer.append(vectors[3:], metadata[3:]) == 3
+
+    with VectorStore(tmp_path) as store:
+        assert len(store) == 12
+        assert [len(shard) for _, shard in store.iter_shards()] == [5, 5, 2]
+        np.testing.assert_allclose(store.vectors(range(12)), vectors, atol=tolerance)
+        assert store.metadata([11, 0]) == [metadata[11], metadata[0]]
+
+
+def test_flush_updates_shards_in_place(tmp_path):
+    vectors, metadata = make_rows(4)
+    with open_writer(tmp_path) as writer:
+        writer.append(vectors[:1], metadata[:1])
+        writer.flush()
+        shard = tmp_path / "vectors-00000.npy"
+        inode, size = shard.stat().st_ino, shard.stat().st_size
+
+        writer.append(vectors[1:], metadata[1:])
+        writer.flush()
+
+        assert (shard.stat().st_ino, shard.stat().st_size) == (inode, size)
+        with VectorStore(tmp_path) as store:
+            np.testing.assert_array_equal(store.vectors(range(4)), vectors)
+
+
+@pytest.mark.parametrize("dtype", ["float32", "int8"])
+def test_reopen_truncate_and_continue(tmp_path, dtype):
+    vectors, metadata = make_rows(14)
+    with open_writer(tmp_path, dtype) as writer:
+        writer.append(vectors[:7], metadata[:7])
+        writer.flush()
+        writer.append(vectors[7:13], metadata[7:13])  # Never committed
+
+    with open_writer(tmp_path, dtype) as writer:
+        writer.truncate(7)
+        assert len(writer) == 7
+        writer.append(vectors[7:], metadata[7:])
+
+    with VectorStore(tmp_path) as store:
+        assert len(store) == 14
+        np.testing.assert_allclose(store.vectors(range(14)), vectors, atol=3e-2)
+        assert [m.chunk_index for m in store.metadata(range(14))] == list(range(14))
+
+
+def test_continues_partial_shard_saved_at_its_filled_size(tmp_path):
+    vectors, metadata = make_rows(7)
+    with open_writer(tmp_path) as writer:
+        writer.append(vectors[:3], metadata[:3])
+    # Earlier versions of the writer saved the last shard with only its rows.
+    np.save(tmp_path / "vectors-00000.npy", vectors[:3])
+
+    with open_writer(tmp_path) as writer:
+        writer.append(vectors[3:], metadata[3:])
+
+    with VectorStore(tmp_path) as store:
+        np.testing.assert_array_equal(store.vectors(range(7)), vectors)
+
+
+def test_settings_mismatch_is_rejected(tmp_path):
+    with open_writer(tmp_path) as writer:
+        writer.append(*make_rows(1))
+    with pytest.raises(ValueError):
+        open_writer(tmp_path, "float16")